@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Document, EtapeTraitement, CVImage
+from .models import Document, EtapeTraitement, CVImage, GenerationJob, CacheCounter, GenerationCacheEntry, SearchCacheEntry, UserDocumentStats, JobAnalysis, RateLimitBucket
 
 class EtapeTraitementInline(admin.TabularInline):
     model = EtapeTraitement
@@ -29,4 +29,43 @@ class EtapeTraitementAdmin(admin.ModelAdmin):
 class CVImageAdmin(admin.ModelAdmin):
     list_display = ['document', 'description', 'date_creation']
     list_filter = ['date_creation']
-    readonly_fields = ['date_creation']
\ No newline at end of file
+    readonly_fields = ['date_creation']
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'document', 'statut', 'tentatives', 'worker', 'date_creation', 'date_mise_a_jour']
+    list_filter = ['statut', 'date_creation']
+    readonly_fields = ['date_creation', 'date_mise_a_jour', 'date_verrouillage']
+
+@admin.register(GenerationCacheEntry)
+class GenerationCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['cle', 'type', 'hits', 'date_creation', 'dernier_acces']
+    list_filter = ['type']
+    readonly_fields = ['cle', 'date_creation', 'dernier_acces']
+
+@admin.register(CacheCounter)
+class CacheCounterAdmin(admin.ModelAdmin):
+    list_display = ['nom', 'hits', 'misses', 'hit_rate', 'date_mise_a_jour']
+    readonly_fields = ['date_mise_a_jour']
+
+@admin.register(SearchCacheEntry)
+class SearchCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['poste', 'entreprise', 'date_recherche', 'verrou_jusqu_a']
+    search_fields = ['poste', 'entreprise']
+    readonly_fields = ['cle', 'date_creation']
+
+@admin.register(UserDocumentStats)
+class UserDocumentStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'type', 'total', 'processing', 'completed', 'score_total', 'date_mise_a_jour']
+    list_filter = ['type']
+    readonly_fields = ['date_mise_a_jour']
+
+@admin.register(JobAnalysis)
+class JobAnalysisAdmin(admin.ModelAdmin):
+    list_display = ['cle', 'version_prompt', 'hits', 'date_creation', 'dernier_acces']
+    list_filter = ['version_prompt']
+    readonly_fields = ['cle', 'date_creation', 'dernier_acces']
+
+@admin.register(RateLimitBucket)
+class RateLimitBucketAdmin(admin.ModelAdmin):
+    list_display = ['nom', 'tokens', 'derniere_recharge']
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AgentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Agent'
+
+    def ready(self):
+        # Connecte les signaux qui tiennent à jour UserDocumentStats
+        from Agent import signals  # noqa: F401
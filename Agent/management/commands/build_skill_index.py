@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from Agent.services.skill_index import rebuild
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de similarité des compétences (co-occurrences dans les profils et les offres)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.SKILL_INDEX_TOP_K,
+                            help="Nombre de voisins gardés par compétence")
+        parser.add_argument('--directory', default=settings.SKILL_INDEX_DIR,
+                            help="Répertoire de l'index")
+
+    def handle(self, *args, **options):
+        manifest = rebuild(directory=options['directory'], top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Skill index {manifest['version']}: {manifest['baskets']} baskets, "
+            f"{manifest['skills_with_neighbours']}/{len(manifest['names'])} skills with neighbours "
+            f"({manifest['built_in_seconds']}s)"
+        ))
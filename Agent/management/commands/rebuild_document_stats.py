@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from Agent.services.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques dénormalisées (UserDocumentStats) depuis les documents"
+
+    def handle(self, *args, **options):
+        count = rebuild_user_stats()
+        self.stdout.write(self.style.SUCCESS(f"{count} stats rows rebuilt"))
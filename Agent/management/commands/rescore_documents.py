@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from Agent.models import Document
+from Agent.services.scoring import rescore_documents
+
+
+class Command(BaseCommand):
+    help = "Recalcule le score ATS des documents terminés (après une évolution du scoring)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Limiter aux documents de cet utilisateur (id)")
+        parser.add_argument('--type', choices=['CV', 'LM'], help="Limiter à un type de document")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Nombre de documents chargés et mis à jour par lot")
+
+    def handle(self, *args, **options):
+        documents = Document.objects.all()
+        if options['user']:
+            documents = documents.filter(user_id=options['user'])
+        if options['type']:
+            documents = documents.filter(type=options['type'])
+        start = time.perf_counter()
+        count = rescore_documents(documents, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"{count} documents rescored in {elapsed:.2f}s"))
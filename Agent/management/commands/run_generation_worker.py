@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from Agent.services.jobs import run_worker_pool
+
+
+class Command(BaseCommand):
+    help = "Lance un pool local de workers qui traitent la file de génération de documents"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None,
+                            help="Nombre de threads workers (défaut : GENERATION_WORKER_THREADS)")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Délai en secondes entre deux lectures de la file vide")
+        parser.add_argument('--once', action='store_true',
+                            help="Vide la file puis s'arrête")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Starting generation workers...")
+        run_worker_pool(
+            threads=options['threads'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
+        self.stdout.write(self.style.SUCCESS("Generation workers stopped"))
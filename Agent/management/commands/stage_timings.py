@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from Agent.services.stages import stage_durations
+
+
+class Command(BaseCommand):
+    help = "Affiche les durées p50/p95 de chaque étape de traitement"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help="Période analysée, en jours")
+        parser.add_argument('--limit', type=int, default=10000,
+                            help="Nombre maximum d'étapes récentes analysées")
+
+    def handle(self, *args, **options):
+        stats = stage_durations(days=options['days'], limit=options['limit'])
+        if not stats:
+            self.stdout.write("No completed stage in this period")
+            return
+        self.stdout.write(f"{'Stage':<25} {'count':>7} {'p50 (s)':>9} {'p95 (s)':>9}")
+        for nom, values in sorted(stats.items()):
+            self.stdout.write(f"{nom:<25} {values['count']:>7} {values['p50']:>9} {values['p95']:>9}")
@@ -0,0 +1,40 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from Agent.services import metrics
+
+
+class MetricsMiddleware:
+    """Durée, temps passé en base et nombre de requêtes SQL de chaque requête HTTP, par vue"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with metrics.track_db() as db:
+            try:
+                return self.get_response(request)
+            finally:
+                self._observe(request, started, db)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with metrics.track_db() as db:
+            try:
+                return await self.get_response(request)
+            finally:
+                self._observe(request, started, db)
+
+    @staticmethod
+    def _observe(request, started, db):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, view=view)
+        metrics.REQUEST_DB_SECONDS.observe(db[0], view=view)
+        metrics.REQUEST_DB_QUERIES.observe(db[1], view=view)
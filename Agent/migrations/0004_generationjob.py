@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Agent', '0003_document_github_url_document_langue_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(default=dict)),
+                ('statut', models.CharField(choices=[('pending', 'En attente'), ('processing', 'En traitement'), ('completed', 'Terminé'), ('error', 'Erreur')], default='pending', max_length=10)),
+                ('tentatives', models.IntegerField(default=0)),
+                ('erreur', models.TextField(blank=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('executer_apres', models.DateTimeField(blank=True, null=True)),
+                ('date_verrouillage', models.DateTimeField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generation_jobs', to='Agent.document')),
+            ],
+            options={
+                'ordering': ['date_creation'],
+                'indexes': [models.Index(fields=['statut', 'date_creation'], name='agent_job_statut_idx')],
+            },
+        ),
+    ]
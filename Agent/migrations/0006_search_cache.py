@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Agent', '0005_generation_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=64, unique=True)),
+                ('poste', models.CharField(max_length=255)),
+                ('entreprise', models.CharField(blank=True, max_length=255)),
+                ('contexte', models.TextField(blank=True)),
+                ('date_recherche', models.DateTimeField(blank=True, null=True)),
+                ('verrou_jusqu_a', models.DateTimeField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
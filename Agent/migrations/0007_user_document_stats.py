@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Agent', '0006_search_cache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDocumentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('CV', 'Curriculum Vitae'), ('LM', 'Lettre de Motivation')], max_length=2)),
+                ('total', models.IntegerField(default=0)),
+                ('processing', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('score_total', models.BigIntegerField(default=0)),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'type'), name='agent_stats_user_type_uniq')],
+            },
+        ),
+    ]
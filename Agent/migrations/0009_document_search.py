@@ -0,0 +1,98 @@
+from django.db import migrations
+
+# Index plein texte de Document (titre, poste, entreprise, contenu).
+# PostgreSQL : colonne tsvector pondérée, index GIN, trigger de mise à jour.
+# SQLite : table FTS5 à contenu externe synchronisée par triggers.
+# Les autres moteurs gardent la recherche icontains (voir Agent/services/document_search.py).
+
+POSTGRES_FORWARD = [
+    'ALTER TABLE "Agent_document" ADD COLUMN search_vector tsvector',
+    """
+    CREATE FUNCTION agent_document_search_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.titre, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.poste, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.entreprise, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.contenu, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER agent_document_search_trg
+    BEFORE INSERT OR UPDATE OF titre, poste, entreprise, contenu ON "Agent_document"
+    FOR EACH ROW EXECUTE FUNCTION agent_document_search_update()
+    """,
+    'UPDATE "Agent_document" SET titre = titre',
+    'CREATE INDEX agent_doc_search_idx ON "Agent_document" USING GIN (search_vector)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP TRIGGER IF EXISTS agent_document_search_trg ON "Agent_document"',
+    'DROP FUNCTION IF EXISTS agent_document_search_update()',
+    'DROP INDEX IF EXISTS agent_doc_search_idx',
+    'ALTER TABLE "Agent_document" DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE agent_document_fts USING fts5(
+        titre, poste, entreprise, contenu,
+        content='Agent_document', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER agent_document_fts_ai AFTER INSERT ON "Agent_document" BEGIN
+        INSERT INTO agent_document_fts(rowid, titre, poste, entreprise, contenu)
+        VALUES (new.id, new.titre, new.poste, new.entreprise, new.contenu);
+    END
+    """,
+    """
+    CREATE TRIGGER agent_document_fts_ad AFTER DELETE ON "Agent_document" BEGIN
+        INSERT INTO agent_document_fts(agent_document_fts, rowid, titre, poste, entreprise, contenu)
+        VALUES ('delete', old.id, old.titre, old.poste, old.entreprise, old.contenu);
+    END
+    """,
+    """
+    CREATE TRIGGER agent_document_fts_au AFTER UPDATE OF titre, poste, entreprise, contenu ON "Agent_document" BEGIN
+        INSERT INTO agent_document_fts(agent_document_fts, rowid, titre, poste, entreprise, contenu)
+        VALUES ('delete', old.id, old.titre, old.poste, old.entreprise, old.contenu);
+        INSERT INTO agent_document_fts(rowid, titre, poste, entreprise, contenu)
+        VALUES (new.id, new.titre, new.poste, new.entreprise, new.contenu);
+    END
+    """,
+    "INSERT INTO agent_document_fts(agent_document_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS agent_document_fts_ai',
+    'DROP TRIGGER IF EXISTS agent_document_fts_ad',
+    'DROP TRIGGER IF EXISTS agent_document_fts_au',
+    'DROP TABLE IF EXISTS agent_document_fts',
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Agent', '0008_document_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Agent', '0009_document_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=64, unique=True)),
+                ('version_prompt', models.IntegerField()),
+                ('analyse', models.JSONField(default=dict)),
+                ('hits', models.IntegerField(default=0)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('dernier_acces', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'job analyses',
+                'ordering': ['-dernier_acces'],
+            },
+        ),
+    ]
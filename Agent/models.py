@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 from django.contrib.auth import get_user_model
 import os
+from Agent.services import metrics
 
 def cv_image_path(instance, filename):
     # Générer le chemin pour l'image du CV
@@ -44,6 +45,12 @@ class Document(models.Model):
     
     class Meta:
         ordering = ['-date_creation']
+        indexes = [
+            # Listing paginé par curseur (date_creation, id) du tableau de bord
+            models.Index(fields=['user', '-date_creation', '-id'], name='agent_doc_user_date_idx'),
+            models.Index(fields=['user', 'statut'], name='agent_doc_user_statut_idx'),
+            models.Index(fields=['user', 'type'], name='agent_doc_user_type_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titre} - {self.get_type_display()}"
@@ -55,7 +62,8 @@ class Document(models.Model):
     @property
     def etapes(self):
         """Propriété pour accéder aux étapes dans les templates"""
-        return self.etape_traitement_set.all().order_by('ordre')
+        # Meta.ordering trie déjà par ordre ; .all() profite d'un prefetch_related
+        return self.etape_traitement_set.all()
 
 
 class EtapeTraitement(models.Model):
@@ -96,3 +104,161 @@ class CVImage(models.Model):
             if os.path.isfile(self.image.path):
                 os.remove(self.image.path)
         super().delete(*args, **kwargs)
+
+
+class GenerationJob(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'En attente'),
+        ('processing', 'En traitement'),
+        ('completed', 'Terminé'),
+        ('error', 'Erreur'),
+    )
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='generation_jobs')
+    payload = models.JSONField(default=dict)
+    statut = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    tentatives = models.IntegerField(default=0)
+    erreur = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    executer_apres = models.DateTimeField(null=True, blank=True)
+    date_verrouillage = models.DateTimeField(null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date_creation']
+        indexes = [
+            models.Index(fields=['statut', 'date_creation'], name='agent_job_statut_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} - {self.document.titre} ({self.statut})"
+
+
+class CacheCounter(models.Model):
+    """Compteurs de hits/misses partagés entre les processus, un par cache"""
+    nom = models.CharField(max_length=50, unique=True)
+    hits = models.BigIntegerField(default=0)
+    misses = models.BigIntegerField(default=0)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nom}: {self.hits} hits / {self.misses} misses"
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return round(self.hits / total * 100, 2) if total else 0
+
+    @classmethod
+    def record(cls, nom, hit):
+        """Incrémente atomiquement le compteur de hits ou de misses d'un cache"""
+        field = 'hits' if hit else 'misses'
+        metrics.CACHE_EVENTS.inc(cache=nom, result='hit' if hit else 'miss')
+        if not cls.objects.filter(nom=nom).update(**{field: models.F(field) + 1}):
+            counter, _ = cls.objects.get_or_create(nom=nom)
+            cls.objects.filter(pk=counter.pk).update(**{field: models.F(field) + 1})
+
+
+class GenerationCacheEntry(models.Model):
+    """Contenu généré, indexé par l'empreinte des entrées du prompt"""
+    cle = models.CharField(max_length=64, unique=True)
+    type = models.CharField(max_length=2, choices=Document.DOCUMENT_TYPES)
+    contenu = models.TextField()
+    hits = models.IntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    dernier_acces = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-dernier_acces']
+
+    def __str__(self):
+        return f"{self.get_type_display()} {self.cle[:12]} ({self.hits} hits)"
+
+
+class JobAnalysis(models.Model):
+    """Analyse d'une offre d'emploi, partagée par les pipelines CV et LM"""
+    cle = models.CharField(max_length=64, unique=True)
+    version_prompt = models.IntegerField()
+    analyse = models.JSONField(default=dict)
+    hits = models.IntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    dernier_acces = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-dernier_acces']
+        verbose_name_plural = 'job analyses'
+
+    def __str__(self):
+        return f"{self.analyse.get('job_title', 'Offre')} v{self.version_prompt} ({self.hits} hits)"
+
+
+class SearchCacheEntry(models.Model):
+    """Contexte de recherche Tavily pour un couple (poste, entreprise) normalisé"""
+    cle = models.CharField(max_length=64, unique=True)
+    poste = models.CharField(max_length=255)
+    entreprise = models.CharField(max_length=255, blank=True)
+    contexte = models.TextField(blank=True)
+    date_recherche = models.DateTimeField(null=True, blank=True)
+    verrou_jusqu_a = models.DateTimeField(null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.poste} / {self.entreprise}"
+
+
+class UserDocumentStats(models.Model):
+    """
+    Statistiques dénormalisées des documents d'un utilisateur, une ligne par type.
+
+    Tenues à jour par les signaux de Agent/signals.py quand
+    DASHBOARD_STATS_DENORMALIZED est activé ; `manage.py rebuild_document_stats`
+    les recalcule depuis la table Document.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='document_stats')
+    type = models.CharField(max_length=2, choices=Document.DOCUMENT_TYPES)
+    total = models.IntegerField(default=0)
+    processing = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    score_total = models.BigIntegerField(default=0)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'type'], name='agent_stats_user_type_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.type}: {self.total} documents"
+
+    @classmethod
+    def apply_delta(cls, user_id, type, create=True, **deltas):
+        """Ajoute atomiquement des deltas aux compteurs d'un (utilisateur, type)"""
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return
+        changes = {field: models.F(field) + value for field, value in deltas.items()}
+        if cls.objects.filter(user_id=user_id, type=type).update(**changes) or not create:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, type=type, **deltas)
+        except IntegrityError:
+            # Ligne créée entre-temps par un autre processus
+            cls.objects.filter(user_id=user_id, type=type).update(**changes)
+
+
+class RateLimitBucket(models.Model):
+    """
+    Seau de jetons d'un fournisseur externe, partagé par tous les processus.
+
+    `tokens` est le niveau au moment `derniere_recharge` (secondes epoch) ;
+    Agent/services/rate_limit.py le recharge et le décrémente en une seule
+    requête UPDATE conditionnelle.
+    """
+    nom = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField(default=0)
+    derniere_recharge = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.nom}: {self.tokens:.1f} jetons"
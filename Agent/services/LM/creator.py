@@ -1,5 +1,6 @@
-from Agent.models import Document, EtapeTraitement
+from Agent.models import Document
 from Agent.models.LM_Agent import LMAgent
+from Agent.services.stages import StageTracker
 
 class LMAgentCreator:
     def create_agent(self, document_id, user_data, job_description, cv_content, lm_tools, lm_logic, lm_agent_tool):
@@ -32,11 +33,7 @@ class LMAgentCreator:
                 {"nom": "Validation finale", "ordre": 5},
             ]
             
-            for etape_data in etapes:
-                EtapeTraitement.objects.create(
-                    document=document,
-                    **etape_data
-                )
+            StageTracker.create(document, etapes)
             
             return {
                 "agent": lm_agent,
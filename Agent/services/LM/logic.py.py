@@ -1,6 +1,6 @@
-import re
 from langchain import PromptTemplate
 from langchain.chains import LLMChain
+from Agent.services import job_analysis as job_analysis_service
 
 class LMLogic:
     def __init__(self, llm, lm_tools, search_service):
@@ -10,67 +10,22 @@ class LMLogic:
     
     def analyze_job_and_company(self, job_description):
         """
-        Analyse la description de poste et recherche des informations sur l'entreprise
+        Analyse la description de poste et recherche des informations sur l'entreprise.
+        L'analyse est partagée avec CVLogic et enregistrée par offre distincte.
         """
         # Extraire le nom de l'entreprise si possible
         company_name = self._extract_company_name(job_description)
         
-        prompt_template = PromptTemplate(
-            input_variables=["job_description", "company_name"],
-            template="""
-            Analysez cette description de poste et extrayez les informations clés pour une lettre de motivation:
-            
-            {job_description}
-            
-            Entreprise: {company_name}
-            
-            Veuillez retourner un JSON structuré avec:
-            - company_values: valeurs probables de l'entreprise
-            - job_requirements: exigences principales du poste
-            - motivation_triggers: éléments qui pourraient motiver un candidat
-            - tone_suggestion: ton approprié pour la lettre (formel, enthousiaste, etc.)
-            """
+        analysis = job_analysis_service.get_analysis(
+            job_description,
+            lambda text: job_analysis_service.run_llm_analysis(self.llm, text, company_name),
         )
-        
-        chain = LLMChain(llm=self.llm, prompt=prompt_template)
-        result = chain.run(job_description=job_description, company_name=company_name)
-        
-        # Extraire le JSON de la réponse
-        json_match = re.search(r'\{.*\}', result, re.DOTALL)
-        if json_match:
-            import json
-            try:
-                analysis = json.loads(json_match.group())
-                analysis['company_name'] = company_name
-                return analysis
-            except:
-                pass
-        
-        # Fallback
-        return {
-            "company_name": company_name,
-            "company_values": ["Excellence", "Innovation", "Collaboration"],
-            "job_requirements": [],
-            "motivation_triggers": [],
-            "tone_suggestion": "professionnel"
-        }
+        analysis['company_name'] = company_name
+        return analysis
     
     def _extract_company_name(self, text):
         """Tente d'extraire le nom de l'entreprise du texte"""
-        # Implémentation simplifiée - utiliser NER dans une version réelle
-        patterns = [
-            r"chez\s+([A-Z][a-zA-Z\s&]+)",
-            r"à\s+([A-Z][a-zA-Z\s&]+)",
-            r"entreprise\s+([A-Z][a-zA-Z\s&]+)",
-            r"chez\s+([A-Z][a-zA-Z\s&]+)",
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-        
-        return "Cette entreprise"
+        return job_analysis_service.extract_company_name(text)
     
     def generate_motivation_letter(self, user_data, job_analysis, cv_content=None):
         """
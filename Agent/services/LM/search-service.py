@@ -1,5 +1,13 @@
 import requests
 from django.conf import settings
+from Agent.services import resilience
+
+
+def _google_search(url, params):
+    """Requête Google CSE ; une réponse d'erreur lève et compte comme un échec pour le disjoncteur"""
+    response = requests.get(url, params=params, timeout=settings.SEARCH_DEADLINE)
+    response.raise_for_status()
+    return response
 
 class LMSearchService:
     def __init__(self):
@@ -20,7 +28,7 @@ class LMSearchService:
                     'q': f"{company_name} valeurs culture entreprise"
                 }
                 
-                response = requests.get(url, params=params)
+                response = resilience.call('google_cse', lambda: _google_search(url, params))
                 if response.status_code == 200:
                     items = response.json().get('items', [])
                     
@@ -1,38 +1,69 @@
-import os
-from langchain.chat_models import ChatOpenAI
-from langchain.llms import OpenAI
+import threading
+from typing import Any, List, Optional
+from langchain.llms.base import LLM
+from langchain.llms.utils import enforce_stop_tokens
 from django.conf import settings
+from Agent.services import llm_provider
+
+
+def _spec(model_name):
+    """« gpt-4 » désigne un modèle OpenAI ; « stub », « gemini:... » un autre fournisseur"""
+    return model_name if ':' in model_name or model_name in llm_provider.PROVIDERS else f"openai:{model_name}"
+
+
+class ProviderLLM(LLM):
+    """LLM LangChain adossé à Agent/services/llm_provider.py (timeouts, nouvelles tentatives, secours)"""
+    specs: List[str]
+    temperature: float = 0.7
+    max_tokens: int = 2000
+
+    @property
+    def _llm_type(self):
+        return "provider"
+
+    @property
+    def _identifying_params(self):
+        return {'specs': self.specs, 'temperature': self.temperature, 'max_tokens': self.max_tokens}
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        text = llm_provider.complete(prompt, self.specs, temperature=self.temperature, max_tokens=self.max_tokens)
+        return enforce_stop_tokens(text, stop) if stop else text
+
 
 class LLMLoader:
     _instance = None
+    _instance_lock = threading.Lock()
     _llm_cache = {}
+    _llm_cache_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(LLMLoader, cls).__new__(cls)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = super(LLMLoader, cls).__new__(cls)
         return cls._instance
     
-    def get_llm(self, model_name="gpt-4", temperature=0.7, max_tokens=2000):
-        cache_key = f"{model_name}_{temperature}_{max_tokens}"
-        
-        if cache_key not in self._llm_cache:
-            try:
-                # Configuration pour OpenAI
-                llm = ChatOpenAI(
-                    model_name=model_name,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    openai_api_key=settings.OPENAI_API_KEY
-                )
-                self._llm_cache[cache_key] = llm
-            except Exception as e:
-                raise Exception(f"Erreur lors du chargement du modèle {model_name}: {str(e)}")
-        
-        return self._llm_cache[cache_key]
+    def _get(self, specs, temperature, max_tokens):
+        cache_key = (tuple(specs), temperature, max_tokens)
+        llm = self._llm_cache.get(cache_key)
+        if llm is None:
+            with self._llm_cache_lock:
+                llm = self._llm_cache.get(cache_key)
+                if llm is None:
+                    llm = self._llm_cache[cache_key] = ProviderLLM(specs=list(specs), temperature=temperature, max_tokens=max_tokens)
+        return llm
+    
+    def get_llm(self, model_name=None, temperature=0.7, max_tokens=2000):
+        """Modèle principal ; le modèle alternatif prend le relais en cas d'échec ou de délai dépassé"""
+        specs = llm_provider.provider_specs(
+            _spec(model_name or settings.DEFAULT_LLM_MODEL),
+            [_spec(settings.DEFAULT_LLM_ALTERNATIVE_MODEL)],
+        )
+        return self._get(specs, temperature, max_tokens)
     
-    def get_alternative_llm(self, model_name="gpt-3.5-turbo", temperature=0.7, max_tokens=2000):
+    def get_alternative_llm(self, model_name=None, temperature=0.7, max_tokens=2000):
         """Fournit un modèle alternatif en cas de problème avec le modèle principal"""
-        return self.get_llm(model_name, temperature, max_tokens)
+        return self._get([_spec(model_name or settings.DEFAULT_LLM_ALTERNATIVE_MODEL)], temperature, max_tokens)
 
 # Instance singleton
-llm_loader = LLMLoader()
\ No newline at end of file
+llm_loader = LLMLoader()
@@ -0,0 +1,123 @@
+import logging
+from contextlib import asynccontextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from Agent.services import generation_cache, llm_provider, metrics, resilience, scoring, search_cache, sections
+from Agent.services.pdf import schedule_prerender
+from Agent.services.pipeline import GenerationError, _get_prompt, build_user_data, tavily_api_key
+from Agent.services.stages import STAGE_LLM, STAGE_POSTPROCESS, STAGE_PROMPT, STAGE_SAVE, STAGE_SEARCH, StageTracker
+
+logger = logging.getLogger(__name__)
+
+async def _apost_tavily_search(headers, query):
+    """Requête Tavily ; une réponse 4xx/5xx lève une erreur et compte comme un échec pour le disjoncteur"""
+    response = await llm_provider.async_http_client().post(
+        f"{settings.TAVILY_API_BASE_URL}/search",
+        headers=headers,
+        json={
+            'query': query,
+            'search_depth': "basic",
+            'max_results': 3,
+        },
+        timeout=settings.SEARCH_DEADLINE,
+    )
+    response.raise_for_status()
+    return response
+
+
+async def afetch_search_context(target_role, company):
+    """Query the Tavily REST API for the job requirements of a role at a company"""
+    logger.info(f"Searching Tavily for: {target_role} job requirements {company}")
+    headers = {'Authorization': f"Bearer {tavily_api_key()}"}
+    query = f"{target_role} job requirements {company}"
+    response = await resilience.acall('tavily', lambda: _apost_tavily_search(headers, query))
+    context = "\n".join([result['content'] for result in response.json()['results']])
+    logger.debug(f"Tavily context: {context[:200]}...")
+    return context
+
+
+async def asearch_context(target_role, company):
+    """Fetch additional context using Tavily, through the shared search cache"""
+    try:
+        context = await search_cache.aget_context(target_role, company, afetch_search_context)
+    except Exception as e:
+        logger.error(f"Tavily API error: {str(e)}")
+        context = "No additional context available."
+    return context
+
+
+async def agenerate_content(prompt):
+    """Generate content with the configured LLM provider, on the event loop's pooled client"""
+    logger.info(f"Calling {settings.LLM_PROVIDER} for content generation")
+    content = await llm_provider.acomplete(prompt)
+    logger.info("Content generated successfully")
+    return content
+
+
+async def atimed_search_context(target_role, company):
+    """asearch_context, avec ses dates de début et de fin pour l'étape de recherche"""
+    date_debut = timezone.now()
+    context = await asearch_context(target_role, company)
+    return context, (date_debut, timezone.now())
+
+
+@asynccontextmanager
+async def _astage(tracker, ordre):
+    """Chronomètre une étape ; toute erreur est remontée en GenerationError"""
+    try:
+        async with tracker.astage(ordre):
+            yield
+    except GenerationError:
+        raise
+    except Exception as e:
+        logger.error(f"Generation failed for document {tracker.document.id} at step {ordre}: {str(e)}")
+        raise GenerationError(str(e)) from e
+
+
+async def arun_generation(document, user, payload, context, search_timing, tracker=None):
+    """
+    Termine le pipeline d'un document dont la recherche Tavily est déjà faite.
+
+    `search_timing` est le couple (début, fin) de cette recherche. Les étapes
+    sont mises à jour comme dans pipeline.run_generation ; seuls les appels
+    réseau et les accès base diffèrent (asynchrones).
+    """
+    tracker = tracker or await StageTracker.aload(document)
+    document.statut = 'processing'
+    await document.asave(update_fields=['statut', 'date_mise_a_jour'])
+    tracker.record(STAGE_SEARCH, *search_timing)
+
+    async with _astage(tracker, STAGE_PROMPT):
+        user_data = build_user_data(user, payload)
+        prompt_inputs = (
+            payload['document_type'], payload['target_role'], payload['company'],
+            payload.get('keywords', ''), payload.get('tone', 'professionnel'),
+            payload.get('job_description', ''), user_data, context,
+            payload.get('langue', 'fr'), payload.get('template_utilise', 'default')
+        )
+        prompt = _get_prompt(*prompt_inputs)
+        cache_key = generation_cache.make_key(*prompt_inputs)
+    metrics.GENERATIONS.inc(mode='full')
+
+    async with _astage(tracker, STAGE_LLM):
+        generated_content = await sync_to_async(generation_cache.lookup)(cache_key)
+        document.metadata['generation_cache'] = 'hit' if generated_content is not None else 'miss'
+        if generated_content is None:
+            generated_content = await agenerate_content(prompt)
+            await sync_to_async(generation_cache.store)(cache_key, document.type, generated_content)
+
+    async with _astage(tracker, STAGE_POSTPROCESS):
+        document.contenu = generated_content.strip()
+        sections.remember(document, payload, user_data)
+        analysis = await sync_to_async(scoring.cached_analysis)(document)
+        scoring.apply_score(document, analysis)
+
+    async with _astage(tracker, STAGE_SAVE):
+        document.statut = 'completed'
+        await document.asave()
+    await tracker.aflush()
+    schedule_prerender(document.id)
+
+    logger.info(f"Document {document.id} updated to completed, score: {document.score}")
+    return document
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from django.conf import settings
+from Agent.services import search_cache
+from django.utils import timezone
+from Agent.services.async_pipeline import arun_generation, asearch_context
+from Agent.services.pipeline import GenerationError
+from Agent.services.stages import StageTracker
+
+logger = logging.getLogger(__name__)
+
+
+async def agenerate_batch_documents(user, items):
+    """
+    Génère les documents d'un lot en parallèle, avec une concurrence bornée.
+
+    `items` est une liste de (index, document, payload) dont les documents
+    existent déjà. Le profil est partagé par tous les payloads ; la recherche
+    Tavily n'est faite qu'une fois par couple (poste, entreprise) du lot.
+    Retourne un résultat par item, dans l'ordre des index.
+    """
+    concurrency = settings.BATCH_GENERATION_CONCURRENCY
+    generation_slots = asyncio.Semaphore(concurrency)
+    search_slots = asyncio.Semaphore(concurrency)
+
+    async def bounded_search(target_role, company):
+        async with search_slots:
+            return await asearch_context(target_role, company)
+
+    searches = {}
+    for _, _, payload in items:
+        key = search_cache.normalize(payload['target_role'], payload['company'])
+        if key not in searches:
+            searches[key] = asyncio.ensure_future(bounded_search(payload['target_role'], payload['company']))
+    logger.info(f"Batch of {len(items)} documents, {len(searches)} distinct searches")
+
+    async def run_item(index, document, payload):
+        result = {'index': index, 'document_id': document.id}
+        try:
+            tracker = await StageTracker.acreate(document)
+            # La recherche est partagée : l'étape couvre l'attente de ce document
+            search_started = timezone.now()
+            context = await searches[search_cache.normalize(payload['target_role'], payload['company'])]
+            search_timing = (search_started, timezone.now())
+            async with generation_slots:
+                await arun_generation(document, user, payload, context, search_timing, tracker=tracker)
+            result['status'] = 'completed'
+        except Exception as e:
+            logger.error(f"Batch item {index} (document {document.id}) failed: {str(e)}")
+            document.statut = 'error'
+            await document.asave(update_fields=['statut', 'date_mise_a_jour'])
+            result.update(status='error', error=str(e) if isinstance(e, GenerationError) else 'Internal error')
+        return result
+
+    return list(await asyncio.gather(*(run_item(*item) for item in items)))
@@ -1,5 +1,6 @@
 from langchain.tools import BaseTool
 import json
+from Agent.services.skills import extract_skills, match_skills
 
 class CVTools(BaseTool):
     name = "CVTools"
@@ -27,36 +28,12 @@ class CVTools(BaseTool):
             return {"error": "Action non supportée"}
     
     def extract_skills_from_text(self, text):
-        """Extrait les compétences d'un texte"""
-        # Implémentation simplifiée - utiliser NLP dans une version réelle
-        skills_keywords = [
-            "Python", "JavaScript", "React", "Node.js", "SQL", "NoSQL", "AWS",
-            "Docker", "Kubernetes", "Machine Learning", "AI", "Data Analysis",
-            "Project Management", "Agile", "Scrum", "Communication", "Leadership"
-        ]
-        
-        found_skills = []
-        for skill in skills_keywords:
-            if skill.lower() in text.lower():
-                found_skills.append(skill)
-        
-        return found_skills
+        """Extrait les compétences d'un texte (taxonomie Agent/data/skills_taxonomy.json)"""
+        return extract_skills(text)
     
     def match_skills(self, job_skills, candidate_skills):
         """Calcule la correspondance entre les compétences requises et celles du candidat"""
-        match_percentage = 0
-        missing_skills = []
-        
-        if job_skills:
-            matched_skills = [skill for skill in job_skills if skill in candidate_skills]
-            match_percentage = (len(matched_skills) / len(job_skills)) * 100
-            missing_skills = [skill for skill in job_skills if skill not in candidate_skills]
-        
-        return {
-            "match_percentage": round(match_percentage, 2),
-            "matched_skills": matched_skills,
-            "missing_skills": missing_skills
-        }
+        return match_skills(job_skills, candidate_skills)
     
     def generate_professional_summary(self, experiences, target_role):
         """Génère un résumé professionnel personnalisé"""
@@ -1,5 +1,6 @@
-from Agent.models import Document, EtapeTraitement
+from Agent.models import Document
 from Agent.models.Agent import CVAgent
+from Agent.services.stages import StageTracker
 
 class CVAgentCreator:
     def create_agent(self, document_id, user_data, job_description, cv_tools, cv_logic, cv_agent_tool):
@@ -31,11 +32,7 @@ class CVAgentCreator:
                 {"nom": "Validation finale", "ordre": 5},
             ]
             
-            for etape_data in etapes:
-                EtapeTraitement.objects.create(
-                    document=document,
-                    **etape_data
-                )
+            StageTracker.create(document, etapes)
             
             return {
                 "agent": cv_agent,
@@ -1,6 +1,6 @@
-import re
 from langchain import PromptTemplate
 from langchain.chains import LLMChain
+from Agent.services import job_analysis as job_analysis_service
 
 class CVLogic:
     def __init__(self, llm, cv_tools, search_service):
@@ -10,46 +10,14 @@ class CVLogic:
     
     def analyze_job_description(self, job_description):
         """
-        Analyse la description de poste pour en extraire les exigences clés
+        Analyse la description de poste pour en extraire les exigences clés.
+        L'analyse est partagée avec LMLogic et enregistrée par offre distincte.
         """
-        prompt_template = PromptTemplate(
-            input_variables=["job_description"],
-            template="""
-            Analysez cette description de poste et extrayez les informations clés:
-            
-            {job_description}
-            
-            Veuillez retourner un JSON structuré avec:
-            - job_title: le titre du poste
-            - required_skills: liste des compétences requises
-            - preferred_skills: liste des compétences préférées
-            - experience_level: niveau d'expérience requis
-            - keywords: mots-clés importants
-            - company_culture: indices sur la culture d'entreprise
-            """
+        company_name = job_analysis_service.extract_company_name(job_description)
+        return job_analysis_service.get_analysis(
+            job_description,
+            lambda text: job_analysis_service.run_llm_analysis(self.llm, text, company_name),
         )
-        
-        chain = LLMChain(llm=self.llm, prompt=prompt_template)
-        result = chain.run(job_description=job_description)
-        
-        # Extraire le JSON de la réponse
-        json_match = re.search(r'\{.*\}', result, re.DOTALL)
-        if json_match:
-            import json
-            try:
-                return json.loads(json_match.group())
-            except:
-                # Fallback si le parsing JSON échoue
-                return {
-                    "job_title": "Poste analysé",
-                    "required_skills": [],
-                    "preferred_skills": [],
-                    "experience_level": "Non spécifié",
-                    "keywords": [],
-                    "company_culture": "Non spécifié"
-                }
-        
-        return result
     
     def adapt_profile_to_job(self, user_data, job_analysis):
         """
@@ -1,5 +1,15 @@
 import requests
 from django.conf import settings
+from Agent.services import resilience
+from Agent.services import skill_index
+from Agent.services.skills import get_matcher
+
+
+def _google_search(url, params):
+    """Requête Google CSE ; une réponse d'erreur lève et compte comme un échec pour le disjoncteur"""
+    response = requests.get(url, params=params, timeout=settings.SEARCH_DEADLINE)
+    response.raise_for_status()
+    return response
 
 class CVSearchService:
     def __init__(self):
@@ -10,18 +20,14 @@ class CVSearchService:
         """
         Trouve des alternatives ou des formations pour les compétences manquantes
         """
+        # Une seule lecture de l'index de similarité pour toutes les compétences manquantes
+        similar = skill_index.similar_skills(missing_skills, existing_skills)
         alternatives = {}
         
         for skill in missing_skills:
-            # Recherche d'alternatives basée sur les compétences existantes
-            similar_skills = self._find_similar_skills(skill, existing_skills)
-            
-            # Recherche de formations en ligne
-            courses = self._find_online_courses(skill)
-            
             alternatives[skill] = {
-                "similar_skills": similar_skills,
-                "online_courses": courses
+                "similar_skills": similar.get(skill, []),
+                "online_courses": self._find_online_courses(skill)
             }
         
         return alternatives
@@ -30,16 +36,8 @@ class CVSearchService:
         """
         Trouve des compétences similaires dans le profil existant
         """
-        # Implémentation simplifiée - dans un vrai système, utiliser une base de données de compétences
-        similar_skills_map = {
-            "React": ["JavaScript", "TypeScript", "Frontend", "Web Development"],
-            "Node.js": ["JavaScript", "Backend", "API Development"],
-            "Python": ["Django", "Flask", "Data Analysis", "Automation"],
-            "Machine Learning": ["Data Science", "AI", "Python", "Statistics"],
-            # Ajouter d'autres mappings...
-        }
-        
-        return similar_skills_map.get(target_skill, [])
+        # Voisins par co-occurrence dans les profils et les offres (`manage.py build_skill_index`)
+        return skill_index.similar_skills([target_skill], existing_skills).get(target_skill, [])
     
     def _find_online_courses(self, skill):
         """
@@ -53,7 +51,7 @@ class CVSearchService:
             "Machine Learning": ["Machine Learning A-Z", "Coursera Machine Learning"],
         }
         
-        return courses_map.get(skill, [f"Cours {skill} sur les plateformes d'apprentissage"])
+        return courses_map.get(get_matcher().canonical(skill), [f"Cours {skill} sur les plateformes d'apprentissage"])
     
     def search_industry_trends(self, job_title):
         """
@@ -69,7 +67,7 @@ class CVSearchService:
                     'q': f"{job_title} tendances 2024 compétences requises"
                 }
                 
-                response = requests.get(url, params=params)
+                response = resilience.call('google_cse', lambda: _google_search(url, params))
                 if response.status_code == 200:
                     return response.json().get('items', [])[:3]  # Retourner les 3 premiers résultats
             except:
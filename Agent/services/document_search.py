@@ -0,0 +1,71 @@
+import re
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Nombre maximum de termes pris en compte dans une recherche
+MAX_TERMS = 10
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# Poids FTS5 (bm25) des colonnes titre, poste, entreprise, contenu
+SQLITE_WEIGHTS = '10.0, 10.0, 5.0, 1.0'
+
+
+def _terms(text):
+    return TERM_RE.findall(text.lower())[:MAX_TERMS]
+
+
+def _postgres_search(queryset, terms):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    return queryset.annotate(
+        search_match=RawSQL(f"{table}.search_vector @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField()),
+        search_rank=RawSQL(f"ts_rank({table}.search_vector, to_tsquery('simple', %s))", [tsquery], output_field=FloatField()),
+    ).filter(search_match=True)
+
+
+def _sqlite_search(queryset, terms):
+    match = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    return queryset.filter(
+        id__in=RawSQL('SELECT rowid FROM agent_document_fts WHERE agent_document_fts MATCH %s', [match])
+    ).annotate(
+        search_rank=RawSQL(
+            f'SELECT -bm25(agent_document_fts, {SQLITE_WEIGHTS}) FROM agent_document_fts '
+            f'WHERE agent_document_fts MATCH %s AND rowid = {table}.id',
+            [match], output_field=FloatField(),
+        ),
+    )
+
+
+def _fallback_search(queryset, terms):
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(titre__icontains=term) | Q(poste__icontains=term) |
+            Q(entreprise__icontains=term) | Q(contenu__icontains=term)
+        )
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def search_documents(queryset, text):
+    """
+    Filtre un queryset de Document sur une recherche plein texte.
+
+    Chaque terme est cherché en préfixe (« ingé » trouve « ingénieur ») dans
+    le titre, le poste, l'entreprise et le contenu ; tous les termes doivent
+    être présents. Le queryset retourné porte une annotation `search_rank`
+    (plus grand = plus pertinent), utilisable comme premier champ d'ordre
+    d'une pagination par curseur.
+    """
+    terms = _terms(text)
+    if not terms:
+        # Aucun mot cherchable (« " », « -- ») : aucun résultat, mais le même
+        # ordre que les autres recherches reste possible
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    if connection.vendor == 'postgresql':
+        return _postgres_search(queryset, terms)
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(queryset, terms)
+    return _fallback_search(queryset, terms)
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from Agent.models import CacheCounter, GenerationCacheEntry
+from Agent.services.prompt_budget import budget_for
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = 'generation'
+
+
+def _normalize_text(value):
+    """Espaces compactés, sans espaces de bord"""
+    return re.sub(r'\s+', ' ', str(value or '')).strip()
+
+
+def _normalize_label(value):
+    """Comme _normalize_text, sans tenir compte de la casse"""
+    return _normalize_text(value).casefold()
+
+
+def _normalize_json(value):
+    """Normalise récursivement les structures JSON (expériences, formations)"""
+    if isinstance(value, dict):
+        return {key: _normalize_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_json(item) for item in value]
+    if isinstance(value, str):
+        return _normalize_text(value)
+    return value
+
+
+def make_key(document_type, target_role, company, keywords, tone, job_description, user_data, context, langue, template_utilise):
+    """
+    Empreinte SHA-256 des entrées normalisées de _get_prompt.
+
+    Deux soumissions qui ne diffèrent que par la casse du poste, l'ordre des
+    compétences ou des espaces produisent la même clé.
+    """
+    skills = sorted({_normalize_label(skill) for skill in user_data.get('skills', []) if _normalize_text(skill)})
+    normalized = {
+        'document_type': document_type,
+        'target_role': _normalize_label(target_role),
+        'company': _normalize_label(company),
+        'keywords': _normalize_label(keywords),
+        'tone': _normalize_label(tone),
+        'langue': _normalize_label(langue),
+        'template_utilise': _normalize_label(template_utilise),
+        'job_description': _normalize_text(job_description),
+        'context': _normalize_text(context),
+        'name': _normalize_text(user_data.get('name')),
+        'email': _normalize_label(user_data.get('email')),
+        'linkedin_url': _normalize_text(user_data.get('linkedin_url')),
+        'github_url': _normalize_text(user_data.get('github_url')),
+        'telephone': _normalize_text(user_data.get('telephone')),
+        'skills': skills,
+        'experiences': _normalize_json(user_data.get('experiences', [])),
+        'education': _normalize_json(user_data.get('education', [])),
+        # Le prompt compacté dépend du budget de tokens configuré
+        'prompt_budget': budget_for(document_type),
+    }
+    encoded = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def lookup(key):
+    """Retourne le contenu en cache pour cette clé, ou None (absent ou expiré)"""
+    if not settings.GENERATION_CACHE_ENABLED:
+        return None
+    now = timezone.now()
+    expires_before = now - timedelta(seconds=settings.GENERATION_CACHE_TTL)
+    entry = GenerationCacheEntry.objects.filter(cle=key, date_creation__gte=expires_before).only('id', 'contenu').first()
+    CacheCounter.record(CACHE_NAME, hit=entry is not None)
+    if entry is None:
+        logger.debug(f"Generation cache miss: {key[:12]}")
+        return None
+    GenerationCacheEntry.objects.filter(id=entry.id).update(hits=F('hits') + 1, dernier_acces=now)
+    logger.info(f"Generation cache hit: {key[:12]}")
+    return entry.contenu
+
+
+def store(key, document_type, contenu):
+    """Enregistre un contenu généré puis applique l'éviction TTL + LRU"""
+    if not settings.GENERATION_CACHE_ENABLED:
+        return
+    now = timezone.now()
+    try:
+        GenerationCacheEntry.objects.update_or_create(
+            cle=key,
+            defaults={'type': document_type, 'contenu': contenu, 'date_creation': now, 'dernier_acces': now},
+        )
+    except IntegrityError:
+        # Un autre worker vient d'enregistrer la même clé
+        return
+    evict()
+
+
+def evict():
+    """Supprime les entrées expirées puis les moins récemment utilisées au-delà de la taille max"""
+    expires_before = timezone.now() - timedelta(seconds=settings.GENERATION_CACHE_TTL)
+    expired, _ = GenerationCacheEntry.objects.filter(date_creation__lt=expires_before).delete()
+    overflow = list(
+        GenerationCacheEntry.objects.order_by('-dernier_acces')
+        .values_list('id', flat=True)[settings.GENERATION_CACHE_MAX_ENTRIES:]
+    )
+    if overflow:
+        GenerationCacheEntry.objects.filter(id__in=overflow).delete()
+    if expired or overflow:
+        logger.debug(f"Generation cache eviction: {expired} expired, {len(overflow)} least recently used")
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from Agent.models import CacheCounter, JobAnalysis
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = 'job_analysis'
+
+# À incrémenter à chaque modification de ANALYSIS_PROMPT : les analyses
+# produites par l'ancien prompt ne sont plus servies
+PROMPT_VERSION = 1
+
+# Un seul prompt pour les deux pipelines : il couvre les champs utilisés par
+# CVLogic (compétences, mots-clés) et par LMLogic (valeurs, motivations, ton)
+ANALYSIS_PROMPT = """
+Analysez cette description de poste et extrayez les informations clés:
+
+{job_description}
+
+Entreprise: {company_name}
+
+Veuillez retourner un JSON structuré avec:
+- job_title: le titre du poste
+- required_skills: liste des compétences requises
+- preferred_skills: liste des compétences préférées
+- experience_level: niveau d'expérience requis
+- keywords: mots-clés importants
+- company_culture: indices sur la culture d'entreprise
+- company_values: valeurs probables de l'entreprise
+- job_requirements: exigences principales du poste
+- motivation_triggers: éléments qui pourraient motiver un candidat
+- tone_suggestion: ton approprié pour la lettre (formel, enthousiaste, etc.)
+"""
+
+FALLBACK_ANALYSIS = {
+    "job_title": "Poste analysé",
+    "required_skills": [],
+    "preferred_skills": [],
+    "experience_level": "Non spécifié",
+    "keywords": [],
+    "company_culture": "Non spécifié",
+    "company_values": ["Excellence", "Innovation", "Collaboration"],
+    "job_requirements": [],
+    "motivation_triggers": [],
+    "tone_suggestion": "professionnel",
+}
+
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+
+def extract_company_name(text):
+    """Tente d'extraire le nom de l'entreprise du texte"""
+    # Implémentation simplifiée - utiliser NER dans une version réelle
+    patterns = [
+        r"chez\s+([A-Z][a-zA-Z\s&]+)",
+        r"à\s+([A-Z][a-zA-Z\s&]+)",
+        r"entreprise\s+([A-Z][a-zA-Z\s&]+)",
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text or '', re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+    return "Cette entreprise"
+
+
+def normalize_job_description(job_description):
+    """Offre sans différences de casse ni d'espaces"""
+    return re.sub(r'\s+', ' ', job_description or '').strip().casefold()
+
+
+def make_key(job_description):
+    raw = f"{PROMPT_VERSION}\x00{normalize_job_description(job_description)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def parse_analysis(result):
+    """Extrait le JSON de la réponse du LLM ; None si elle n'en contient pas"""
+    json_match = re.search(r'\{.*\}', result or '', re.DOTALL)
+    if not json_match:
+        return None
+    try:
+        analysis = json.loads(json_match.group())
+    except ValueError:
+        return None
+    return analysis if isinstance(analysis, dict) else None
+
+
+def run_llm_analysis(llm, job_description, company_name):
+    """Analyse une offre avec un LLM LangChain"""
+    from langchain import PromptTemplate
+    from langchain.chains import LLMChain
+
+    prompt_template = PromptTemplate(
+        input_variables=["job_description", "company_name"],
+        template=ANALYSIS_PROMPT,
+    )
+    chain = LLMChain(llm=llm, prompt=prompt_template)
+    return parse_analysis(chain.run(job_description=job_description, company_name=company_name))
+
+
+def _key_lock(key):
+    with _key_locks_lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def _release_key_lock(key, lock):
+    with _key_locks_lock:
+        if _key_locks.get(key) is lock and not lock.locked():
+            del _key_locks[key]
+
+
+def _lookup(key):
+    entry = JobAnalysis.objects.filter(cle=key).only('id', 'analyse').first()
+    if entry is not None:
+        JobAnalysis.objects.filter(id=entry.id).update(hits=F('hits') + 1, dernier_acces=timezone.now())
+        return entry.analyse
+    return None
+
+
+def cached_analyses(job_descriptions):
+    """
+    Analyses déjà enregistrées pour des offres : {offre: analyse}.
+
+    Aucun appel au LLM et aucun compteur de hits : utilisé par le scoring,
+    qui tourne en ligne et en masse.
+    """
+    offers = {make_key(job_description): job_description for job_description in job_descriptions if job_description}
+    rows = JobAnalysis.objects.filter(cle__in=offers).values_list('cle', 'analyse')
+    return {offers[cle]: analyse for cle, analyse in rows}
+
+
+def get_analysis(job_description, analyze):
+    """
+    Analyse d'une offre, calculée une seule fois par offre distincte.
+
+    `analyze(job_description)` n'est appelé qu'en l'absence d'analyse pour
+    l'empreinte de l'offre normalisée ; les appels concurrents du même
+    processus attendent le premier. Une réponse illisible (None) n'est pas
+    enregistrée et donne l'analyse par défaut.
+    """
+    key = make_key(job_description)
+    analysis = _lookup(key)
+    if analysis is None:
+        lock = _key_lock(key)
+        try:
+            with lock:
+                analysis = _lookup(key)
+                if analysis is None:
+                    CacheCounter.record(CACHE_NAME, hit=False)
+                    logger.info(f"Job analysis cache miss: {key[:12]}")
+                    analysis = analyze(job_description)
+                    if analysis is None:
+                        return dict(FALLBACK_ANALYSIS)
+                    try:
+                        JobAnalysis.objects.create(cle=key, version_prompt=PROMPT_VERSION, analyse=analysis)
+                    except IntegrityError:
+                        pass  # Enregistrée entre-temps par un autre processus
+                    return {**FALLBACK_ANALYSIS, **analysis}
+        finally:
+            _release_key_lock(key, lock)
+    CacheCounter.record(CACHE_NAME, hit=True)
+    logger.debug(f"Job analysis cache hit: {key[:12]}")
+    return {**FALLBACK_ANALYSIS, **analysis}
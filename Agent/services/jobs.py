@@ -0,0 +1,222 @@
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from Agent.models import Document, EtapeTraitement, GenerationJob
+from Agent.services import metrics
+from Agent.services.pipeline import run_generation
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_generation(document, payload):
+    """Ajoute un job de génération en file et marque le document en attente"""
+    document.statut = 'pending'
+    document.save(update_fields=['statut', 'date_mise_a_jour'])
+    job = GenerationJob.objects.create(document=document, payload=payload)
+    logger.info(f"Generation job {job.id} queued for document {document.id}")
+    return job
+
+
+def claim_next_job(worker_name):
+    """
+    Réserve le prochain job disponible pour ce worker.
+
+    La réservation est un UPDATE conditionnel sur le statut : si un autre
+    worker a pris le job entre la lecture et l'écriture, on passe au suivant.
+    """
+    now = timezone.now()
+    candidates = (
+        GenerationJob.objects
+        .filter(statut='pending')
+        .exclude(executer_apres__gt=now)
+        .order_by('date_creation')
+        .values_list('id', flat=True)[:10]
+    )
+    for job_id in candidates:
+        claimed = GenerationJob.objects.filter(id=job_id, statut='pending').update(
+            statut='processing',
+            worker=worker_name,
+            date_verrouillage=now,
+            date_mise_a_jour=now,
+        )
+        if claimed:
+            return GenerationJob.objects.select_related('document', 'document__user').get(id=job_id)
+    return None
+
+
+def refresh_lock(job):
+    """Prolonge le verrou d'un job encore détenu par son worker ; False s'il a été repris"""
+    return bool(GenerationJob.objects.filter(id=job.id, statut='processing', worker=job.worker).update(
+        date_verrouillage=timezone.now(),
+    ))
+
+
+@contextmanager
+def heartbeat(job, interval=None):
+    """
+    Rafraîchit le verrou du job toutes les `interval` secondes pendant le bloc.
+
+    Un job long mais vivant (réessais du LLM, attente du limiteur de débit,
+    mise à jour section par section) n'est ainsi jamais pris pour abandonné
+    par requeue_stale_jobs, qui ne reprend que les verrous non rafraîchis
+    depuis GENERATION_JOB_LOCK_TIMEOUT.
+    """
+    interval = interval or settings.GENERATION_JOB_HEARTBEAT_INTERVAL
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    if not refresh_lock(job):
+                        logger.warning(f"Job {job.id} lock lost by worker {job.worker}")
+                        return
+                except Exception as e:
+                    logger.warning(f"Could not refresh lock of job {job.id}: {str(e)}")
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"generation-job-{job.id}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def process_job(job):
+    """Exécute un job réservé et enregistre son résultat, sa durée et ses requêtes SQL"""
+    started = time.perf_counter()
+    with metrics.track_db() as db, heartbeat(job):
+        job = _run_job(job)
+    outcome = job.statut if job.statut in ('completed', 'error') else 'retry'
+    metrics.JOB_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+    metrics.JOB_DB_SECONDS.observe(db[0], outcome=outcome)
+    metrics.JOB_DB_QUERIES.observe(db[1], outcome=outcome)
+    return job
+
+
+def _run_job(job):
+    job.tentatives += 1
+    job.save(update_fields=['tentatives', 'date_mise_a_jour'])
+    document = job.document
+    try:
+        run_generation(document, job.payload)
+    except Exception as e:
+        max_attempts = settings.GENERATION_JOB_MAX_ATTEMPTS
+        job.erreur = str(e)
+        if job.tentatives < max_attempts:
+            # Nouvel essai avec un délai croissant
+            job.statut = 'pending'
+            job.executer_apres = timezone.now() + timedelta(seconds=30 * job.tentatives)
+            document.statut = 'pending'
+            logger.warning(f"Job {job.id} failed (attempt {job.tentatives}/{max_attempts}), retrying: {str(e)}")
+        else:
+            job.statut = 'error'
+            document.statut = 'error'
+            logger.error(f"Job {job.id} failed after {job.tentatives} attempts: {str(e)}")
+        job.save(update_fields=['statut', 'erreur', 'executer_apres', 'date_mise_a_jour'])
+        document.save(update_fields=['statut', 'date_mise_a_jour'])
+        return job
+
+    job.statut = 'completed'
+    job.erreur = ''
+    job.save(update_fields=['statut', 'erreur', 'date_mise_a_jour'])
+    logger.info(f"Job {job.id} completed for document {document.id}")
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    Remet en file les jobs dont le worker a disparu pendant le traitement :
+    un worker vivant rafraîchit son verrou (heartbeat), seul un verrou resté
+    sans nouvelle depuis GENERATION_JOB_LOCK_TIMEOUT est repris.
+
+    Le document repasse en attente et ses étapes restées 'processing' sont
+    remises à zéro, pour que la progression affichée corresponde à la file.
+    """
+    limit = timezone.now() - timedelta(seconds=settings.GENERATION_JOB_LOCK_TIMEOUT)
+    stale = GenerationJob.objects.filter(statut='processing', date_verrouillage__lt=limit)
+    count = 0
+    for job_id, document_id in stale.values_list('id', 'document_id'):
+        # Réservation conditionnelle : le job a pu se terminer depuis la lecture
+        if not stale.filter(id=job_id).update(statut='pending', worker='', date_verrouillage=None):
+            continue
+        count += 1
+        # save() plutôt que update() : les compteurs du tableau de bord suivent les signaux
+        document = Document.objects.only('id', 'user_id', 'type', 'statut', 'score').get(id=document_id)
+        if document.statut != 'pending':
+            document.statut = 'pending'
+            document.save(update_fields=['statut', 'date_mise_a_jour'])
+        EtapeTraitement.objects.filter(document_id=document_id, statut='processing').update(
+            statut='pending', details='', date_debut=None, date_fin=None
+        )
+    if count:
+        logger.warning(f"{count} stale generation job(s) requeued")
+    return count
+
+
+def worker_loop(worker_name, stop_event, poll_interval=1.0, once=False, sweep_interval=None):
+    """
+    Boucle d'un thread worker : réserve et traite les jobs jusqu'à l'arrêt.
+
+    Toutes les `sweep_interval` secondes, les jobs abandonnés par un worker
+    disparu sont remis en file, sans attendre le redémarrage d'un pool.
+    """
+    sweep_interval = sweep_interval or settings.GENERATION_JOB_SWEEP_INTERVAL
+    next_sweep = time.monotonic() + sweep_interval
+    logger.info(f"Worker {worker_name} started")
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            if time.monotonic() >= next_sweep:
+                requeue_stale_jobs()
+                next_sweep = time.monotonic() + sweep_interval
+            job = claim_next_job(worker_name)
+            if job is None:
+                if once:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+            process_job(job)
+    finally:
+        connection.close()
+        logger.info(f"Worker {worker_name} stopped")
+
+
+def run_worker_pool(threads=None, poll_interval=1.0, once=False, stop_event=None):
+    """Lance un pool local de threads workers et attend leur arrêt"""
+    threads = threads or settings.GENERATION_WORKER_THREADS
+    stop_event = stop_event or threading.Event()
+    requeue_stale_jobs()
+
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    pool = [
+        threading.Thread(
+            target=worker_loop,
+            args=(f"{prefix}:{i}", stop_event, poll_interval, once),
+            name=f"generation-worker-{i}",
+            daemon=True,
+        )
+        for i in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    try:
+        for thread in pool:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        logger.info("Stopping generation workers...")
+        stop_event.set()
+        for thread in pool:
+            thread.join()
+    return pool
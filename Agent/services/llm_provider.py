@@ -0,0 +1,464 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import weakref
+import httpx
+from asgiref.sync import sync_to_async
+from decouple import config, UndefinedValueError
+from django.conf import settings
+from Agent.services import metrics, rate_limit
+
+logger = logging.getLogger(__name__)
+
+# Statuts HTTP pour lesquels une nouvelle tentative ne sert à rien (requête ou clé invalide)
+NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}
+# Plafond du délai entre deux tentatives, en secondes
+MAX_RETRY_DELAY = 8.0
+
+
+class LLMError(Exception):
+    """Échec d'un appel LLM ; `retryable` indique si une nouvelle tentative a un sens"""
+    retryable = False
+
+
+class TransientLLMError(LLMError):
+    retryable = True
+
+
+# Clients HTTP poolés : un client synchrone partagé par tous les threads
+# (httpx.Client est thread-safe), un client asynchrone par boucle d'événements
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def http_client():
+    """Client httpx synchrone du processus (connexions keep-alive réutilisées)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=10.0),
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                    ),
+                )
+    return _client
+
+
+def async_http_client():
+    """Retourne le client httpx de la boucle courante (connexions keep-alive réutilisées)"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.ASYNC_HTTP_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.ASYNC_HTTP_MAX_CONNECTIONS,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _api_key(name):
+    try:
+        return config(name)
+    except UndefinedValueError as e:
+        raise LLMError(f"Missing environment variable: {str(e)}") from e
+
+
+def _sse_data(lines):
+    """Charges JSON d'un flux server-sent events (lignes « data: ... »)"""
+    for line in lines:
+        if line.startswith('data:'):
+            data = line[5:].strip()
+            if data and data != '[DONE]':
+                yield json.loads(data)
+
+
+class LLMProvider:
+    """
+    Fournisseur LLM : `generate`, `stream` et `agenerate` pour un modèle donné.
+
+    Les instances sont partagées par les threads (voir get_provider) et ne
+    gardent aucun état propre à un appel.
+    """
+    name = ''
+    default_model = ''
+    # Nom du limiteur de débit (RATE_LIMITS) partagé par les modèles du fournisseur
+    rate_limit = None
+
+    def __init__(self, model=None, temperature=None, max_tokens=None):
+        self.model = model or self.default_model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def __str__(self):
+        return f"{self.name}:{self.model}"
+
+    def generate(self, prompt, timeout):
+        raise NotImplementedError
+
+    def stream(self, prompt, timeout):
+        yield self.generate(prompt, timeout)
+
+    async def agenerate(self, prompt, timeout):
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    """API REST Gemini (generateContent / streamGenerateContent)"""
+    name = 'gemini'
+    default_model = 'gemini-1.5-flash'
+    rate_limit = 'gemini'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.headers = {'x-goog-api-key': _api_key('GEMINI_API_KEY')}
+
+    def _url(self, method):
+        return f"{settings.GEMINI_API_BASE_URL}/v1beta/models/{self.model}:{method}"
+
+    def _body(self, prompt):
+        body = {'contents': [{'parts': [{'text': prompt}]}]}
+        generation_config = {}
+        if self.temperature is not None:
+            generation_config['temperature'] = self.temperature
+        if self.max_tokens is not None:
+            generation_config['maxOutputTokens'] = self.max_tokens
+        if generation_config:
+            body['generationConfig'] = generation_config
+        return body
+
+    @staticmethod
+    def _text(data):
+        candidates = data.get('candidates', [])
+        if not candidates:
+            return None
+        parts = candidates[0].get('content', {}).get('parts', [])
+        return ''.join(part.get('text', '') for part in parts)
+
+    def generate(self, prompt, timeout):
+        response = http_client().post(self._url('generateContent'), headers=self.headers, json=self._body(prompt), timeout=timeout)
+        response.raise_for_status()
+        text = self._text(response.json())
+        if text is None:
+            raise LLMError("Gemini returned no candidates")
+        return text
+
+    def stream(self, prompt, timeout):
+        with http_client().stream(
+            'POST', self._url('streamGenerateContent'), params={'alt': 'sse'},
+            headers=self.headers, json=self._body(prompt), timeout=timeout,
+        ) as response:
+            response.raise_for_status()
+            for data in _sse_data(response.iter_lines()):
+                text = self._text(data)
+                if text:
+                    yield text
+
+    async def agenerate(self, prompt, timeout):
+        response = await async_http_client().post(self._url('generateContent'), headers=self.headers, json=self._body(prompt), timeout=timeout)
+        response.raise_for_status()
+        text = self._text(response.json())
+        if text is None:
+            raise LLMError("Gemini returned no candidates")
+        return text
+
+
+class OpenAIProvider(LLMProvider):
+    """API REST OpenAI (chat/completions)"""
+    name = 'openai'
+    default_model = 'gpt-4'
+    rate_limit = 'openai'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.headers = {'Authorization': f"Bearer {settings.OPENAI_API_KEY}"}
+        self.url = f"{settings.OPENAI_API_BASE_URL}/v1/chat/completions"
+
+    def _body(self, prompt, stream=False):
+        body = {'model': self.model, 'messages': [{'role': 'user', 'content': prompt}]}
+        if self.temperature is not None:
+            body['temperature'] = self.temperature
+        if self.max_tokens is not None:
+            body['max_tokens'] = self.max_tokens
+        if stream:
+            body['stream'] = True
+        return body
+
+    @staticmethod
+    def _text(data):
+        choices = data.get('choices', [])
+        if not choices:
+            raise LLMError("OpenAI returned no choices")
+        return choices[0].get('message', {}).get('content') or ''
+
+    def generate(self, prompt, timeout):
+        response = http_client().post(self.url, headers=self.headers, json=self._body(prompt), timeout=timeout)
+        response.raise_for_status()
+        return self._text(response.json())
+
+    def stream(self, prompt, timeout):
+        with http_client().stream('POST', self.url, headers=self.headers, json=self._body(prompt, stream=True), timeout=timeout) as response:
+            response.raise_for_status()
+            for data in _sse_data(response.iter_lines()):
+                for choice in data.get('choices', []):
+                    text = choice.get('delta', {}).get('content')
+                    if text:
+                        yield text
+
+    async def agenerate(self, prompt, timeout):
+        response = await async_http_client().post(self.url, headers=self.headers, json=self._body(prompt), timeout=timeout)
+        response.raise_for_status()
+        return self._text(response.json())
+
+
+class StubProvider(LLMProvider):
+    """
+    Fournisseur local déterministe, sans réseau : même prompt, même réponse.
+
+    Sert aux benchmarks et aux tests hors ligne. La réponse reprend les
+    compétences citées dans le prompt (JSON si le prompt en demande un),
+    après LLM_STUB_LATENCY secondes. Le modèle « error » échoue toujours,
+    pour exercer les nouvelles tentatives et les fournisseurs de secours.
+    """
+    name = 'stub'
+    default_model = 'default'
+    CHUNK_SIZE = 80
+
+    def _respond(self, prompt):
+        from Agent.services.skills import extract_skills
+
+        if self.model == 'error':
+            raise TransientLLMError("stub:error always fails")
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        skills = extract_skills(prompt)
+        if 'json' in prompt.lower():
+            return json.dumps({'required_skills': skills[:10], 'keywords': skills[10:20], 'stub': digest}, ensure_ascii=False)
+        lines = [f"# Document {digest}", "", "## Skills"]
+        lines += [f"- {skill}" for skill in skills] or ["- N/A"]
+        lines += ["", "## Professional Experience", f"- Generated offline by the stub provider ({len(prompt)} characters of prompt)"]
+        return '\n'.join(lines) + '\n'
+
+    def _latency(self, timeout):
+        latency = settings.LLM_STUB_LATENCY
+        if latency > timeout:
+            return timeout, TransientLLMError(f"stub timed out after {timeout}s")
+        return latency, None
+
+    def generate(self, prompt, timeout):
+        delay, error = self._latency(timeout)
+        time.sleep(delay)
+        if error:
+            raise error
+        return self._respond(prompt)
+
+    def stream(self, prompt, timeout):
+        text = self.generate(prompt, timeout)
+        for start in range(0, len(text), self.CHUNK_SIZE):
+            yield text[start:start + self.CHUNK_SIZE]
+
+    async def agenerate(self, prompt, timeout):
+        delay, error = self._latency(timeout)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return self._respond(prompt)
+
+
+PROVIDERS = {provider.name: provider for provider in (GeminiProvider, OpenAIProvider, StubProvider)}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(spec, temperature=None, max_tokens=None):
+    """Fournisseur partagé pour « nom:modèle » (« gemini:gemini-1.5-flash », « stub »...)"""
+    key = (spec, temperature, max_tokens)
+    provider = _providers.get(key)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(key)
+            if provider is None:
+                name, _, model = spec.strip().partition(':')
+                if name not in PROVIDERS:
+                    raise LLMError(f"Unknown LLM provider: {spec}")
+                provider = _providers[key] = PROVIDERS[name](model or None, temperature, max_tokens)
+    return provider
+
+
+def provider_specs(primary=None, fallbacks=None):
+    """Fournisseur principal puis fournisseurs de secours, sans doublon"""
+    primary = primary or settings.LLM_PROVIDER
+    if fallbacks is None:
+        fallbacks = settings.LLM_FALLBACK_PROVIDERS.split(',')
+    specs = [primary]
+    for spec in fallbacks:
+        spec = spec.strip()
+        if spec and spec not in specs:
+            specs.append(spec)
+    return specs
+
+
+def _attempts(specs, temperature=None, max_tokens=None):
+    """(fournisseur, numéro de tentative) dans l'ordre où les essayer"""
+    for spec in specs:
+        try:
+            provider = get_provider(spec, temperature, max_tokens)
+        except LLMError as e:
+            logger.error(f"LLM provider {spec} unavailable: {str(e)}")
+            continue
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            yield provider, attempt
+
+
+def _retryable(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code not in NON_RETRYABLE_STATUS
+    if isinstance(error, httpx.TransportError):
+        return True  # délai dépassé, connexion refusée ou coupée
+    return getattr(error, 'retryable', False)
+
+
+def _throttled(error):
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429
+
+
+def _observe(provider, started, error=None):
+    """Compte une tentative et sa durée (l'attente du limiteur de débit n'en fait pas partie)"""
+    if error is None:
+        outcome = 'ok'
+    elif _throttled(error):
+        outcome = 'throttled'
+    elif isinstance(error, rate_limit.RateLimitExceeded):
+        outcome = 'rate_limited'
+    elif isinstance(error, httpx.TimeoutException):
+        outcome = 'timeout'
+    else:
+        outcome = 'error'
+    metrics.LLM_REQUESTS.inc(provider=provider.name, model=provider.model, outcome=outcome)
+    if started is not None:
+        metrics.LLM_SECONDS.observe(time.perf_counter() - started, provider=provider.name, model=provider.model)
+
+
+def _retry_delay(provider, attempt, error):
+    """
+    Délai avant la prochaine tentative sur `provider`, ou None pour passer au suivant.
+
+    Backoff exponentiel avec jitter complet : les workers qui échouent en
+    même temps ne réessaient pas en même temps.
+    """
+    if attempt < settings.LLM_MAX_RETRIES and _retryable(error):
+        delay = random.uniform(0, min(MAX_RETRY_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt))
+        logger.warning(f"LLM call to {provider} failed ({type(error).__name__}: {error}), retry {attempt + 1} in {delay:.2f}s")
+        return delay
+    logger.warning(f"LLM call to {provider} failed ({type(error).__name__}: {error}), trying next provider")
+    return None
+
+
+def complete(prompt, specs=None, timeout=None, temperature=None, max_tokens=None):
+    """
+    Texte généré pour `prompt`, par le premier fournisseur qui répond.
+
+    Chaque appel attend son tour auprès du limiteur de débit du fournisseur
+    et est borné par `timeout` (LLM_TIMEOUT par défaut) ; les erreurs
+    transitoires sont réessayées LLM_MAX_RETRIES fois par fournisseur, puis
+    les fournisseurs de secours prennent le relais.
+    Lève LLMError si tous échouent.
+    """
+    timeout = timeout or settings.LLM_TIMEOUT
+    last_error, skipped = None, None
+    for provider, attempt in _attempts(specs or provider_specs(), temperature, max_tokens):
+        if provider is skipped:
+            continue
+        started = None
+        try:
+            with rate_limit.acquire(provider.rate_limit):
+                started = time.perf_counter()
+                content = provider.generate(prompt, timeout)
+            _observe(provider, started)
+            return content
+        except Exception as e:
+            _observe(provider, started, e)
+            last_error = e
+            if _throttled(e):
+                rate_limit.throttled(provider.rate_limit)
+            delay = _retry_delay(provider, attempt, e)
+            if delay is None:
+                skipped = provider
+            else:
+                time.sleep(delay)
+    raise LLMError(f"All LLM providers failed: {last_error}") from last_error
+
+
+def stream(prompt, specs=None, timeout=None, temperature=None, max_tokens=None):
+    """
+    Variante streamée de complete : produit les morceaux de texte au fil de l'eau.
+
+    `timeout` borne l'attente de chaque morceau. Les nouvelles tentatives et
+    les secours ne s'appliquent qu'avant le premier morceau : une fois du
+    texte transmis, une erreur est remontée telle quelle (LLMError).
+    """
+    timeout = timeout or settings.LLM_TIMEOUT
+    last_error, skipped = None, None
+    for provider, attempt in _attempts(specs or provider_specs(), temperature, max_tokens):
+        if provider is skipped:
+            continue
+        started, first_chunk = None, False
+        try:
+            with rate_limit.acquire(provider.rate_limit):
+                started = time.perf_counter()
+                for chunk in provider.stream(prompt, timeout):
+                    first_chunk = True
+                    yield chunk
+            _observe(provider, started)
+            return
+        except Exception as e:
+            _observe(provider, started, e)
+            if first_chunk:
+                raise LLMError(f"LLM stream from {provider} interrupted: {e}") from e
+            last_error = e
+            if _throttled(e):
+                rate_limit.throttled(provider.rate_limit)
+            delay = _retry_delay(provider, attempt, e)
+            if delay is None:
+                skipped = provider
+            else:
+                time.sleep(delay)
+    raise LLMError(f"All LLM providers failed: {last_error}") from last_error
+
+
+async def acomplete(prompt, specs=None, timeout=None, temperature=None, max_tokens=None):
+    """Variante asynchrone de complete (client httpx de la boucle courante)"""
+    timeout = timeout or settings.LLM_TIMEOUT
+    last_error, skipped = None, None
+    for provider, attempt in _attempts(specs or provider_specs(), temperature, max_tokens):
+        if provider is skipped:
+            continue
+        started = None
+        try:
+            async with rate_limit.aacquire(provider.rate_limit):
+                started = time.perf_counter()
+                content = await provider.agenerate(prompt, timeout)
+            _observe(provider, started)
+            return content
+        except Exception as e:
+            _observe(provider, started, e)
+            last_error = e
+            if _throttled(e):
+                await sync_to_async(rate_limit.throttled)(provider.rate_limit)
+            delay = _retry_delay(provider, attempt, e)
+            if delay is None:
+                skipped = provider
+            else:
+                await asyncio.sleep(delay)
+    raise LLMError(f"All LLM providers failed: {last_error}") from last_error
@@ -0,0 +1,200 @@
+"""
+Journalisation non bloquante : les vues et les workers déposent leurs
+enregistrements dans une file bornée, un thread d'arrière-plan les écrit
+(fichier JSON, console).
+
+Branché par LOGGING dans CV/settings.py ; ce module ne dépend que de la
+bibliothèque standard (il est importé par logging.config, avant le chargement
+des applications Django).
+"""
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+REDACTED = '[redacted]'
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+
+# Attributs posés par logging lui-même : tout le reste vient de `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS and not key.startswith('_')}
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement ; les champs passés par `extra=` sont conservés"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        entry.update(extra_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RedactionFilter(logging.Filter):
+    """
+    Masque les champs sensibles des enregistrements : en-têtes (cookies,
+    jetons) et données de profil passés par `extra=`, à toute profondeur,
+    ainsi que les adresses e-mail du message.
+    """
+
+    def __init__(self, fields=()):
+        super().__init__()
+        self.fields = {field.lower() for field in fields}
+
+    def redact(self, value):
+        if isinstance(value, dict):
+            return {
+                key: REDACTED if str(key).lower() in self.fields else self.redact(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, (list, tuple)):
+            return [self.redact(item) for item in value]
+        if isinstance(value, str):
+            return EMAIL_RE.sub(REDACTED, value)
+        return value
+
+    def filter(self, record):
+        for key, value in extra_fields(record).items():
+            setattr(record, key, REDACTED if key.lower() in self.fields else self.redact(value))
+        message = record.getMessage()
+        redacted = EMAIL_RE.sub(REDACTED, message)
+        if redacted != message:
+            record.msg, record.args = redacted, None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Ne garde qu'une fraction des enregistrements DEBUG des loggers chauds.
+
+    `rates` associe un nom de logger (ou un parent : 'Agent.views') à la
+    proportion gardée, entre 0 et 1 ; le parent le plus précis s'applique.
+    INFO et au-dessus passent toujours.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._cache = {}
+
+    def rate(self, name):
+        rate = self._cache.get(name)
+        if rate is None:
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition('.')[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.INFO:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+def _handler_by_name(name):
+    getter = getattr(logging, 'getHandlerByName', None)  # Python 3.12+
+    handler = getter(name) if getter else logging._handlers.get(name)
+    if handler is None:
+        # Message reconnu par dictConfig, qui configure alors ce handler après les autres
+        raise ValueError(f"target not configured yet: {name}")
+    return handler
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Dépose les enregistrements dans une file bornée ; un QueueListener les
+    transmet aux handlers `targets` (noms de handlers de LOGGING) dans un
+    thread d'arrière-plan.
+
+    Une file pleine ne bloque jamais l'appelant : l'enregistrement est
+    perdu et compté, et un avertissement le signale au prochain passage.
+    Le listener démarre au premier enregistrement (et redémarre après un
+    fork) ; logging.shutdown() le vide à la sortie du processus.
+    """
+
+    def __init__(self, targets=(), maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        # Références gardées ici : les handlers cibles ne sont attachés à aucun logger
+        self.targets = [_handler_by_name(name) for name in targets]
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Processus enfant : le thread du parent n'existe plus ici
+                self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Le message est figé ici (les arguments peuvent changer après l'appel) ;
+        # les champs `extra=` restent sur l'enregistrement pour le formatter JSON
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            warning = logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"Log queue full: {dropped} records dropped",
+            })
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                self.dropped += dropped
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'maxsize': self.queue.maxsize, 'dropped': self.dropped}
+
+    def flush_and_stop(self):
+        """Écrit les enregistrements encore en file puis arrête le thread"""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener, self._pid = None, None
+
+    def close(self):
+        self.flush_and_stop()
+        super().close()
@@ -0,0 +1,287 @@
+"""
+Compteurs et histogrammes du pipeline de génération, exportés au format texte
+Prometheus.
+
+Chaque processus compte en mémoire (un verrou et quelques additions par
+événement) ; un thread écrit régulièrement son instantané dans METRICS_DIR
+(un fichier JSON par processus, remplacé atomiquement) et l'export additionne
+les fichiers de tous les processus de la machine. Les fichiers des processus
+arrêtés sont gardés : leurs compteurs restent dans les totaux. METRICS_DIR
+est à vider au déploiement.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+# Bornes (secondes) des histogrammes de latence
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LLM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+TOKEN_BUCKETS = (250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        _ensure_flusher()
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Histogramme à bornes fixes : par jeu de labels, compte par intervalle, somme et nombre"""
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        _ensure_flusher()
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+
+SEARCH_REQUESTS = Counter(
+    'cvagent_search_requests_total', "Requêtes aux fournisseurs de recherche, par issue",
+    ('provider', 'outcome'),
+)
+SEARCH_SECONDS = Histogram('cvagent_search_request_seconds', "Durée des requêtes de recherche abouties", ('provider',))
+LLM_REQUESTS = Counter('cvagent_llm_requests_total', "Appels aux LLM, par modèle et issue", ('provider', 'model', 'outcome'))
+LLM_SECONDS = Histogram('cvagent_llm_request_seconds', "Durée des appels aux LLM", ('provider', 'model'), LLM_BUCKETS)
+PROMPT_TOKENS = Histogram('cvagent_prompt_tokens', "Taille des prompts envoyés (tokens estimés)", ('document_type',), TOKEN_BUCKETS)
+PDF_RENDER_SECONDS = Histogram('cvagent_pdf_render_seconds', "Durée du rendu PDF d'un document")
+CACHE_EVENTS = Counter('cvagent_cache_events_total', "Hits et misses des caches", ('cache', 'result'))
+DOCUMENT_STATUS = Counter(
+    'cvagent_document_status_total', "Passages des documents à un statut (Document.statut)",
+    ('type', 'statut'),
+)
+REQUEST_SECONDS = Histogram('cvagent_http_request_seconds', "Durée des requêtes HTTP, par vue", ('view',))
+REQUEST_DB_SECONDS = Histogram('cvagent_http_request_db_seconds', "Temps passé en base par requête HTTP", ('view',))
+REQUEST_DB_QUERIES = Histogram(
+    'cvagent_http_request_db_queries', "Nombre de requêtes SQL par requête HTTP", ('view',), QUERY_BUCKETS,
+)
+GENERATIONS = Counter(
+    'cvagent_generations_total', "Générations de documents, par mode (full, incremental, unchanged)", ('mode',),
+)
+JOB_SECONDS = Histogram('cvagent_generation_job_seconds', "Durée des jobs de génération, par issue", ('outcome',), LLM_BUCKETS)
+JOB_DB_SECONDS = Histogram('cvagent_generation_job_db_seconds', "Temps passé en base par job de génération", ('outcome',))
+JOB_DB_QUERIES = Histogram(
+    'cvagent_generation_job_db_queries', "Nombre de requêtes SQL par job de génération", ('outcome',), QUERY_BUCKETS,
+)
+
+# [secondes, requêtes SQL] du travail en cours (requête HTTP, job) ; le contexte
+# suit ce travail dans les threads de sync_to_async
+_db_totals = ContextVar('db_totals', default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    totals = _db_totals.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += time.perf_counter() - started
+        totals[1] += 1
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    """Chaque nouvelle connexion chronomètre ses requêtes quand elles servent un bloc track_db()"""
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+@contextmanager
+def track_db():
+    """Cumule dans [secondes, requêtes] le temps et le nombre de requêtes SQL exécutées dans le bloc"""
+    totals = [0.0, 0]
+    token = _db_totals.set(totals)
+    try:
+        yield totals
+    finally:
+        _db_totals.reset(token)
+
+
+def snapshot():
+    return {
+        metric.name: {'type': metric.type, 'help': metric.help, 'labels': list(metric.labels),
+                      'buckets': list(getattr(metric, 'buckets', ())), 'samples': metric.snapshot()}
+        for metric in list(REGISTRY.values())
+    }
+
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def _ensure_flusher():
+    """Démarre le thread d'écriture du processus courant (à nouveau après un fork)"""
+    if _flusher_pid == os.getpid() or not settings.METRICS_DIR:
+        return
+    _start_flusher()
+
+
+def _start_flusher():
+    global _flusher_pid
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        if _flusher_pid is not None:
+            # Processus enfant : ses compteurs partent de zéro, sous son propre fichier
+            for metric in list(REGISTRY.values()):
+                with metric._lock:
+                    metric._values.clear()
+        else:
+            atexit.register(flush)
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_loop, args=(_flusher_pid,), name='metrics-flusher', daemon=True).start()
+
+
+def _flush_loop(pid):
+    while _flusher_pid == pid:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            logger.warning(f"Metrics flush failed: {str(e)}")
+
+
+def flush():
+    """Écrit l'instantané du processus dans METRICS_DIR"""
+    if not settings.METRICS_DIR or _flusher_pid != os.getpid():
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def collect():
+    """Métriques additionnées sur tous les processus (ceux de METRICS_DIR et celui-ci)"""
+    snapshots = []
+    writing = _flusher_pid == os.getpid()
+    if settings.METRICS_DIR:
+        flush()
+    if settings.METRICS_DIR and os.path.isdir(settings.METRICS_DIR):
+        own = f'{os.getpid()}.json'
+        for name in os.listdir(settings.METRICS_DIR):
+            # Sans thread d'écriture, un fichier à notre pid vient d'un ancien processus
+            if not name.endswith('.json') or (name == own and not writing):
+                continue
+            try:
+                with open(os.path.join(settings.METRICS_DIR, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # Fichier en cours de suppression ou illisible
+    if not writing:
+        snapshots.append(snapshot())
+
+    merged = {}
+    for data in snapshots:
+        for name, metric in data.items():
+            target = merged.setdefault(name, {**metric, 'samples': {}})
+            for labels, value in metric['samples']:
+                key = tuple(labels)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = value
+                elif metric['type'] == 'counter':
+                    target['samples'][key] = current + value
+                else:
+                    target['samples'][key] = [
+                        [a + b for a, b in zip(current[0], value[0])], current[1] + value[1], current[2] + value[2],
+                    ]
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render(metrics=None):
+    """Texte d'exposition Prometheus (version 0.0.4)"""
+    metrics = collect() if metrics is None else metrics
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key, value in sorted(metric['samples'].items()):
+            if metric['type'] == 'counter':
+                lines.append(f"{name}{_labels(metric['labels'], key)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip([*metric['buckets'], '+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(metric['labels'], key, ('le', bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labels'], key)} {total}")
+            lines.append(f"{name}_count{_labels(metric['labels'], key)} {count}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,117 @@
+import base64
+import json
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+
+
+def _json_default(value):
+    # isoformat() complet : DjangoJSONEncoder tronque les microsecondes
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible ou altéré"""
+
+
+class KeysetPage:
+    """Une page de résultats et les curseurs des pages voisines"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur (keyset) sur une liste de champs d'ordre.
+
+    `ordering` doit rendre l'ordre total (terminer par un champ unique, ex.
+    ('-date_creation', '-id')). Une page est lue par une condition
+    « après la dernière ligne vue » au lieu d'un OFFSET : son coût ne dépend
+    pas du nombre de pages qui précèdent. Les champs peuvent être des
+    annotations du queryset (ex. un rang de recherche).
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-date_creation', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field) for field in self.fields]
+        raw = json.dumps(values, default=_json_default, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw)
+        except (ValueError, TypeError) as e:
+            raise InvalidCursor(str(e)) from e
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor('Cursor does not match the ordering')
+        decoded = []
+        for field, value in zip(self.fields, values):
+            try:
+                value = self.queryset.model._meta.get_field(field).to_python(value)
+            except FieldDoesNotExist:
+                pass  # Annotation : valeur JSON telle quelle
+            except Exception as e:
+                raise InvalidCursor(str(e)) from e
+            decoded.append(value)
+        return decoded
+
+    def _after(self, values, reverse=False):
+        """Condition « strictement après `values` » dans l'ordre (ou l'ordre inverse)"""
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            clause = Q(**{f'{self.fields[i]}__{lookup}': values[i]})
+            for previous, value in zip(self.fields[:i], values[:i]):
+                clause &= Q(**{previous: value})
+            condition |= clause
+        return condition
+
+    def _reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def page(self, after=None, before=None):
+        """Page qui suit le curseur `after`, ou qui précède le curseur `before`"""
+        if before:
+            queryset = self.queryset.filter(self._after(self.decode_cursor(before), reverse=True))
+            rows = list(queryset.order_by(*self._reversed_ordering())[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            next_cursor = self.encode_cursor(rows[-1]) if rows else None
+            previous_cursor = self.encode_cursor(rows[0]) if rows and has_more else None
+            return KeysetPage(rows, next_cursor, previous_cursor)
+
+        queryset = self.queryset
+        if after:
+            queryset = queryset.filter(self._after(self.decode_cursor(after)))
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = self.encode_cursor(rows[-1]) if rows and has_more else None
+        previous_cursor = self.encode_cursor(rows[0]) if rows and after else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
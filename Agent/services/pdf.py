@@ -0,0 +1,276 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+from django.conf import settings
+from django.db import close_old_connections, connection
+from Agent.models import Document
+from Agent.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Couleur d'accent (titres, filets) de chaque template proposé dans le formulaire
+TEMPLATE_ACCENTS = {
+    'default': '#1f2937',
+    'modern': '#2563eb',
+    'classic': '#000000',
+}
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*)$')
+BULLET_RE = re.compile(r'^(\s*)[-*+]\s+(.*)$')
+NUMBERED_RE = re.compile(r'^(\s*)(\d+)[.)]\s+(.*)$')
+RULE_RE = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)')
+BOLD_RE = re.compile(r'\*\*(.+?)\*\*|__(.+?)__')
+ITALIC_RE = re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])')
+CODE_RE = re.compile(r'`([^`]+)`')
+
+
+@lru_cache(maxsize=None)
+def _fonts():
+    """Enregistre les polices une seule fois par processus ; retourne (normale, grasse)"""
+    # reportlab n'est importé qu'au premier rendu : les commandes et les vues
+    # qui ne produisent pas de PDF n'en paient pas le chargement
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    regular, bold = 'Helvetica', 'Helvetica-Bold'
+    if settings.PDF_FONT_PATH:
+        try:
+            pdfmetrics.registerFont(TTFont('DocumentFont', settings.PDF_FONT_PATH))
+            regular = 'DocumentFont'
+            pdfmetrics.registerFont(TTFont('DocumentFont-Bold', settings.PDF_FONT_BOLD_PATH or settings.PDF_FONT_PATH))
+            bold = 'DocumentFont-Bold'
+            pdfmetrics.registerFontFamily(regular, normal=regular, bold=bold, italic=regular, boldItalic=bold)
+        except Exception as e:
+            logger.error(f"Could not register PDF font {settings.PDF_FONT_PATH}: {str(e)}")
+    return regular, bold
+
+
+@lru_cache(maxsize=None)
+def _styles(template):
+    """Styles de paragraphe d'un template, construits une fois par processus"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_LEFT
+    from reportlab.lib.styles import ParagraphStyle
+
+    regular, bold = _fonts()
+    accent = colors.HexColor(TEMPLATE_ACCENTS.get(template, TEMPLATE_ACCENTS['default']))
+    body = ParagraphStyle('body', fontName=regular, fontSize=10, leading=14, alignment=TA_LEFT, spaceAfter=6)
+    return {
+        'body': body,
+        'h1': ParagraphStyle('h1', parent=body, fontName=bold, fontSize=18, leading=22, textColor=accent, spaceBefore=4, spaceAfter=8),
+        'h2': ParagraphStyle('h2', parent=body, fontName=bold, fontSize=13, leading=17, textColor=accent, spaceBefore=10, spaceAfter=4),
+        'h3': ParagraphStyle('h3', parent=body, fontName=bold, fontSize=11, leading=15, spaceBefore=6, spaceAfter=2),
+        'bullet': ParagraphStyle('bullet', parent=body, leftIndent=14, bulletIndent=4, spaceAfter=2),
+        'accent': accent,
+    }
+
+
+def _inline(text):
+    """Convertit le Markdown en ligne (gras, italique, code, liens) en balisage reportlab"""
+    links = []
+
+    def keep_link(match):
+        links.append(f'<link href="{escape(match.group(2), {chr(34): "&quot;"})}" color="blue">{escape(match.group(1))}</link>')
+        return f'\x00{len(links) - 1}\x00'
+
+    text = escape(LINK_RE.sub(keep_link, text))
+    text = CODE_RE.sub(r'<font face="Courier">\1</font>', text)
+    text = BOLD_RE.sub(lambda m: f'<b>{m.group(1) or m.group(2)}</b>', text)
+    text = ITALIC_RE.sub(r'<i>\1</i>', text)
+    return re.sub('\x00(\\d+)\x00', lambda m: links[int(m.group(1))], text)
+
+
+def markdown_flowables(contenu, styles):
+    """Découpe le Markdown généré en titres, listes à puces, filets et paragraphes"""
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import HRFlowable, Paragraph
+
+    story = []
+    paragraph = []
+
+    def flush_paragraph():
+        if paragraph:
+            story.append(Paragraph(_inline(' '.join(paragraph)), styles['body']))
+            paragraph.clear()
+
+    for line in contenu.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('```'):
+            continue  # Gemini entoure parfois sa réponse d'un bloc ```markdown
+        if not stripped:
+            flush_paragraph()
+            continue
+        if RULE_RE.match(line):
+            flush_paragraph()
+            story.append(HRFlowable(width='100%', thickness=0.5, color=styles['accent'], spaceBefore=4, spaceAfter=6))
+            continue
+
+        heading = HEADING_RE.match(stripped)
+        bullet = BULLET_RE.match(line)
+        numbered = NUMBERED_RE.match(line)
+        if heading:
+            flush_paragraph()
+            level = min(len(heading.group(1)), 3)
+            story.append(Paragraph(_inline(heading.group(2).strip('# ')), styles[f'h{level}']))
+        elif bullet or numbered:
+            flush_paragraph()
+            indent, text = (bullet.group(1), bullet.group(2)) if bullet else (numbered.group(1), numbered.group(3))
+            depth = len(indent.expandtabs(4)) // 2
+            style = ParagraphStyle(f'bullet{depth}', parent=styles['bullet'],
+                                   leftIndent=styles['bullet'].leftIndent + 12 * depth,
+                                   bulletIndent=styles['bullet'].bulletIndent + 12 * depth)
+            marker = '•' if bullet else f'{numbered.group(2)}.'
+            story.append(Paragraph(_inline(text), style, bulletText=marker))
+        else:
+            paragraph.append(stripped)
+    flush_paragraph()
+    return story
+
+
+def _photo_flowable(photo_path):
+    """Photo du CV, réduite à 3 cm de large"""
+    from reportlab.lib.units import cm
+    from reportlab.lib.utils import ImageReader
+    from reportlab.platypus import Image
+
+    try:
+        width, height = ImageReader(photo_path).getSize()
+    except Exception as e:
+        logger.warning(f"Could not read CV photo {photo_path}: {str(e)}")
+        return None
+    photo = Image(photo_path, width=3 * cm, height=3 * cm * height / width)
+    photo.hAlign = 'RIGHT'
+    return photo
+
+
+def _photo_path(document):
+    try:
+        cv_image = document.cv_image
+    except Exception:
+        return None
+    return cv_image.image.path if cv_image.image else None
+
+
+def render_document_pdf(document):
+    """Génère le PDF d'un document à partir de son contenu Markdown"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    logger.debug(f"Starting PDF generation for document {document.id}")
+    styles = _styles(document.template_utilise)
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4,
+        leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm,
+        title=document.titre, author=document.user.email if document.user_id else '',
+    )
+    story = []
+    photo_path = _photo_path(document) if document.type == 'CV' else None
+    if photo_path:
+        photo = _photo_flowable(photo_path)
+        if photo is not None:
+            story.extend([photo, Spacer(1, 6)])
+    story.extend(markdown_flowables(document.contenu, styles))
+    if not story:
+        story.append(Paragraph(escape(document.titre), styles['h1']))
+    doc.build(story)
+    pdf = buffer.getvalue()
+    buffer.close()
+    logger.debug(f"PDF generated successfully for document {document.id}")
+    return pdf
+
+
+def content_hash(document):
+    """Empreinte de ce qui est rendu dans le PDF (contenu, titre, photo)"""
+    photo = _photo_path(document) if document.type == 'CV' else ''
+    data = '\x00'.join([document.contenu, document.titre, photo or ''])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def pdf_etag(document):
+    return f'"{document.id}-{content_hash(document)[:32]}-{document.template_utilise}"'
+
+
+def pdf_relative_path(document):
+    """
+    Chemin du PDF rendu, relatif à MEDIA_ROOT.
+
+    Le nom du fichier contient l'empreinte du contenu et du template : un
+    contenu modifié donne un nouveau fichier, l'ancien n'est plus servi.
+    """
+    template = hashlib.md5(document.template_utilise.encode('utf-8')).hexdigest()[:8]
+    return os.path.join('pdf', f'user_{document.user_id}', str(document.id), f'{content_hash(document)[:32]}-{template}.pdf')
+
+
+def write_pdf_file(document):
+    """Rend le PDF d'un document sous MEDIA_ROOT et supprime ses rendus précédents"""
+    path = os.path.join(settings.MEDIA_ROOT, pdf_relative_path(document))
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    if not os.path.exists(path):
+        with metrics.PDF_RENDER_SECONDS.time():
+            pdf = render_document_pdf(document)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf)
+        os.replace(tmp_path, path)
+        logger.info(f"PDF for document {document.id} written to {path}")
+
+    for name in os.listdir(directory):
+        if name.endswith('.pdf') and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    return path
+
+
+def ensure_pdf_file(document):
+    """Chemin du PDF à jour d'un document, rendu à la demande s'il n'existe pas encore"""
+    path = os.path.join(settings.MEDIA_ROOT, pdf_relative_path(document))
+    if os.path.exists(path):
+        metrics.CACHE_EVENTS.inc(cache='pdf', result='hit')
+        return path
+    metrics.CACHE_EVENTS.inc(cache='pdf', result='miss')
+    logger.debug(f"No pre-rendered PDF for document {document.id}, rendering now")
+    return write_pdf_file(document)
+
+
+def delete_pdf_files(document):
+    shutil.rmtree(os.path.join(settings.MEDIA_ROOT, 'pdf', f'user_{document.user_id}', str(document.id)), ignore_errors=True)
+
+
+# Pool de threads qui pré-rend les PDF des documents terminés
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _prerender(document_id):
+    close_old_connections()
+    try:
+        document = Document.objects.select_related('user', 'cv_image').get(id=document_id, statut='completed')
+        write_pdf_file(document)
+    except Document.DoesNotExist:
+        pass
+    except Exception as e:
+        logger.error(f"PDF pre-rendering failed for document {document_id}: {str(e)}")
+    finally:
+        connection.close()
+
+
+def schedule_prerender(document_id):
+    """Planifie le rendu du PDF d'un document qui vient d'être terminé"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.PDF_PRERENDER_THREADS, thread_name_prefix='pdf-prerender')
+    return _executor.submit(_prerender, document_id)
@@ -0,0 +1,354 @@
+import logging
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.utils import timezone
+from decouple import config, UndefinedValueError
+from Agent.models import Document
+from Agent.services import generation_cache, llm_provider, metrics, prompt_budget, resilience, scoring, search_cache, sections
+from Agent.services.pdf import schedule_prerender
+from Agent.services.stages import (
+    STAGE_LLM, STAGE_POSTPROCESS, STAGE_PROMPT, STAGE_SAVE, STAGE_SEARCH, StageTracker,
+)
+
+logger = logging.getLogger(__name__)
+
+class GenerationError(Exception):
+    """Erreur levée quand une étape du pipeline échoue"""
+
+
+# Client Tavily créé au premier appel : importer ce module (manage.py, migrations,
+# tests) ne charge pas le SDK et ne dépend pas de la présence de la clé
+_tavily_client = None
+_tavily_client_lock = threading.Lock()
+
+
+def tavily_api_key():
+    try:
+        return config('TAVILY_API_KEY')
+    except UndefinedValueError as e:
+        logger.error(f"Missing environment variable: {str(e)}")
+        raise GenerationError(f"Missing environment variable: {str(e)}") from e
+
+
+def get_tavily_client():
+    """Client Tavily du processus, partagé par les threads"""
+    global _tavily_client
+    if _tavily_client is None:
+        with _tavily_client_lock:
+            if _tavily_client is None:
+                from tavily import TavilyClient
+                _tavily_client = TavilyClient(api_key=tavily_api_key(), api_base_url=settings.TAVILY_API_BASE_URL)
+    return _tavily_client
+
+
+@contextmanager
+def _stage(tracker, ordre):
+    """Chronomètre une étape ; toute erreur est remontée en GenerationError"""
+    try:
+        with tracker.stage(ordre):
+            yield
+    except GenerationError:
+        raise
+    except Exception as e:
+        logger.error(f"Generation failed for document {tracker.document.id} at step {ordre}: {str(e)}")
+        raise GenerationError(str(e)) from e
+
+
+def fetch_search_context(target_role, company):
+    """Query Tavily for the job requirements of a role at a company"""
+    logger.info(f"Searching Tavily for: {target_role} job requirements {company}")
+    client = get_tavily_client()
+    tavily_response = resilience.call('tavily', lambda: client.search(
+        query=f"{target_role} job requirements {company}",
+        search_depth="basic",
+        max_results=3,
+        timeout=settings.SEARCH_DEADLINE,
+    ))
+    context = "\n".join([result['content'] for result in tavily_response['results']])
+    logger.debug(f"Tavily context: {context[:200]}...")
+    return context
+
+
+def search_context(target_role, company):
+    """Fetch additional context using Tavily, through the shared search cache"""
+    try:
+        context = search_cache.get_context(target_role, company, fetch_search_context)
+    except Exception as e:
+        logger.error(f"Tavily API error: {str(e)}")
+        context = "No additional context available."
+    return context
+
+
+def build_user_data(user, payload):
+    """Prepare the profile part of the prompt"""
+    return {
+        'name': user.full_name if user and user.is_authenticated and hasattr(user, 'full_name') and user.full_name else user.full_name if user and user.is_authenticated else 'Anonymous',
+        'email': user.email if user and user.is_authenticated else 'N/A',
+        'linkedin_url': payload.get('linkedin_url', ''),
+        'github_url': payload.get('github_url', ''),
+        'telephone': payload.get('telephone', ''),
+        'skills': payload.get('skills', []),
+        'experiences': payload.get('experiences', []),
+        'education': payload.get('education', [])
+    }
+
+
+def generate_content(prompt):
+    """Generate content with the configured LLM provider (LLM_PROVIDER, then LLM_FALLBACK_PROVIDERS)"""
+    logger.info(f"Calling {settings.LLM_PROVIDER} for content generation")
+    content = llm_provider.complete(prompt)
+    logger.info("Content generated successfully")
+    return content
+
+
+def generate_content_stream(prompt):
+    """Generate content with the configured LLM provider, yielding text chunks as they arrive"""
+    logger.info(f"Calling {settings.LLM_PROVIDER} for streamed content generation")
+    yield from llm_provider.stream(prompt)
+    logger.info("Streamed content generated successfully")
+
+
+def prepare_prompt(document, payload, tracker):
+    """
+    Démarre le pipeline d'un document : recherche Tavily puis construction du prompt.
+
+    Passe le document en 'processing' et remet ses étapes en attente avant de
+    démarrer les deux premières étapes. Retourne le prompt et la clé du cache
+    de génération correspondant à ses entrées.
+    """
+    document_type = payload.get('document_type', document.type)
+    target_role = payload.get('target_role', document.poste)
+    company = payload.get('company', document.entreprise)
+
+    document.statut = 'processing'
+    document.save(update_fields=['statut', 'date_mise_a_jour'])
+    tracker.reset()
+
+    with _stage(tracker, STAGE_SEARCH):
+        context = search_context(target_role, company)
+
+    with _stage(tracker, STAGE_PROMPT):
+        user_data = build_user_data(document.user, payload)
+        logger.debug(f"User data for prompt of document {document.id}", extra={'user_data': user_data})
+        prompt_inputs = (
+            document_type, target_role, company,
+            payload.get('keywords', ''), payload.get('tone', 'professionnel'),
+            payload.get('job_description', ''), user_data, context,
+            payload.get('langue', 'fr'), payload.get('template_utilise', 'default')
+        )
+        prompt = _get_prompt(*prompt_inputs)
+        cache_key = generation_cache.make_key(*prompt_inputs)
+    return prompt, cache_key
+
+
+def finalize_document(document, generated_content, tracker, payload=None):
+    """
+    Termine le pipeline : post-traitement du texte généré puis sauvegarde.
+
+    Avec `payload`, les empreintes des entrées sont enregistrées pour qu'une
+    modification ultérieure ne régénère que les sections concernées.
+    """
+    with _stage(tracker, STAGE_POSTPROCESS):
+        document.contenu = generated_content.strip()
+        if payload is not None:
+            sections.remember(document, payload, build_user_data(document.user, payload))
+        scoring.apply_score(document, scoring.cached_analysis(document))
+
+    with _stage(tracker, STAGE_SAVE):
+        document.statut = 'completed'
+        document.save()
+    tracker.flush()
+    schedule_prerender(document.id)
+
+    logger.info(f"Document {document.id} updated to completed, score: {document.score}")
+    return document
+
+
+def plan_incremental(document, payload):
+    """Modification incrémentale possible pour ce document, ou None (régénération complète)"""
+    if not settings.GENERATION_INCREMENTAL:
+        return None
+    plan = sections.plan_update(document, payload, build_user_data(document.user, payload))
+    if plan is None and document.contenu:
+        logger.info(f"Document {document.id} needs a full regeneration")
+    return plan
+
+
+def run_incremental(document, payload, plan, tracker):
+    """
+    Applique une modification incrémentale (voir sections.plan_update).
+
+    Les valeurs factuelles sont déjà corrigées dans le plan ; seules les
+    sections dont les entrées ont changé passent par le LLM, une à une. La
+    recherche Tavily est inutile : l'offre et l'entreprise n'ont pas changé.
+    """
+    document.statut = 'processing'
+    document.save(update_fields=['statut', 'date_mise_a_jour'])
+    tracker.reset()
+    now = timezone.now()
+    tracker.record(STAGE_SEARCH, now, now)
+
+    with _stage(tracker, STAGE_PROMPT):
+        user_data = build_user_data(document.user, payload)
+        prompts = {
+            section.key: sections.section_prompt(section, document.type, payload, user_data)
+            for section in plan.sections if section.key in plan.regenerate
+        }
+
+    with _stage(tracker, STAGE_LLM):
+        for section in plan.sections:
+            if section.key in prompts:
+                section.text = sections.clean_section(section, generate_content(prompts[section.key]))
+        document.metadata['generation'] = {
+            'mode': plan.mode, 'patched': sorted(plan.patches), 'regenerated': plan.regenerate,
+        }
+    metrics.GENERATIONS.inc(mode=plan.mode)
+    logger.info(
+        f"Document {document.id} updated incrementally: patched {sorted(plan.patches)}, regenerated {plan.regenerate}"
+    )
+    return finalize_document(document, sections.join_sections(plan.sections), tracker, payload)
+
+
+def run_generation(document, payload):
+    """
+    Exécute le pipeline Tavily → prompt → Gemini → sauvegarde pour un document.
+
+    Chaque étape de traitement passe en 'processing' au moment où elle démarre
+    réellement, puis en 'completed' (ou 'error') quand elle se termine ; les
+    dates de début et de fin de chaque étape sont enregistrées. Un document
+    déjà généré dont seules quelques entrées ont changé est mis à jour section
+    par section (run_incremental).
+    """
+    tracker = StageTracker.load(document)
+    plan = plan_incremental(document, payload)
+    if plan is not None:
+        return run_incremental(document, payload, plan, tracker)
+    prompt, cache_key = prepare_prompt(document, payload, tracker)
+    metrics.GENERATIONS.inc(mode='full')
+    with _stage(tracker, STAGE_LLM):
+        generated_content = generation_cache.lookup(cache_key)
+        document.metadata['generation_cache'] = 'hit' if generated_content is not None else 'miss'
+        if generated_content is None:
+            generated_content = generate_content(prompt)
+            generation_cache.store(cache_key, document.type, generated_content)
+    return finalize_document(document, generated_content, tracker, payload)
+
+
+def stream_generation(document, payload, checkpoint_every=None):
+    """
+    Variante streamée de run_generation : produit les morceaux de texte Gemini
+    au fil de l'eau.
+
+    Le contenu partiel est enregistré dans Document.contenu tous les
+    `checkpoint_every` morceaux ; si une étape échoue ou si le générateur est
+    fermé avant la fin (client déconnecté), le dernier état est enregistré et
+    le document passe en erreur pour pouvoir être relancé. Une mise à jour incrémentale produit
+    le document complet en un seul morceau.
+    """
+    checkpoint_every = checkpoint_every or settings.GENERATION_STREAM_CHECKPOINT_CHUNKS
+    tracker = StageTracker.load(document)
+    chunks = []
+    completed = False
+    try:
+        plan = plan_incremental(document, payload)
+        if plan is not None:
+            content = run_incremental(document, payload, plan, tracker).contenu
+            completed = True
+            yield content
+            return
+        prompt, cache_key = prepare_prompt(document, payload, tracker)
+        metrics.GENERATIONS.inc(mode='full')
+
+        with _stage(tracker, STAGE_LLM):
+            cached_content = generation_cache.lookup(cache_key)
+            document.metadata['generation_cache'] = 'hit' if cached_content is not None else 'miss'
+            stream = [cached_content] if cached_content is not None else generate_content_stream(prompt)
+            for count, chunk in enumerate(stream, start=1):
+                chunks.append(chunk)
+                yield chunk
+                if count % checkpoint_every == 0:
+                    Document.objects.filter(id=document.id).update(contenu=''.join(chunks))
+                    logger.debug(f"Checkpointed {count} chunks for document {document.id}")
+            if cached_content is None:
+                generation_cache.store(cache_key, document.type, ''.join(chunks))
+        finalize_document(document, ''.join(chunks), tracker, payload)
+        completed = True
+    finally:
+        if not completed:
+            # Erreur à n'importe quelle étape ou client déconnecté : le document
+            # ne doit pas rester en 'processing'. Le contenu précédent n'est
+            # remplacé que si le flux avait commencé.
+            logger.warning(f"Streamed generation interrupted for document {document.id} after {len(chunks)} chunks")
+            fields = ['statut', 'date_mise_a_jour']
+            if chunks:
+                document.contenu = ''.join(chunks)
+                fields.append('contenu')
+            document.statut = 'error'
+            document.save(update_fields=fields)
+            tracker.abort("Stream interrupted")
+
+
+def _render_prompt(document_type, target_role, company, keywords, tone, user_data, langue, template_utilise, compacted):
+    """Fill the CV or LM prompt template with already compacted sections"""
+    skills = ', '.join(user_data.get('skills', [])) + ', ' + keywords if keywords else ', '.join(user_data.get('skills', []))
+    if document_type == 'CV':
+        return f"""
+        Generate a professional CV in {langue} for a {target_role} position at {company}.
+        Use a {tone} tone and the {template_utilise} template style. Incorporate the following details:
+        - Name: {user_data.get('name', 'Anonymous')}
+        - Email: {user_data.get('email', 'N/A')}
+        - LinkedIn: {user_data.get('linkedin_url', 'N/A')}
+        - GitHub: {user_data.get('github_url', 'N/A')}
+        - Telephone: {user_data.get('telephone', 'N/A')}
+        - Skills: {skills}
+        - Experiences: {compacted['experiences']}
+        - Education: {compacted['education']}
+        - Job Description: {compacted['job_description']}
+        - Additional Context: {compacted['context']}
+        Format the CV in markdown with clear sections for Personal Information (including LinkedIn, GitHub, and Telephone), Skills, Professional Experience, and Education. Ensure the content is tailored to the job description and company.
+        """
+    # LM
+    return f"""
+        Generate a professional Letter of Motivation in {langue} for a {target_role} position at {company}.
+        Use a {tone} tone and the {template_utilise} template style. Incorporate the following details:
+        - Name: {user_data.get('name', 'Anonymous')}
+        - Email: {user_data.get('email', 'N/A')}
+        - LinkedIn: {user_data.get('linkedin_url', 'N/A')}
+        - GitHub: {user_data.get('github_url', 'N/A')}
+        - Telephone: {user_data.get('telephone', 'N/A')}
+        - Skills: {skills}
+        - Experiences: {compacted['experiences']}
+        - Education: {compacted['education']}
+        - Job Description: {compacted['job_description']}
+        - Additional Context: {compacted['context']}
+        Address the letter to the hiring manager at {company}. Highlight relevant skills and experiences, and explain why the candidate is a good fit for the role and company culture. Include contact information (LinkedIn, GitHub, Telephone) in the closing section. Format the letter in markdown with a formal greeting, body (3-4 paragraphs), and closing.
+        """
+
+
+def _get_prompt(document_type, target_role, company, keywords, tone, job_description, user_data, context, langue, template_utilise):
+    """
+    Generate prompt for CV or LM.
+
+    The job description, experiences, education and search context are
+    compacted to fit the token budget of the document type (see
+    Agent/services/prompt_budget.py).
+    """
+    logger.debug(f"Generating prompt for {document_type}")
+    fixed = (document_type, target_role, company, keywords, tone, user_data, langue, template_utilise)
+    empty = dict.fromkeys(('experiences', 'education', 'job_description', 'context'), '')
+    overhead = prompt_budget.count_tokens(_render_prompt(*fixed, empty))
+    compacted, tokens_before = prompt_budget.compact_sections(
+        document_type, job_description,
+        user_data.get('experiences', []), user_data.get('education', []),
+        context, overhead_tokens=overhead,
+    )
+    prompt = _render_prompt(*fixed, compacted)
+    tokens = prompt_budget.count_tokens(prompt)
+    metrics.PROMPT_TOKENS.observe(tokens, document_type=document_type)
+    logger.info(
+        f"Prompt for {document_type}: {tokens_before} -> {tokens} tokens "
+        f"(budget {prompt_budget.budget_for(document_type)})"
+    )
+    logger.debug(f"Prompt generated: {prompt[:200]}...")
+    return prompt
@@ -0,0 +1,179 @@
+import json
+import logging
+import math
+import re
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Approximation locale du tokenizer : un token par signe de ponctuation,
+# un token par tranche de 4 caractères d'un mot (ordre de grandeur Gemini)
+TOKEN_RE = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+CHARS_PER_TOKEN = 4
+
+# Lignes de navigation et mentions récurrentes des pages d'offres (snippets Tavily)
+BOILERPLATE_RE = re.compile(
+    r'(cookie|privacy policy|politique de confidentialit|terms of use|conditions d.utilisation|'
+    r'sign in|sign up|log in|se connecter|créer un compte|apply now|postuler|share this|partager|'
+    r'skip to|all rights reserved|tous droits réservés|newsletter|javascript)',
+    re.IGNORECASE,
+)
+URL_ONLY_RE = re.compile(r'^\W*(https?://\S+|www\.\S+)\W*$')
+SENTENCE_END_RE = re.compile(r'(?<=[.!?;])\s+')
+
+# Sections réduites en premier quand le prompt dépasse le budget (valeur croissante)
+TRIM_ORDER = ('context', 'education', 'job_description', 'experiences')
+# Taille minimale conservée pour les sections de texte, en tokens
+MIN_TEXT_TOKENS = {'context': 0, 'job_description': 150}
+
+
+def count_tokens(text):
+    """Nombre approximatif de tokens d'un texte"""
+    return sum(math.ceil(len(token) / CHARS_PER_TOKEN) for token in TOKEN_RE.findall(text or ''))
+
+
+def budget_for(document_type):
+    return settings.PROMPT_TOKEN_BUDGETS.get(document_type, max(settings.PROMPT_TOKEN_BUDGETS.values()))
+
+
+def _line_key(line):
+    return re.sub(r'\W+', ' ', line).strip().casefold()
+
+
+def clean_text(text):
+    """Espaces compactés et lignes répétées supprimées, en gardant les paragraphes"""
+    lines, seen = [], set()
+    for line in (text or '').splitlines():
+        line = re.sub(r'[ \t]+', ' ', line).strip()
+        key = _line_key(line)
+        if key and key in seen:
+            continue
+        seen.add(key)
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return '\n'.join(lines).strip()
+
+
+def clean_context(context, reference=''):
+    """
+    Nettoie les extraits de recherche : supprime les lignes de navigation, les
+    URL seules, les doublons entre extraits et les phrases déjà présentes
+    dans `reference` (l'offre d'emploi).
+    """
+    known = {_line_key(sentence) for sentence in SENTENCE_END_RE.split(reference or '')}
+    kept = []
+    for line in (context or '').splitlines():
+        line = re.sub(r'\s+', ' ', line).strip()
+        if len(line) < 20 or URL_ONLY_RE.match(line) or BOILERPLATE_RE.search(line):
+            continue
+        sentences = []
+        for sentence in SENTENCE_END_RE.split(line):
+            key = _line_key(sentence)
+            if key and key not in known:
+                known.add(key)
+                sentences.append(sentence)
+        if sentences:
+            kept.append(' '.join(sentences))
+    return '\n'.join(kept)
+
+
+def _prune(value):
+    """Retire récursivement les valeurs vides (None, '', [], {})"""
+    if isinstance(value, dict):
+        pruned = {key: _prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, '', [], {})}
+    if isinstance(value, (list, tuple)):
+        pruned = [_prune(item) for item in value]
+        return [item for item in pruned if item not in (None, '', [], {})]
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', value).strip()
+    return value
+
+
+def compact_json(value):
+    """JSON sans espaces ni valeurs vides, accents conservés"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def trim_text(text, max_tokens):
+    """Coupe un texte à `max_tokens`, si possible en fin de phrase"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ''
+    kept, used = [], 0
+    for sentence in SENTENCE_END_RE.split(text):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept:
+        return ' '.join(kept)
+    # Première phrase trop longue : coupe au nombre de caractères correspondant
+    return text[:max_tokens * CHARS_PER_TOKEN].rsplit(' ', 1)[0] + '…'
+
+
+def _as_list(value):
+    """
+    Expériences ou formations telles que reçues du formulaire (JSON libre) :
+    un objet seul devient une liste d'un élément, une valeur vide une liste
+    vide ; le texte et les nombres sont gardés tels quels.
+    """
+    if value is None or value == '':
+        return []
+    if isinstance(value, dict):
+        return [value]
+    return value
+
+
+def _render(value):
+    return value if isinstance(value, str) else compact_json(value)
+
+
+def _section_tokens(value):
+    return count_tokens(_render(value))
+
+
+def _shrink(name, value, excess):
+    """Réduit une section d'environ `excess` tokens, sans descendre sous son minimum"""
+    if isinstance(value, list):
+        # Listes (expériences, formations) : on retire les derniers éléments, on en garde un
+        value = list(value)
+        target = _section_tokens(value) - excess
+        while len(value) > 1 and _section_tokens(value) > target:
+            value.pop()
+        return value
+    value = _render(value)
+    target = max(MIN_TEXT_TOKENS.get(name, 0), count_tokens(value) - excess)
+    return trim_text(value, target)
+
+
+def compact_sections(document_type, job_description, experiences, education, context, overhead_tokens=0):
+    """
+    Prépare les sections volumineuses du prompt pour tenir dans le budget du type de document.
+
+    Retourne (sections, tokens_avant) : les sections sont des chaînes prêtes à
+    insérer (JSON compact sauf pour le texte), tokens_avant est la taille des
+    entrées brutes plus `overhead_tokens` (le reste du prompt).
+    """
+    before = overhead_tokens + sum(count_tokens(text) for text in (
+        job_description, json.dumps(experiences), json.dumps(education), context,
+    ))
+
+    job_description = clean_text(job_description)
+    sections = {
+        'context': clean_context(context, reference=job_description),
+        'education': _prune(_as_list(education)),
+        'job_description': job_description,
+        'experiences': _prune(_as_list(experiences)),
+    }
+
+    available = budget_for(document_type) - overhead_tokens
+    for name in TRIM_ORDER:
+        excess = sum(_section_tokens(value) for value in sections.values()) - available
+        if excess <= 0:
+            break
+        sections[name] = _shrink(name, sections[name], excess)
+
+    return {name: _render(value) for name, value in sections.items()}, before
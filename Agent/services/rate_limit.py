@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Least
+from django.db.models.lookups import GreaterThanOrEqual
+from Agent.models import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+# Attente minimale entre deux essais sur un seau vide (secondes), pour ne pas
+# marteler la base quand plusieurs processus attendent le même jeton
+MIN_POLL_INTERVAL = 0.05
+
+
+class RateLimitExceeded(Exception):
+    """Attente dans la file d'un fournisseur plus longue que RATE_LIMIT_MAX_WAIT"""
+    retryable = False
+
+
+class DatabaseBucket:
+    """Seau de jetons partagé entre processus, une ligne RateLimitBucket par fournisseur"""
+
+    def __init__(self, name, rate, burst):
+        self.name, self.rate, self.burst = name, rate, burst
+
+    def _available(self, now):
+        elapsed = Greatest(Value(0.0), Value(now) - F('derniere_recharge'))
+        return Least(Value(float(self.burst)), F('tokens') + elapsed * Value(float(self.rate)))
+
+    def take(self):
+        """Prend un jeton ; retourne 0 en cas de succès, sinon le délai estimé avant le prochain jeton"""
+        now = time.time()
+        available = self._available(now)
+        taken = RateLimitBucket.objects.filter(GreaterThanOrEqual(available, 1), nom=self.name).update(
+            tokens=available - 1, derniere_recharge=Value(now),
+        )
+        if taken:
+            return 0
+        row = RateLimitBucket.objects.filter(nom=self.name).values_list('tokens', 'derniere_recharge').first()
+        if row is None:
+            try:
+                RateLimitBucket.objects.create(nom=self.name, tokens=self.burst - 1, derniere_recharge=now)
+                return 0
+            except IntegrityError:
+                return MIN_POLL_INTERVAL  # Créée entre-temps par un autre processus
+        tokens, last = row
+        level = min(self.burst, tokens + max(0.0, now - last) * self.rate)
+        return max(MIN_POLL_INTERVAL, (1 - level) / self.rate)
+
+    def level(self):
+        row = RateLimitBucket.objects.filter(nom=self.name).values_list('tokens', 'derniere_recharge').first()
+        if row is None:
+            return float(self.burst)
+        tokens, last = row
+        return min(self.burst, tokens + max(0.0, time.time() - last) * self.rate)
+
+    def drain(self):
+        """Vide le seau (le fournisseur a répondu 429) : tous les processus ralentissent"""
+        RateLimitBucket.objects.filter(nom=self.name).update(tokens=0, derniere_recharge=time.time())
+
+
+class LocalBucket:
+    """Seau de jetons propre au processus (RATE_LIMIT_BACKEND = 'local')"""
+
+    def __init__(self, name, rate, burst):
+        self.name, self.rate, self.burst = name, rate, burst
+        self._tokens, self._last = float(burst), time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def take(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return max(MIN_POLL_INTERVAL, (1 - self._tokens) / self.rate)
+
+    def level(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def drain(self):
+        with self._lock:
+            self._tokens, self._last = 0.0, time.monotonic()
+
+
+BUCKETS = {'database': DatabaseBucket, 'local': LocalBucket}
+
+
+class Limiter:
+    """
+    Débit (seau de jetons) et nombre d'appels simultanés (sémaphore du processus) d'un fournisseur.
+
+    Les appelants attendent leur tour, au plus `max_wait` secondes, au lieu
+    d'échouer ; la file et les temps d'attente sont comptés pour status().
+    """
+
+    def __init__(self, name, rate, burst, concurrency, max_wait):
+        self.name = name
+        self.rate, self.burst, self.concurrency, self.max_wait = rate, burst, concurrency, max_wait
+        self.bucket = BUCKETS[settings.RATE_LIMIT_BACKEND](name, rate, burst)
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self._async_semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.waiting = self.max_waiting = self.in_flight = 0
+        self.acquired = self.rejected = 0
+        self.wait_total = self.wait_max = 0.0
+
+    def async_semaphore(self):
+        """Sémaphore de la boucle d'événements courante (les asyncio.Semaphore y sont liés)"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    def _enqueue(self):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        return time.monotonic()
+
+    def _dequeue(self, started, acquired):
+        waited = time.monotonic() - started
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+                self.acquired += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            else:
+                self.rejected += 1
+        if not acquired:
+            logger.warning(f"Rate limit {self.name}: no slot after waiting {waited:.2f}s")
+        elif waited > 1:
+            logger.info(f"Rate limit {self.name}: waited {waited:.2f}s")
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    @staticmethod
+    def _pause(delay, deadline):
+        """Attente avant de réessayer (0 : jeton obtenu), avec jitter ; None si l'échéance serait dépassée"""
+        if not delay:
+            return 0
+        remaining = deadline - time.monotonic()
+        if delay > remaining:
+            return None
+        return min(remaining, delay * random.uniform(1, 1.2))
+
+    def status(self):
+        with self._lock:
+            stats = {
+                'waiting': self.waiting,
+                'max_waiting': self.max_waiting,
+                'in_flight': self.in_flight,
+                'acquired': self.acquired,
+                'rejected': self.rejected,
+                'wait_avg_ms': round(self.wait_total / self.acquired * 1000, 1) if self.acquired else 0,
+                'wait_max_ms': round(self.wait_max * 1000, 1),
+            }
+        return {
+            'rate': self.rate, 'burst': self.burst, 'concurrency': self.concurrency,
+            'tokens': round(self.bucket.level(), 2), **stats,
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """Limiteur du fournisseur `name`, None s'il n'a pas de limite dans RATE_LIMITS"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limits = settings.RATE_LIMITS.get(name)
+        if not name or limits is None:
+            return None
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = _limiters[name] = Limiter(name, max_wait=settings.RATE_LIMIT_MAX_WAIT, **limits)
+    return limiter
+
+
+@contextmanager
+def acquire(name, max_wait=None):
+    """
+    Attend un créneau pour appeler le fournisseur `name` et le garde pendant le bloc.
+
+    Lève RateLimitExceeded si aucun créneau ne se libère dans `max_wait`
+    secondes (RATE_LIMIT_MAX_WAIT par défaut).
+    """
+    limiter = get_limiter(name)
+    if limiter is None:
+        yield
+        return
+    max_wait = limiter.max_wait if max_wait is None else max_wait
+    started = limiter._enqueue()
+    deadline = started + max_wait
+    acquired = False
+    try:
+        if limiter.semaphore.acquire(timeout=max_wait):
+            try:
+                while not acquired:
+                    pause = limiter._pause(limiter.bucket.take(), deadline)
+                    if pause is None:
+                        break
+                    if pause:
+                        time.sleep(pause)
+                    else:
+                        acquired = True
+            finally:
+                if not acquired:
+                    limiter.semaphore.release()
+    finally:
+        limiter._dequeue(started, acquired)
+    if not acquired:
+        raise RateLimitExceeded(f"{name} rate limit: no slot within {max_wait}s")
+    try:
+        yield
+    finally:
+        limiter._release()
+        limiter.semaphore.release()
+
+
+@asynccontextmanager
+async def aacquire(name, max_wait=None):
+    """Variante asynchrone de acquire : la file d'attente ne bloque pas la boucle"""
+    limiter = get_limiter(name)
+    if limiter is None:
+        yield
+        return
+    max_wait = limiter.max_wait if max_wait is None else max_wait
+    started = limiter._enqueue()
+    deadline = started + max_wait
+    semaphore = limiter.async_semaphore()
+    take = sync_to_async(limiter.bucket.take)
+    acquired = False
+    try:
+        try:
+            await asyncio.wait_for(semaphore.acquire(), max_wait)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            try:
+                while not acquired:
+                    pause = limiter._pause(await take(), deadline)
+                    if pause is None:
+                        break
+                    if pause:
+                        await asyncio.sleep(pause)
+                    else:
+                        acquired = True
+            finally:
+                if not acquired:
+                    semaphore.release()
+    finally:
+        limiter._dequeue(started, acquired)
+    if not acquired:
+        raise RateLimitExceeded(f"{name} rate limit: no slot within {max_wait}s")
+    try:
+        yield
+    finally:
+        limiter._release()
+        semaphore.release()
+
+
+def take_token(name):
+    """
+    Prend un jeton sans attendre, pour une requête en plus de celle déjà admise
+    (requête doublée) ; False si le seau est vide. Le créneau de concurrence
+    n'est pas pris : la requête supplémentaire partage celui de l'appel.
+    """
+    limiter = get_limiter(name)
+    if limiter is None:
+        return True
+    return limiter.bucket.take() == 0
+
+
+def throttled(name):
+    """Le fournisseur a répondu 429 : vide son seau pour que tous les processus ralentissent"""
+    limiter = get_limiter(name)
+    if limiter is not None:
+        logger.warning(f"Rate limit {name}: provider throttled, draining bucket")
+        limiter.bucket.drain()
+
+
+def status():
+    """Niveau des seaux et statistiques de file du processus, par fournisseur configuré"""
+    return {name: get_limiter(name).status() for name in settings.RATE_LIMITS}
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from asgiref.sync import sync_to_async
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.conf import settings
+from Agent.services import metrics, rate_limit
+
+logger = logging.getLogger(__name__)
+
+# Nombre de latences gardées par fournisseur pour estimer le p95
+LATENCY_WINDOW = 200
+# En dessous de ce nombre de mesures, le p95 n'est pas fiable : pas de requête doublée
+HEDGE_MIN_SAMPLES = 20
+
+
+class SearchUnavailable(Exception):
+    """La recherche n'a pas abouti (disjoncteur ouvert ou échéance dépassée)"""
+
+
+class CircuitOpen(SearchUnavailable):
+    pass
+
+
+class SearchTimeout(SearchUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un fournisseur, propre au processus.
+
+    Fermé, il laisse passer les appels ; après `failure_threshold` échecs
+    consécutifs il s'ouvre et les appels sont refusés sans attendre pendant
+    `reset_timeout` secondes ; il laisse alors passer un seul appel d'essai
+    (semi-ouvert) qui le referme ou le rouvre.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state, self._probing = self.HALF_OPEN, False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self):
+        """L'appel autorisé n'a pas eu lieu : un autre peut servir d'appel d'essai"""
+        with self._lock:
+            self._probing = False
+
+    def success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state, self.failures, self._probing = self.CLOSED, 0, False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit {self.name} opened after {self.failures} consecutive failures")
+                self.state, self.opened_at, self._probing = self.OPEN, time.monotonic(), False
+
+
+class SearchGuard:
+    """Disjoncteur, latences observées et compteurs d'un fournisseur de recherche"""
+
+    def __init__(self, name):
+        self.name = name
+        self.breaker = CircuitBreaker(name, settings.SEARCH_BREAKER_FAILURES, settings.SEARCH_BREAKER_RESET)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.calls = self.failures = self.timeouts = self.short_circuited = 0
+        self.hedged = self.hedge_wins = self.hedge_skipped = 0
+
+    def count(self, **increments):
+        with self._lock:
+            for field, value in increments.items():
+                setattr(self, field, getattr(self, field) + value)
+
+    def record(self, latency):
+        """Latence d'une requête aboutie ; les échéances dépassées sont comptées à part (timeouts)"""
+        with self._lock:
+            self.latencies.append(latency)
+
+    def percentile(self, q):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[max(0, min(len(latencies) - 1, math.ceil(q * len(latencies)) - 1))]
+
+    def hedge_delay(self):
+        """Délai après lequel doubler la requête : p95 observé, None sans assez de mesures"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(settings.SEARCH_HEDGE_MIN_DELAY, self.percentile(0.95))
+
+    def status(self):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            'state': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'calls': self.calls,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'short_circuited': self.short_circuited,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'hedge_skipped': self.hedge_skipped,
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+_executor = None
+
+
+def get_guard(name):
+    guard = _guards.get(name)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.setdefault(name, SearchGuard(name))
+    return guard
+
+
+def _pool():
+    """
+    Threads des appels synchrones. Un appel abandonné à l'échéance y finit
+    sa course (borné par le timeout du client HTTP) ; si le fournisseur ne
+    répond plus, le pool plein fait échouer les appels suivants à leur
+    échéance et le disjoncteur s'ouvre.
+    """
+    global _executor
+    if _executor is None:
+        with _guards_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.SEARCH_MAX_WORKERS, thread_name_prefix='search')
+    return _executor
+
+
+def _start(guard, deadline, hedge):
+    if not guard.breaker.allow():
+        guard.count(short_circuited=1)
+        metrics.SEARCH_REQUESTS.inc(provider=guard.name, outcome='short_circuited')
+        raise CircuitOpen(f"{guard.name} search skipped: provider degraded")
+    guard.count(calls=1)
+    deadline = deadline or settings.SEARCH_DEADLINE
+    hedge = settings.SEARCH_HEDGE_ENABLED if hedge is None else hedge
+    return deadline, guard.hedge_delay() if hedge else None
+
+
+def _succeeded(guard, started, hedged, winner):
+    latency = time.monotonic() - started
+    guard.record(latency)
+    metrics.SEARCH_REQUESTS.inc(provider=guard.name, outcome='hedge_won' if hedged and winner else 'ok')
+    metrics.SEARCH_SECONDS.observe(latency, provider=guard.name)
+    guard.breaker.success()
+    if hedged and winner:
+        guard.count(hedge_wins=1)
+
+
+def _failed(guard, deadline, errors):
+    guard.breaker.failure()
+    guard.count(failures=1)
+    if errors:
+        metrics.SEARCH_REQUESTS.inc(provider=guard.name, outcome='error')
+        raise errors[-1]
+    metrics.SEARCH_REQUESTS.inc(provider=guard.name, outcome='timeout')
+    guard.count(timeouts=1)
+    raise SearchTimeout(f"{guard.name} search exceeded its {deadline}s deadline")
+
+
+def _hedge(guard, hedge_delay, token):
+    """La requête doublée part-elle ? Elle consomme un jeton du limiteur, sinon elle n'a pas lieu"""
+    if not token:
+        guard.count(hedge_skipped=1)
+        logger.info(f"Not hedging {guard.name} search after {hedge_delay:.2f}s: rate limit reached")
+        return False
+    guard.count(hedged=1)
+    logger.info(f"Hedging {guard.name} search after {hedge_delay:.2f}s")
+    return True
+
+
+def call(name, fn, deadline=None, hedge=None):
+    """
+    Résultat de `fn()`, une requête vers le fournisseur de recherche `name`.
+
+    - Lève CircuitOpen sans attendre quand le fournisseur est dégradé ;
+    - attend son tour auprès du limiteur de débit `name` (au plus `deadline`
+      secondes, sinon RateLimitExceeded), puis lève SearchTimeout si la
+      réponse n'est pas là `deadline` secondes (SEARCH_DEADLINE) après
+      l'envoi, même si la requête n'a pas rendu la main ;
+    - si `hedge` (SEARCH_HEDGE_ENABLED) et que la requête dépasse le p95
+      observé, une seconde requête identique part si le limiteur a encore
+      un jeton : la première réponse gagne.
+    """
+    guard = get_guard(name)
+    deadline, hedge_delay = _start(guard, deadline, hedge)
+    try:
+        with rate_limit.acquire(name, max_wait=deadline):
+            return _run(guard, fn, deadline, hedge_delay)
+    except rate_limit.RateLimitExceeded:
+        guard.breaker.release()
+        metrics.SEARCH_REQUESTS.inc(provider=guard.name, outcome='rate_limited')
+        raise
+
+
+def _run(guard, fn, deadline, hedge_delay):
+    started = time.monotonic()
+    end = started + deadline
+    hedge_at = started + hedge_delay if hedge_delay is not None else None
+    first = _pool().submit(fn)
+    pending, errors, hedged = {first}, [], False
+
+    while pending:
+        now = time.monotonic()
+        if now >= end:
+            break
+        wake = min(end, hedge_at) if hedge_at is not None else end
+        done, pending = wait(pending, timeout=wake - now, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is None:
+                _succeeded(guard, started, hedged, future is not first)
+                return future.result()
+            errors.append(error)
+        if hedge_at is not None and pending and time.monotonic() >= hedge_at:
+            hedge_at = None
+            if _hedge(guard, hedge_delay, rate_limit.take_token(guard.name)):
+                hedged = True
+                pending.add(_pool().submit(fn))
+    _failed(guard, deadline, errors if not pending else [])
+
+
+async def acall(name, coroutine_fn, deadline=None, hedge=None):
+    """Variante asynchrone de call : `coroutine_fn()` crée la requête ; les requêtes perdantes sont annulées"""
+    guard = get_guard(name)
+    deadline, hedge_delay = _start(guard, deadline, hedge)
+    try:
+        async with rate_limit.aacquire(name, max_wait=deadline):
+            return await _arun(guard, coroutine_fn, deadline, hedge_delay)
+    except rate_limit.RateLimitExceeded:
+        guard.breaker.release()
+        metrics.SEARCH_REQUESTS.inc(provider=guard.name, outcome='rate_limited')
+        raise
+
+
+async def _arun(guard, coroutine_fn, deadline, hedge_delay):
+    started = time.monotonic()
+    end = started + deadline
+    hedge_at = started + hedge_delay if hedge_delay is not None else None
+    first = asyncio.ensure_future(coroutine_fn())
+    pending, errors, hedged = {first}, [], False
+
+    try:
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                break
+            wake = min(end, hedge_at) if hedge_at is not None else end
+            done, pending = await asyncio.wait(pending, timeout=wake - now, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    _succeeded(guard, started, hedged, task is not first)
+                    return task.result()
+                errors.append(error)
+            if hedge_at is not None and pending and time.monotonic() >= hedge_at:
+                hedge_at = None
+                if _hedge(guard, hedge_delay, await sync_to_async(rate_limit.take_token)(guard.name)):
+                    hedged = True
+                    pending.add(asyncio.ensure_future(coroutine_fn()))
+    finally:
+        for task in pending:
+            task.cancel()
+    _failed(guard, deadline, errors if not pending else [])
+
+
+def status():
+    """État du disjoncteur, latences et compteurs de chaque fournisseur de recherche (ce processus)"""
+    return {name: guard.status() for name, guard in list(_guards.items())}
@@ -0,0 +1,226 @@
+import logging
+import re
+import unicodedata
+import numpy as np
+from django.conf import settings
+from Agent.models import Document, UserDocumentStats
+from Agent.services import job_analysis
+from Agent.services.skills import get_matcher
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter quand le calcul change : `manage.py rescore_documents` recalcule l'historique
+SCORER_VERSION = 1
+
+# Poids des sous-scores dans le score final (0-100)
+WEIGHTS = {'similarity': 0.3, 'bm25': 0.3, 'keyword_coverage': 0.4}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Longueur habituelle d'un document (en termes), référence de la normalisation BM25
+TYPICAL_LENGTH = {'CV': 450, 'LM': 300}
+# Nombre d'occurrences d'un terme de l'offre considéré comme une couverture complète
+BM25_SATURATION_TF = 3
+
+# Poids d'un mot-clé dans la couverture selon son origine
+KEYWORD_WEIGHTS = {'required_skills': 2.0, 'offer_skills': 2.0, 'preferred_skills': 1.0, 'keywords': 1.0, 'user_keywords': 1.0}
+MAX_LISTED_KEYWORDS = 20
+
+TERM_RE = re.compile(r'[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]')
+PASSAGE_RE = re.compile(r'\n\s*\n|\n(?=\s*(?:#|[-*+•]\s|\d+[.)]\s))')
+
+STOPWORDS = frozenset("""
+a afin ai aie aient ainsi als alors au aucun aussi autre aux avec avez avoir avons ce ceci cela celle celles celui ces cet cette chaque chez
+comme dans de des deja depuis doit donc dont du elle elles en encore entre est et etc ete etre eu faire fait il ils je la le les leur leurs
+lui ma mais me meme mes moi mon ne ni nos notre nous on ont ou par pas peu peut plus pour pourquoi qu quand que quel quelle quelles quels
+qui sa sans se selon ses si son sont sous sur ta te tes toi ton tous tout toute toutes tres tu un une vers via vos votre vous y
+about above after all also am an and any are as at be been being both but by can could did do does doing during each few for from further
+had has have having he her here hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or
+other our ours out over own same she should so some such than that the their theirs them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you your yours
+""".split())
+
+
+def fold(text):
+    """Minuscules sans accents (« Développeur » -> « developpeur »)"""
+    text = (text or '').lower().replace('œ', 'oe').replace('æ', 'ae')
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+
+def terms(text):
+    return [term for term in TERM_RE.findall(fold(text)) if term not in STOPWORDS]
+
+
+def passages(text):
+    """Paragraphes, titres et puces d'un texte : les « documents » du calcul d'IDF"""
+    return [chunk for chunk in PASSAGE_RE.split(text or '') if chunk.strip()]
+
+
+def _term_matrix(chunks, vocabulary):
+    """Matrice (passages x vocabulaire) du nombre d'occurrences, sur un vocabulaire partagé"""
+    rows, columns = [], []
+    for row, chunk in enumerate(chunks):
+        for term in chunk:
+            columns.append(vocabulary.setdefault(term, len(vocabulary)))
+        rows.extend([row] * len(chunk))
+    size = len(vocabulary)
+    flat = np.asarray(rows, dtype=np.int64) * size + np.asarray(columns, dtype=np.int64)
+    return np.bincount(flat, minlength=len(chunks) * size).reshape(len(chunks), size).astype(np.float64)
+
+
+def text_scores(content, query, document_type='CV'):
+    """
+    Similarité TF-IDF (cosinus) et BM25 normalisé du contenu par rapport à l'offre.
+
+    Les passages de l'offre et du contenu forment le corpus de l'IDF : un
+    terme présent partout (« expérience ») pèse peu, un terme propre à
+    l'offre (« kubernetes ») pèse beaucoup. Retourne deux valeurs entre 0 et 1.
+    """
+    query_chunks = [terms(chunk) for chunk in passages(query)]
+    content_chunks = [terms(chunk) for chunk in passages(content)]
+    query_chunks = [chunk for chunk in query_chunks if chunk]
+    content_chunks = [chunk for chunk in content_chunks if chunk]
+    if not query_chunks or not content_chunks:
+        return 0.0, 0.0
+
+    vocabulary = {}
+    counts = _term_matrix(query_chunks + content_chunks, vocabulary)
+    query_tf = counts[:len(query_chunks)].sum(axis=0)
+    content_tf = counts[len(query_chunks):].sum(axis=0)
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    total = counts.shape[0]
+    idf = np.log1p((total - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    # Similarité cosinus TF-IDF, tf sous-linéaire
+    query_vector = np.where(query_tf > 0, 1 + np.log(np.maximum(query_tf, 1)), 0) * idf
+    content_vector = np.where(content_tf > 0, 1 + np.log(np.maximum(content_tf, 1)), 0) * idf
+    norm = np.linalg.norm(query_vector) * np.linalg.norm(content_vector)
+    similarity = float(query_vector @ content_vector / norm) if norm else 0.0
+
+    # BM25 de l'offre (requête) contre le contenu, rapporté au score d'un
+    # document de longueur habituelle qui citerait chaque terme BM25_SATURATION_TF fois
+    query_weight = np.minimum(query_tf, BM25_SATURATION_TF) * idf
+    length = content_tf.sum()
+    typical = TYPICAL_LENGTH.get(document_type, max(TYPICAL_LENGTH.values()))
+    saturation = BM25_K1 * (1 - BM25_B + BM25_B * length / typical)
+    achieved = query_weight @ (content_tf * (BM25_K1 + 1) / (content_tf + saturation))
+    reference = query_weight.sum() * BM25_SATURATION_TF * (BM25_K1 + 1) / (BM25_SATURATION_TF + BM25_K1)
+    bm25 = min(1.0, float(achieved / reference)) if reference else 0.0
+    return similarity, bm25
+
+
+def offer_keywords(job_description, analysis=None, user_keywords=''):
+    """Mots-clés attendus, avec leur poids : compétences de l'analyse, de l'offre, et saisies par l'utilisateur"""
+    matcher = get_matcher()
+    weighted = {}
+
+    def add(keyword, weight):
+        keyword = matcher.canonical(str(keyword))
+        if keyword:
+            weighted[keyword] = max(weighted.get(keyword, 0), weight)
+
+    for field in ('required_skills', 'preferred_skills', 'keywords'):
+        values = (analysis or {}).get(field) or []
+        for keyword in values if isinstance(values, list) else [values]:
+            add(keyword, KEYWORD_WEIGHTS[field])
+    for skill in matcher.extract(job_description):
+        add(skill, KEYWORD_WEIGHTS['offer_skills'])
+    for keyword in re.split(r'[,;\n]', user_keywords or ''):
+        add(keyword, KEYWORD_WEIGHTS['user_keywords'])
+    return weighted
+
+
+def keyword_coverage(content, keywords):
+    """(couverture pondérée entre 0 et 1 ou None sans mot-clé, mots-clés trouvés, mots-clés manquants)"""
+    if not keywords:
+        return None, [], []
+    found_skills = {skill.casefold() for skill in get_matcher().extract(content)}
+    content_terms = f" {' '.join(terms(content))} "
+    matched, missing = [], []
+    for keyword in keywords:
+        keyword_terms = ' '.join(terms(keyword))
+        if keyword.casefold() in found_skills or (keyword_terms and f' {keyword_terms} ' in content_terms):
+            matched.append(keyword)
+        else:
+            missing.append(keyword)
+    coverage = sum(keywords[keyword] for keyword in matched) / sum(keywords.values())
+    return coverage, matched, missing
+
+
+def score_content(content, job_description, document_type='CV', analysis=None, user_keywords='', target_role=''):
+    """
+    Score ATS (0-100) d'un contenu généré et le détail de ses sous-scores.
+
+    Sans offre, la requête est le poste visé et les mots-clés saisis.
+    """
+    query = job_description or f"{target_role}\n{user_keywords}"
+    similarity, bm25 = text_scores(content, query, document_type)
+    coverage, matched, missing = keyword_coverage(content, offer_keywords(job_description, analysis, user_keywords))
+
+    values = {'similarity': similarity, 'bm25': bm25, 'keyword_coverage': coverage}
+    available = {name: value for name, value in values.items() if value is not None}
+    score = sum(WEIGHTS[name] * value for name, value in available.items()) / sum(WEIGHTS[name] for name in available)
+    details = {
+        'version': SCORER_VERSION,
+        **{name: round(value * 100, 1) if value is not None else None for name, value in values.items()},
+        'matched_keywords': matched[:MAX_LISTED_KEYWORDS],
+        'missing_keywords': missing[:MAX_LISTED_KEYWORDS],
+    }
+    return int(round(score * 100)) if content and content.strip() else 0, details
+
+
+def score_document(document, analysis=None):
+    """Score d'un document à partir de son contenu et de l'offre enregistrée dans ses métadonnées"""
+    metadata = document.metadata or {}
+    return score_content(
+        document.contenu, metadata.get('job_description', ''), document.type,
+        analysis=analysis, user_keywords=metadata.get('keywords', ''), target_role=document.poste,
+    )
+
+
+def apply_score(document, analysis=None):
+    """Calcule le score d'un document et l'enregistre sur l'instance (score, metadata['ats_score'])"""
+    document.score, document.metadata['ats_score'] = score_document(document, analysis)
+    return document.score
+
+
+def cached_analysis(document):
+    """Analyse déjà enregistrée de l'offre d'un document (jamais d'appel au LLM)"""
+    job_description = (document.metadata or {}).get('job_description', '')
+    return job_analysis.cached_analyses([job_description]).get(job_description) if job_description else None
+
+
+def rescore_documents(documents, batch_size=200):
+    """
+    Recalcule le score des documents terminés d'un queryset, par lots.
+
+    Une requête par lot pour les analyses d'offres, une mise à jour groupée
+    par lot ; les compteurs UserDocumentStats reçoivent la variation de score
+    (bulk_update ne déclenche pas les signaux). Retourne le nombre de documents.
+    """
+    documents = (
+        documents.filter(statut='completed').order_by('id')
+        .only('id', 'user_id', 'type', 'poste', 'contenu', 'metadata', 'score')
+    )
+    count = 0
+    last_id = 0
+    while True:
+        batch = list(documents.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        analyses = job_analysis.cached_analyses({(document.metadata or {}).get('job_description', '') for document in batch})
+        deltas = {}
+        for document in batch:
+            previous = document.score
+            apply_score(document, analyses.get((document.metadata or {}).get('job_description', '')))
+            key = (document.user_id, document.type)
+            deltas[key] = deltas.get(key, 0) + document.score - previous
+        Document.objects.bulk_update(batch, ['score', 'metadata'])
+        if settings.DASHBOARD_STATS_DENORMALIZED:
+            for (user_id, type), delta in deltas.items():
+                UserDocumentStats.apply_delta(user_id, type, create=False, score_total=delta)
+        count += len(batch)
+        last_id = batch[-1].id
+        logger.debug(f"Rescored {count} documents (last id {last_id})")
+    return count
@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from Agent.models import CacheCounter, SearchCacheEntry
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = 'search'
+
+# Appels en cours dans ce processus, par clé (single-flight local)
+_inflight = {}
+_refreshing = set()
+_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def normalize(target_role, company):
+    """Couple (poste, entreprise) en minuscules, espaces compactés"""
+    return (
+        re.sub(r'\s+', ' ', target_role or '').strip().casefold(),
+        re.sub(r'\s+', ' ', company or '').strip().casefold(),
+    )
+
+
+def make_key(role, company):
+    return hashlib.sha256(f"{role}|{company}".encode('utf-8')).hexdigest()
+
+
+def get_context(target_role, company, fetch):
+    """
+    Retourne le contexte de recherche pour ce poste et cette entreprise.
+
+    `fetch(role, company)` n'est appelé qu'en cas d'absence ou d'expiration :
+    - entrée fraîche (moins de SEARCH_CACHE_TTL) : servie directement ;
+    - entrée périmée mais dans la fenêtre SEARCH_CACHE_STALE_TTL : servie
+      directement et rafraîchie en arrière-plan ;
+    - sinon : une seule recherche sortante par clé, les appels concurrents
+      (threads de ce processus ou autres processus) attendent son résultat.
+    """
+    role, company = normalize(target_role, company)
+    key = make_key(role, company)
+    now = timezone.now()
+
+    entry = SearchCacheEntry.objects.filter(cle=key).only('contexte', 'date_recherche').first()
+    if entry is not None and entry.date_recherche is not None:
+        age = (now - entry.date_recherche).total_seconds()
+        if age < settings.SEARCH_CACHE_TTL:
+            CacheCounter.record(CACHE_NAME, hit=True)
+            logger.debug(f"Search cache hit: {role} / {company}")
+            return entry.contexte
+        if age < settings.SEARCH_CACHE_TTL + settings.SEARCH_CACHE_STALE_TTL:
+            CacheCounter.record(CACHE_NAME, hit=True)
+            logger.debug(f"Search cache stale hit, revalidating: {role} / {company}")
+            _refresh_in_background(key, role, company, fetch)
+            return entry.contexte
+
+    CacheCounter.record(CACHE_NAME, hit=False)
+    logger.debug(f"Search cache miss: {role} / {company}")
+    return _single_flight(key, role, company, fetch)
+
+
+def _single_flight(key, role, company, fetch):
+    """Un seul appel à fetch par clé dans ce processus ; les autres threads attendent"""
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        if call.event.wait(timeout=settings.SEARCH_CACHE_LOCK_TIMEOUT):
+            if call.error is not None:
+                raise call.error
+            return call.result
+        logger.warning(f"Timed out waiting for in-flight search: {role} / {company}")
+        return fetch(role, company)
+
+    try:
+        call.result = _fetch_shared(key, role, company, fetch)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        call.event.set()
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def _is_fresh(date_recherche):
+    if date_recherche is None:
+        return False
+    return (timezone.now() - date_recherche).total_seconds() < settings.SEARCH_CACHE_TTL
+
+
+def _acquire_lease(key):
+    """Réserve la recherche de cette clé pour ce processus (UPDATE conditionnel)"""
+    now = timezone.now()
+    return SearchCacheEntry.objects.filter(cle=key).filter(
+        Q(verrou_jusqu_a__isnull=True) | Q(verrou_jusqu_a__lt=now)
+    ).update(verrou_jusqu_a=now + timedelta(seconds=settings.SEARCH_CACHE_LOCK_TIMEOUT)) == 1
+
+
+def _release_lease(key):
+    SearchCacheEntry.objects.filter(cle=key).update(verrou_jusqu_a=None)
+
+
+def _run_and_store(key, role, company, fetch):
+    try:
+        context = fetch(role, company)
+    except Exception:
+        _release_lease(key)
+        raise
+    SearchCacheEntry.objects.filter(cle=key).update(
+        contexte=context, date_recherche=timezone.now(), verrou_jusqu_a=None
+    )
+    return context
+
+
+def _fetch_shared(key, role, company, fetch):
+    """Un seul appel à fetch par clé entre processus, coordonné par un bail en base"""
+    entry, _ = SearchCacheEntry.objects.get_or_create(cle=key, defaults={'poste': role, 'entreprise': company})
+    if _is_fresh(entry.date_recherche):
+        # Rempli par un appel terminé entre notre lecture et notre tour
+        return entry.contexte
+    if _acquire_lease(key):
+        return _run_and_store(key, role, company, fetch)
+
+    # Un autre processus fait déjà cette recherche : attendre son résultat
+    started = timezone.now()
+    deadline = time.monotonic() + settings.SEARCH_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.2)
+        entry = SearchCacheEntry.objects.filter(cle=key).values('contexte', 'date_recherche', 'verrou_jusqu_a').first()
+        if entry is None:
+            break
+        if entry['date_recherche'] is not None and entry['date_recherche'] >= started:
+            return entry['contexte']
+        if entry['verrou_jusqu_a'] is None:
+            # Le détenteur du bail a échoué : on tente nous-mêmes
+            break
+    if _acquire_lease(key):
+        return _run_and_store(key, role, company, fetch)
+    return fetch(role, company)
+
+
+def _refresh_in_background(key, role, company, fetch):
+    """Rafraîchit une entrée périmée dans un thread, si personne d'autre ne le fait"""
+    with _lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    if not _acquire_lease(key):
+        with _lock:
+            _refreshing.discard(key)
+        return
+
+    def refresh():
+        try:
+            _run_and_store(key, role, company, fetch)
+            logger.debug(f"Search cache refreshed: {role} / {company}")
+        except Exception as e:
+            logger.error(f"Background search refresh failed for {role} / {company}: {str(e)}")
+        finally:
+            with _lock:
+                _refreshing.discard(key)
+            connection.close()
+
+    threading.Thread(target=refresh, name=f"search-refresh-{key[:8]}", daemon=True).start()
+
+
+# Variante asynchrone (vues ASGI) : mêmes règles, sans bloquer la boucle d'événements
+_ainflight = {}
+_background_tasks = set()
+
+
+async def aget_context(target_role, company, afetch):
+    """Équivalent asynchrone de get_context ; `afetch(role, company)` est une coroutine"""
+    role, company = normalize(target_role, company)
+    key = make_key(role, company)
+    now = timezone.now()
+
+    entry = await SearchCacheEntry.objects.filter(cle=key).only('contexte', 'date_recherche').afirst()
+    if entry is not None and entry.date_recherche is not None:
+        age = (now - entry.date_recherche).total_seconds()
+        if age < settings.SEARCH_CACHE_TTL:
+            await sync_to_async(CacheCounter.record)(CACHE_NAME, hit=True)
+            logger.debug(f"Search cache hit: {role} / {company}")
+            return entry.contexte
+        if age < settings.SEARCH_CACHE_TTL + settings.SEARCH_CACHE_STALE_TTL:
+            await sync_to_async(CacheCounter.record)(CACHE_NAME, hit=True)
+            logger.debug(f"Search cache stale hit, revalidating: {role} / {company}")
+            await _arefresh_in_background(key, role, company, afetch)
+            return entry.contexte
+
+    await sync_to_async(CacheCounter.record)(CACHE_NAME, hit=False)
+    logger.debug(f"Search cache miss: {role} / {company}")
+
+    # Single-flight dans la boucle : les coroutines concurrentes attendent la même tâche
+    task = _ainflight.get(key)
+    if task is None:
+        task = _ainflight[key] = asyncio.ensure_future(_afetch_shared(key, role, company, afetch))
+        task.add_done_callback(lambda _: _ainflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _aacquire_lease(key):
+    now = timezone.now()
+    updated = await SearchCacheEntry.objects.filter(cle=key).filter(
+        Q(verrou_jusqu_a__isnull=True) | Q(verrou_jusqu_a__lt=now)
+    ).aupdate(verrou_jusqu_a=now + timedelta(seconds=settings.SEARCH_CACHE_LOCK_TIMEOUT))
+    return updated == 1
+
+
+async def _arun_and_store(key, role, company, afetch):
+    try:
+        context = await afetch(role, company)
+    except Exception:
+        await SearchCacheEntry.objects.filter(cle=key).aupdate(verrou_jusqu_a=None)
+        raise
+    await SearchCacheEntry.objects.filter(cle=key).aupdate(
+        contexte=context, date_recherche=timezone.now(), verrou_jusqu_a=None
+    )
+    return context
+
+
+async def _afetch_shared(key, role, company, afetch):
+    entry, _ = await SearchCacheEntry.objects.aget_or_create(cle=key, defaults={'poste': role, 'entreprise': company})
+    if _is_fresh(entry.date_recherche):
+        return entry.contexte
+    if await _aacquire_lease(key):
+        return await _arun_and_store(key, role, company, afetch)
+
+    # Un autre processus fait déjà cette recherche : attendre son résultat
+    started = timezone.now()
+    deadline = time.monotonic() + settings.SEARCH_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+        entry = await SearchCacheEntry.objects.filter(cle=key).values('contexte', 'date_recherche', 'verrou_jusqu_a').afirst()
+        if entry is None:
+            break
+        if entry['date_recherche'] is not None and entry['date_recherche'] >= started:
+            return entry['contexte']
+        if entry['verrou_jusqu_a'] is None:
+            break
+    if await _aacquire_lease(key):
+        return await _arun_and_store(key, role, company, afetch)
+    return await afetch(role, company)
+
+
+async def _arefresh_in_background(key, role, company, afetch):
+    if key in _refreshing or not await _aacquire_lease(key):
+        return
+    _refreshing.add(key)
+
+    async def refresh():
+        try:
+            await _arun_and_store(key, role, company, afetch)
+            logger.debug(f"Search cache refreshed: {role} / {company}")
+        except Exception as e:
+            logger.error(f"Background search refresh failed for {role} / {company}: {str(e)}")
+        finally:
+            _refreshing.discard(key)
+
+    task = asyncio.ensure_future(refresh())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
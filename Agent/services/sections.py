@@ -0,0 +1,324 @@
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from Agent.services import prompt_budget
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter quand le découpage ou les empreintes changent : les documents
+# générés avec une autre version sont régénérés entièrement à la modification suivante
+SECTIONS_VERSION = 1
+METADATA_KEY = 'sections'
+
+# Entrées qui changent tout le document : ton, langue, poste, offre...
+GLOBAL_FIELDS = ('document_type', 'langue', 'tone', 'template_utilise', 'target_role', 'company', 'job_description')
+# Entrées dont dépendent les sections, régénérées par le LLM quand elles changent
+INPUT_FIELDS = ('skills', 'keywords', 'experiences', 'education')
+# Champs factuels, corrigés directement dans le texte sans appel au LLM
+FACT_FIELDS = ('name', 'email', 'telephone', 'linkedin_url', 'github_url')
+FACT_LABELS = {'name': 'Name', 'email': 'Email', 'telephone': 'Telephone', 'linkedin_url': 'LinkedIn', 'github_url': 'GitHub'}
+# Le nom n'est corrigé que dans le préambule et les coordonnées ; ailleurs
+# (résumé, expériences) la section est réécrite par une génération complète
+CONTACT_SECTIONS = ('header', 'personal')
+CONTACT_ONLY_FACTS = ('name',)
+
+# Titres de section reconnus (normalisés : minuscules, sans accents) → clé de section
+SECTION_TITLES = {
+    'personal': ('personal information', 'personal details', 'informations personnelles', 'contact', 'contacts', 'coordonnees'),
+    'summary': ('summary', 'professional summary', 'profile', 'profil', 'resume', 'a propos', 'about me'),
+    'skills': ('skills', 'technical skills', 'competences', 'competences techniques'),
+    'experience': ('professional experience', 'experience', 'experiences', 'work experience',
+                   'experience professionnelle', 'experiences professionnelles'),
+    'education': ('education', 'formation', 'formations', 'diplomes'),
+    'projects': ('projects', 'projets'),
+    'certifications': ('certifications', 'certificats'),
+    'languages': ('languages', 'langues'),
+}
+# Entrées dont dépend chaque section ; les sections inconnues dépendent de tout
+SECTION_INPUTS = {
+    'personal': (),
+    'skills': ('skills', 'keywords'),
+    'experience': ('experiences', 'keywords'),
+    'education': ('education',),
+    'projects': ('experiences', 'keywords'),
+    'certifications': ('education',),
+    'languages': ('skills',),
+}
+DEFAULT_INPUTS = INPUT_FIELDS
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+FENCE_RE = re.compile(r'^```[\w-]*\n?|\n?```\s*$')
+URL_PREFIX_RE = re.compile(r'^(?:https?://)?(?:www\.)?', re.IGNORECASE)
+# Ce qui reste d'une ligne de contact une fois la valeur retirée (« - **Téléphone :** »)
+EMPTY_FACT_LINE_RE = re.compile(r'^[\s>*_|•:-]*(?:[^\W\d_][\w ]{0,20})?[\s*_|•:-]*$')
+# Forme des lignes de coordonnées existantes (« - **Email:** ... »), reprise pour en ajouter une
+FACT_LINE_RE = re.compile(r'^(\s*[-*+]\s+)(\*\*|__)?[^\n:*_]{1,30}:', re.MULTILINE)
+
+
+@dataclass
+class Section:
+    key: str
+    text: str
+    inputs: tuple = ()
+
+
+@dataclass
+class Plan:
+    """Modification incrémentale d'un document : correctifs factuels et sections à régénérer"""
+    sections: list
+    patches: dict = field(default_factory=dict)
+    regenerate: list = field(default_factory=list)
+
+    @property
+    def mode(self):
+        return 'incremental' if self.patches or self.regenerate else 'unchanged'
+
+
+def _normalize_title(title):
+    title = re.sub(r'[*_`:]', '', title).strip().casefold()
+    title = unicodedata.normalize('NFKD', title)
+    return ' '.join(''.join(char for char in title if not unicodedata.combining(char)).split())
+
+
+def _title_key(title):
+    normalized = _normalize_title(title)
+    for key, titles in SECTION_TITLES.items():
+        if normalized in titles:
+            return key
+    return None
+
+
+def _header_inputs(text, facts):
+    """Le préambule ne dépend des entrées que s'il contient autre chose que le titre et les coordonnées"""
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('# ') or any(value and value in line for value in facts.values()):
+            continue
+        return DEFAULT_INPUTS
+    return ()
+
+
+def split_sections(markdown, facts=None):
+    """
+    Découpe un document Markdown en sections.
+
+    Le niveau de découpage est celui du premier titre reconnu (Skills,
+    Education...) ; le texte qui le précède forme la section 'header'. Les
+    titres non reconnus de ce niveau donnent une clé dérivée de leur texte.
+    Sans titre reconnu (lettre de motivation), tout le document est 'header'.
+    """
+    lines = (markdown or '').splitlines(keepends=True)
+    level = None
+    for line in lines:
+        match = HEADING_RE.match(line.rstrip('\n'))
+        if match and _title_key(match.group(2)):
+            level = len(match.group(1))
+            break
+
+    sections = [Section('header', '')]
+    for line in lines:
+        match = HEADING_RE.match(line.rstrip('\n')) if level else None
+        if match and len(match.group(1)) == level:
+            title = match.group(2)
+            key = _title_key(title) or re.sub(r'[^a-z0-9]+', '-', _normalize_title(title)).strip('-') or 'section'
+            used = {section.key for section in sections}
+            base, suffix = key, 2
+            while key in used:
+                key, suffix = f'{base}-{suffix}', suffix + 1
+            sections.append(Section(key, line, SECTION_INPUTS.get(_title_key(title), DEFAULT_INPUTS)))
+        else:
+            sections[-1].text += line
+    sections[0].inputs = _header_inputs(sections[0].text, facts or {})
+    return sections
+
+
+def join_sections(sections):
+    return ''.join(section.text for section in sections)
+
+
+def _digest(value):
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+def _inputs(payload, document_type):
+    values = {name: payload.get(name, '') for name in GLOBAL_FIELDS + INPUT_FIELDS}
+    values['document_type'] = payload.get('document_type', document_type)
+    return values
+
+
+def _facts(user_data):
+    return {name: str(user_data.get(name) or '') for name in FACT_FIELDS}
+
+
+def fingerprint(document_type, payload, user_data):
+    """Empreintes des entrées d'un document, à conserver dans Document.metadata['sections']"""
+    values = _inputs(payload, document_type)
+    return {
+        'version': SECTIONS_VERSION,
+        'global': _digest([values[name] for name in GLOBAL_FIELDS]),
+        'inputs': {name: _digest(values[name]) for name in INPUT_FIELDS},
+        'facts': _facts(user_data),
+    }
+
+
+def remember(document, payload, user_data):
+    """Enregistre dans le document les empreintes des entrées qui ont produit son contenu (déjà à jour)"""
+    state = fingerprint(document.type, payload, user_data)
+    state['content'] = _digest(document.contenu)
+    document.metadata[METADATA_KEY] = state
+
+
+def _fact_pattern(name, value):
+    """Expression qui retrouve une valeur factuelle dans le texte, à la mise en forme près"""
+    if name == 'telephone':
+        digits = re.sub(r'\D', '', value)
+        if len(digits) < 6:
+            return None
+        prefix = r'\+?' if value.strip().startswith('+') else ''
+        return re.compile(r'(?<!\d)' + prefix + r'[\s.\-()]*'.join(digits) + r'(?!\d)')
+    if name in ('linkedin_url', 'github_url'):
+        core = URL_PREFIX_RE.sub('', value.strip()).rstrip('/')
+        if not core:
+            return None
+        return re.compile(r'(?<![\w/.])(?:https?://)?(?:www\.)?' + re.escape(core) + r'/?(?![\w/-])', re.IGNORECASE)
+    if name == 'email':
+        return re.compile(r'(?<![\w.+-])' + re.escape(value.strip()) + r'(?![\w-]|\.\w)') if value.strip() else None
+    # Mot entier : « Al » ne doit pas toucher « Algorithms » ni « Alstom »
+    return re.compile(r'(?<!\w)' + re.escape(value.strip()) + r'(?!\w)') if value.strip() else None
+
+
+def _drop_fact(text, pattern):
+    """Retire une valeur du texte ; une ligne qui ne contient plus qu'un libellé est supprimée"""
+    value = pattern.pattern
+    pattern = re.compile(rf'\[[^\]\n]*\]\(\s*(?:{value})\s*\)|<(?:{value})>|{value}', pattern.flags)
+    lines = []
+    for line in text.splitlines(keepends=True):
+        if not pattern.search(line):
+            lines.append(line)
+            continue
+        remainder = pattern.sub('', line)
+        if not EMPTY_FACT_LINE_RE.match(remainder.strip()):
+            lines.append(re.sub(r'\s*[|•,]\s*(?=\n|$)', '', re.sub(r'[ \t]{2,}', ' ', remainder)))
+    return ''.join(lines)
+
+
+def patch_fact(sections, name, old, new):
+    """
+    Remplace une valeur factuelle (téléphone, URL, nom, e-mail) dans les sections.
+
+    Retourne False quand la valeur ne peut pas être corrigée sans le LLM :
+    ancienne valeur introuvable dans le texte, nom cité hors du préambule et
+    des coordonnées, ou valeur nouvelle sans section de coordonnées où l'ajouter.
+    """
+    pattern = _fact_pattern(name, old) if old else None
+    scope = sections
+    if name in CONTACT_ONLY_FACTS:
+        scope = [section for section in sections if section.key in CONTACT_SECTIONS]
+        if pattern is not None and any(pattern.search(section.text) for section in sections if section.key not in CONTACT_SECTIONS):
+            return False
+    if pattern is not None and any(pattern.search(section.text) for section in scope):
+        for section in scope:
+            if new:
+                section.text = pattern.sub(lambda match: new, section.text)
+            else:
+                section.text = _drop_fact(section.text, pattern)
+        return True
+    if not new:
+        return True
+    if old:
+        return False
+    personal = next((section for section in sections if section.key == 'personal'), None)
+    if personal is None:
+        return False
+    body = personal.text.rstrip('\n')
+    trailing = personal.text[len(body):] or '\n'
+    match = FACT_LINE_RE.search(body)
+    prefix, bold = (match.group(1), match.group(2) or '') if match else ('- ', '')
+    personal.text = f"{body}\n{prefix}{bold}{FACT_LABELS[name]}:{bold} {new}{trailing}"
+    return True
+
+
+def plan_update(document, payload, user_data):
+    """
+    Prépare la modification incrémentale d'un document déjà généré.
+
+    Compare les entrées du formulaire aux empreintes enregistrées à la
+    génération précédente. Retourne None quand une régénération complète est
+    nécessaire : pas de contenu ou d'empreintes, contenu différent de celui
+    des empreintes (génération interrompue), entrée globale modifiée
+    (offre, ton, langue...), entrée modifiée sans section correspondante,
+    toutes les sections concernées, ou valeur factuelle impossible à corriger.
+    """
+    state = (document.metadata or {}).get(METADATA_KEY)
+    if not document.contenu or not state or state.get('version') != SECTIONS_VERSION:
+        return None
+    if state.get('content') != _digest(document.contenu):
+        return None
+    current = fingerprint(document.type, payload, user_data)
+    if current['global'] != state['global']:
+        return None
+
+    old_facts = state.get('facts', {})
+    sections = split_sections(document.contenu, old_facts)
+    changed = {name for name in INPUT_FIELDS if current['inputs'][name] != state['inputs'].get(name)}
+    dependent = [section for section in sections if section.inputs]
+    regenerate = [section.key for section in dependent if changed.intersection(section.inputs)]
+    covered = {name for section in dependent if section.key in regenerate for name in section.inputs}
+    if changed - covered or (regenerate and len(regenerate) == len(dependent)):
+        return None
+
+    plan = Plan(sections, regenerate=regenerate)
+    for name, new in current['facts'].items():
+        old = old_facts.get(name, '')
+        if new == old:
+            continue
+        if not patch_fact(sections, name, old, new):
+            return None
+        plan.patches[name] = new
+    return plan
+
+
+def section_prompt(section, document_type, payload, user_data):
+    """Prompt qui réécrit une seule section à partir des entrées mises à jour"""
+    compacted, _ = prompt_budget.compact_sections(
+        document_type, payload.get('job_description', ''),
+        user_data.get('experiences', []), user_data.get('education', []), '',
+    )
+    details = []
+    if {'skills', 'keywords'} & set(section.inputs):
+        skills = ', '.join(user_data.get('skills', []))
+        details.append(f"- Skills: {skills}")
+        if payload.get('keywords'):
+            details.append(f"- Keywords to highlight: {payload['keywords']}")
+    if 'experiences' in section.inputs:
+        details.append(f"- Experiences: {compacted['experiences']}")
+    if 'education' in section.inputs:
+        details.append(f"- Education: {compacted['education']}")
+    document_name = 'CV' if document_type == 'CV' else 'Letter of Motivation'
+    return f"""
+        You are updating one section of an existing {document_name} in {payload.get('langue', 'fr')} for a {payload.get('target_role', '')} position at {payload.get('company', '')}.
+        Use a {payload.get('tone', 'professionnel')} tone. Rewrite the section below so that it reflects the updated details:
+        {chr(10).join(details)}
+        - Job Description: {compacted['job_description']}
+        Keep the same heading, structure and markdown formatting. Return only the rewritten section, without any other section or commentary.
+
+        Current section:
+        {section.text.strip()}
+        """
+
+
+def clean_section(section, generated):
+    """Texte régénéré d'une section : sans bloc de code, avec le titre d'origine et la même fin de ligne"""
+    text = FENCE_RE.sub('', generated.strip()).strip()
+    original_lines = section.text.splitlines()
+    if section.key != 'header' and original_lines:
+        lines = text.splitlines()
+        if lines and HEADING_RE.match(lines[0]):
+            lines = lines[1:]
+        text = '\n'.join([original_lines[0], *lines]).rstrip()
+    trailing = section.text[len(section.text.rstrip('\n')):] or '\n'
+    return text + trailing
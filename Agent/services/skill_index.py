@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from Agent.models import Document
+from Agent.services.skills import get_matcher
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'skill_index.json'
+# Nombre minimum de paniers où deux compétences apparaissent ensemble pour les déclarer voisines
+MIN_COOCCURRENCE = 2
+# Les paniers plus grands (texte fourre-tout) sont tronqués : ils coûtent m² paires
+MAX_BASKET_SIZE = 80
+
+# Voisins saisis à la main, utilisés tant que l'index n'est pas construit (déploiement neuf,
+# base de test) et pour les compétences sans voisin dans l'index
+FALLBACK_SIMILAR = {
+    "React": ["JavaScript", "TypeScript", "Frontend", "Web Development"],
+    "Node.js": ["JavaScript", "Backend", "API Development"],
+    "Python": ["Django", "Flask", "Data Analysis", "Automation"],
+    "Machine Learning": ["Data Science", "AI", "Python", "Statistics"],
+}
+
+
+def _json_list(value):
+    if isinstance(value, list):
+        return value
+    try:
+        value = json.loads(value or '[]')
+    except (TypeError, ValueError):
+        return []
+    return value if isinstance(value, list) else []
+
+
+def collect_baskets():
+    """
+    Paniers de compétences (noms canoniques) dont on compte les co-occurrences :
+    le profil de chaque utilisateur (compétences saisies dans ses documents)
+    et chaque offre distincte (compétences repérées dans sa description).
+    """
+    matcher = get_matcher()
+    profiles, offers = {}, set()
+    rows = Document.objects.order_by().values_list('user_id', 'metadata').iterator(chunk_size=2000)
+    for user_id, metadata in rows:
+        metadata = metadata or {}
+        profile = profiles.setdefault(user_id, {})
+        for skill in _json_list(metadata.get('skills')):
+            profile[matcher.canonical(str(skill))] = None
+        job_description = metadata.get('job_description') or ''
+        if job_description:
+            offers.add(job_description)
+
+    baskets = [list(profile) for profile in profiles.values()]
+    baskets.extend(matcher.extract(job_description) for job_description in offers)
+    return baskets
+
+
+def build_index(baskets, names, top_k):
+    """
+    Voisins les plus proches de chaque compétence, par co-occurrence.
+
+    La similarité de deux compétences est leur nombre de paniers communs
+    divisé par la moyenne géométrique de leurs fréquences (cosinus sur la
+    matrice paniers x compétences). La matrice de co-occurrence reste creuse
+    (paires triées et comptées avec np.unique) ; seuls les `top_k` meilleurs
+    voisins de chaque compétence sont gardés.
+
+    Retourne (voisins int32 (V, k), -1 si absent ; scores float32 (V, k)).
+    """
+    size = len(names)
+    ids = {name.casefold(): i for i, name in enumerate(names)}
+    codes = []
+    frequency = np.zeros(size, dtype=np.int64)
+    for basket in baskets:
+        items = np.unique(np.array([ids[skill.casefold()] for skill in basket if skill.casefold() in ids][:MAX_BASKET_SIZE], dtype=np.int64))
+        if len(items) == 0:
+            continue
+        frequency[items] += 1
+        if len(items) > 1:
+            pairs = (items[:, None] * size + items[None, :]).ravel()
+            codes.append(pairs[pairs // size != pairs % size])
+
+    neighbours = np.full((size, top_k), -1, dtype=np.int32)
+    scores = np.zeros((size, top_k), dtype=np.float32)
+    if not codes:
+        return neighbours, scores
+
+    pairs, counts = np.unique(np.concatenate(codes), return_counts=True)
+    keep = counts >= MIN_COOCCURRENCE
+    pairs, counts = pairs[keep], counts[keep]
+    rows, columns = pairs // size, pairs % size
+    similarity = counts / np.sqrt(frequency[rows] * frequency[columns])
+
+    # Tri par compétence puis similarité décroissante, rang du voisin dans sa ligne
+    order = np.lexsort((columns, -similarity, rows))
+    rows, columns, similarity = rows[order], columns[order], similarity[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < top_k
+    neighbours[rows[keep], rank[keep]] = columns[keep]
+    scores[rows[keep], rank[keep]] = similarity[keep]
+    return neighbours, scores
+
+
+def rebuild(directory=None, top_k=None):
+    """
+    Reconstruit l'index sur disque et retourne son manifeste.
+
+    Les tableaux sont écrits sous un nom daté puis le manifeste est remplacé
+    atomiquement : les processus qui lisent l'index passent d'une version
+    complète à l'autre. Les fichiers des versions précédentes sont supprimés.
+    """
+    directory = directory or settings.SKILL_INDEX_DIR
+    top_k = top_k or settings.SKILL_INDEX_TOP_K
+    os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    names = get_matcher().names
+    baskets = collect_baskets()
+    neighbours, scores = build_index(baskets, names, top_k)
+
+    stamp = timezone.now().strftime('%Y%m%d%H%M%S%f')
+    files = {'neighbours': f'neighbours-{stamp}.npy', 'scores': f'scores-{stamp}.npy'}
+    np.save(os.path.join(directory, files['neighbours']), neighbours)
+    np.save(os.path.join(directory, files['scores']), scores)
+    manifest = {
+        'version': stamp,
+        'top_k': top_k,
+        'names': names,
+        'files': files,
+        'baskets': len(baskets),
+        'skills_with_neighbours': int((neighbours[:, 0] >= 0).sum()),
+        'built_in_seconds': round(time.perf_counter() - start, 3),
+    }
+    tmp_path = os.path.join(directory, f'{MANIFEST_NAME}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_NAME))
+
+    for name in os.listdir(directory):
+        if name.endswith('.npy') and name not in files.values():
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    logger.info(f"Skill index {stamp} built: {len(baskets)} baskets, {manifest['skills_with_neighbours']} skills with neighbours")
+    return manifest
+
+
+class SkillIndex:
+    """Index de voisinage chargé en mémoire partagée (np.load en mmap, lecture seule)"""
+
+    def __init__(self, directory, manifest):
+        self.version = manifest['version']
+        self.names = manifest['names']
+        self._ids = {name.casefold(): i for i, name in enumerate(self.names)}
+        self._names = np.array(self.names, dtype=object)
+        self.neighbours = np.load(os.path.join(directory, manifest['files']['neighbours']), mmap_mode='r')
+        self.scores = np.load(os.path.join(directory, manifest['files']['scores']), mmap_mode='r')
+
+    def ids(self, skills):
+        matcher = get_matcher()
+        return np.array([self._ids.get(matcher.canonical(str(skill)).casefold(), -1) for skill in skills], dtype=np.int64)
+
+    def similar(self, skills, existing_skills=(), limit=5):
+        """
+        Compétences voisines de chaque compétence de `skills`, en une seule lecture des tableaux.
+
+        Les voisins déjà présents dans `existing_skills` (compétences
+        transférables du candidat) passent en tête, puis l'ordre de
+        similarité. Retourne {compétence: [voisins]} ; une compétence inconnue
+        de l'index n'a pas de voisin.
+        """
+        skills = list(skills)
+        if not skills:
+            return {}
+        ids = self.ids(skills)
+        known = ids >= 0
+        rows = np.full((len(skills), self.neighbours.shape[1]), -1, dtype=np.int64)
+        rows[known] = self.neighbours[ids[known]]
+
+        owned = np.isin(rows, self.ids(existing_skills)) & (rows >= 0)
+        # tri stable : voisins possédés d'abord, ordre de similarité ensuite
+        order = np.argsort(~owned, axis=1, kind='stable')
+        rows = np.take_along_axis(rows, order, axis=1)[:, :limit]
+        return {
+            skill: self._names[row[row >= 0]].tolist()
+            for skill, row in zip(skills, rows)
+        }
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+_missing_index_warned = False
+
+
+def get_index():
+    """Index courant (None s'il n'a jamais été construit), rechargé quand le manifeste change"""
+    global _index, _index_mtime
+    path = os.path.join(settings.SKILL_INDEX_DIR, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if mtime != _index_mtime:
+        with _index_lock:
+            if mtime != _index_mtime:
+                with open(path, encoding='utf-8') as f:
+                    manifest = json.load(f)
+                _index = SkillIndex(settings.SKILL_INDEX_DIR, manifest)
+                _index_mtime = mtime
+                logger.info(f"Skill index {_index.version} loaded from {settings.SKILL_INDEX_DIR}")
+    return _index
+
+
+def _fallback(skill, limit):
+    return FALLBACK_SIMILAR.get(get_matcher().canonical(skill), [])[:limit]
+
+
+def similar_skills(skills, existing_skills=(), limit=5):
+    """Voisins de chaque compétence ; la table FALLBACK_SIMILAR complète l'index (ou le remplace s'il manque)"""
+    global _missing_index_warned
+    skills = list(skills)
+    index = get_index()
+    if index is None:
+        if not _missing_index_warned:
+            _missing_index_warned = True
+            logger.warning("Skill index not built yet, run `manage.py build_skill_index`; using the built-in map")
+        return {skill: _fallback(skill, limit) for skill in skills}
+    similar = index.similar(skills, existing_skills, limit)
+    return {skill: neighbours or _fallback(skill, limit) for skill, neighbours in similar.items()}
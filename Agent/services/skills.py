@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+from functools import lru_cache
+from itertools import repeat
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'skills_taxonomy.json')
+
+# Ponctuation retirée autour des mots ; à l'intérieur d'un mot, - / ' . + # & sont
+# conservés (« CI/CD », « Node.js », « C++ », « d'équipe »). Le point n'est retiré
+# qu'en fin de mot : « .NET » garde le sien, « Python. » le perd.
+STRIP_CHARS = ',;:()[]{}!?"«»“”‘’\'`|<>*•…–—-'
+RSTRIP_CHARS = STRIP_CHARS + '.'
+
+# Clé de nœud du trie qui porte le nom canonique d'une expression complète
+TERMINAL = None
+
+
+def _word_key(word):
+    return word.rstrip(RSTRIP_CHARS).lstrip(STRIP_CHARS)
+
+
+def _words(text):
+    return tuple(_word_key(word) for word in text.split())
+
+
+def _variants(form):
+    """Écritures d'une forme : « front-end » est aussi « front end » et « frontend »"""
+    form = form.replace('’', "'")
+    variants = {form}
+    if '-' in form or '/' in form:
+        variants.add(form.replace('-', ' ').replace('/', ' '))
+    if '-' in form:
+        variants.add(form.replace('-', ''))
+    variants |= {variant.replace("'", '’') for variant in variants if "'" in variant}
+    return variants
+
+
+def load_taxonomy(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['skills']
+
+
+class SkillMatcher:
+    """
+    Repère les compétences d'une taxonomie dans un texte.
+
+    Les formes (nom canonique et synonymes) sont rangées dans un trie de mots ;
+    l'extraction parcourt les mots du texte une seule fois et garde, à chaque
+    position, l'expression la plus longue (« React Native » ne produit pas
+    aussi « React »). Une expression ne traverse pas une ponctuation
+    (« React, Native »). Les noms marqués `case_sensitive` (« Go », « R »,
+    « Spring »...) ne sont reconnus qu'avec leur casse exacte, dans un second
+    trie ; les synonymes ne tiennent jamais compte de la casse.
+    """
+
+    def __init__(self, skills):
+        self.categories = {}
+        self._trie = {}
+        self._exact_trie = {}
+        # nombre maximum de mots d'une expression exacte
+        self._exact_depth = 1
+        exact_first = set()
+
+        for skill in skills:
+            name = skill['name']
+            self.categories.setdefault(name, skill.get('category', ''))
+            forms = list(skill.get('synonyms', ()))
+            if skill.get('case_sensitive'):
+                for variant in _variants(name):
+                    words = _words(variant)
+                    self._add(self._exact_trie, words, name)
+                    exact_first.add(words[0].lower())
+                    self._exact_depth = max(self._exact_depth, len(words))
+            else:
+                forms.insert(0, name)
+            for form in forms:
+                for variant in _variants(form):
+                    self._add(self._trie, _words(variant.lower()), name)
+
+        # premiers mots qui commencent par un point (« .net ») : le découpage rapide le retire
+        self._dotted = {word for word in self._trie if word.startswith('.')}
+        # premier mot en minuscules -> (nœud du trie ou None, premier mot d'une expression exacte ?,
+        # nom quand le mot est à lui seul une expression sans suite possible, cas le plus courant)
+        self._first_words = {}
+        for word in self._trie.keys() | exact_first:
+            node = self._trie.get(word)
+            single = node[TERMINAL] if node is not None and len(node) == 1 and TERMINAL in node else None
+            self._first_words[word] = (node, word in exact_first, single)
+
+    @staticmethod
+    def _add(trie, words, name):
+        if not words or not all(words):
+            return
+        node = trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node.setdefault(TERMINAL, name)
+
+    @staticmethod
+    def _lookup(trie, words):
+        node = trie
+        for word in words:
+            node = node.get(word)
+            if node is None:
+                return None
+        return node.get(TERMINAL)
+
+    @staticmethod
+    def _longest(node, keys, raw, position):
+        """(longueur, nom) de la plus longue expression commençant à `position`, `node` étant le nœud de son premier mot"""
+        best_length, best_name = 1, node.get(TERMINAL)
+        last = len(keys) - 1
+        current = position
+        while current < last and raw[current].endswith(keys[current]):
+            current += 1
+            key = keys[current]
+            if not raw[current].startswith(key):
+                break  # ponctuation entre les deux mots
+            node = node.get(key)
+            if node is None:
+                break
+            name = node.get(TERMINAL)
+            if name is not None:
+                best_length, best_name = current - position + 1, name
+        return best_length, best_name
+
+    def _keys(self, lowered, text):
+        keys = list(map(str.strip, lowered, repeat(RSTRIP_CHARS)))
+        if any(word in text for word in self._dotted):
+            keys = [
+                '.' + key if word.lstrip(STRIP_CHARS).startswith('.') else key
+                for word, key in zip(lowered, keys)
+            ]
+        return keys
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_TAXONOMY_PATH):
+        return cls(load_taxonomy(path))
+
+    @property
+    def names(self):
+        return list(self.categories)
+
+    def extract(self, text):
+        """Noms canoniques des compétences citées dans `text`, dans l'ordre d'apparition"""
+        if not text:
+            return []
+        lowered_text = text.lower()
+        lowered = lowered_text.split()
+        keys = self._keys(lowered, lowered_text)
+        original = None
+
+        depth, last = self._exact_depth, len(keys) - 1
+        # seules les positions dont le mot commence une expression sont examinées
+        hits = [(position, entry) for position, entry in enumerate(map(self._first_words.get, keys)) if entry is not None]
+        found = {}
+        skip_until = 0
+        for position, (node, in_exact, single) in hits:
+            if position < skip_until:
+                continue
+
+            if single is not None:
+                length, name = 1, single
+            elif node is None:
+                length, name = 0, None
+            elif position < last and keys[position + 1] in node:
+                length, name = self._longest(node, keys, lowered, position)
+            else:
+                length, name = 1, node.get(TERMINAL)  # le mot suivant ne prolonge aucune expression
+            if in_exact:
+                if original is None:
+                    # même découpage que `lowered` : lower() ne touche pas aux espaces
+                    original = text.split()
+                exact_node = self._exact_trie.get(_word_key(original[position]))
+                if exact_node is None:
+                    exact_length, exact_name = 0, None
+                elif len(exact_node) == 1 and TERMINAL in exact_node:
+                    exact_length, exact_name = 1, exact_node[TERMINAL]
+                else:
+                    window = original[position:position + depth]
+                    exact_length, exact_name = self._longest(exact_node, [_word_key(word) for word in window], window, 0)
+                if exact_name is not None and (name is None or exact_length > length):
+                    length, name = exact_length, exact_name
+
+            if name is not None:
+                found[name] = None
+                skip_until = position + length
+        return list(found)
+
+    def canonical(self, skill):
+        """Nom canonique d'une compétence, ou la chaîne nettoyée si elle est inconnue"""
+        skill = ' '.join((skill or '').replace('’', "'").split())
+        return self._lookup(self._trie, _words(skill.lower())) or self._lookup(self._exact_trie, _words(skill)) or skill
+
+    def match_skills(self, job_skills, candidate_skills):
+        """
+        Correspondance entre les compétences demandées et celles du candidat.
+
+        Les deux listes sont ramenées aux noms canoniques (« JS » et
+        « JavaScript » se correspondent) puis comparées par ensembles.
+        """
+        candidate = {self.canonical(skill).casefold() for skill in candidate_skills}
+        required = {}
+        for skill in job_skills:
+            required.setdefault(self.canonical(skill).casefold(), skill)
+
+        matched_skills = [skill for key, skill in required.items() if key in candidate]
+        missing_skills = [skill for key, skill in required.items() if key not in candidate]
+        match_percentage = len(matched_skills) / len(required) * 100 if required else 0
+        return {
+            "match_percentage": round(match_percentage, 2),
+            "matched_skills": matched_skills,
+            "missing_skills": missing_skills,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_matcher():
+    """Matcher construit une fois par processus à partir de SKILLS_TAXONOMY_PATH"""
+    matcher = SkillMatcher.from_file(settings.SKILLS_TAXONOMY_PATH)
+    logger.info(f"Skill taxonomy loaded: {len(matcher.categories)} skills from {settings.SKILLS_TAXONOMY_PATH}")
+    return matcher
+
+
+def extract_skills(text):
+    return get_matcher().extract(text)
+
+
+def match_skills(job_skills, candidate_skills):
+    return get_matcher().match_skills(job_skills, candidate_skills)
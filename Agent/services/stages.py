@@ -0,0 +1,207 @@
+import logging
+import math
+from contextlib import asynccontextmanager, contextmanager
+from datetime import timedelta
+from django.utils import timezone
+from Agent.models import EtapeTraitement
+
+logger = logging.getLogger(__name__)
+
+# Étapes de traitement, dans l'ordre où le pipeline les exécute
+STAGE_SEARCH = 1
+STAGE_PROMPT = 2
+STAGE_LLM = 3
+STAGE_POSTPROCESS = 4
+STAGE_SAVE = 5
+
+ETAPES = [
+    {"nom": "Job offer analysis", "ordre": STAGE_SEARCH},
+    {"nom": "Profile adaptation", "ordre": STAGE_PROMPT},
+    {"nom": "Content generation", "ordre": STAGE_LLM},
+    {"nom": "Optimization", "ordre": STAGE_POSTPROCESS},
+    {"nom": "Final validation", "ordre": STAGE_SAVE},
+]
+
+TRACKED_FIELDS = ['statut', 'details', 'date_debut', 'date_fin']
+
+
+class StageTracker:
+    """
+    Suit les étapes de traitement d'un document pendant qu'elles s'exécutent.
+
+    Les lignes EtapeTraitement sont gardées en mémoire ; chaque changement
+    (statut, date_debut, date_fin) est marqué puis écrit par bulk_update.
+    La fin d'une étape n'est écrite qu'au démarrage de la suivante, ce qui
+    fait une seule requête par transition.
+    """
+
+    def __init__(self, document, etapes):
+        self.document = document
+        self.etapes = {etape.ordre: etape for etape in etapes}
+        self._dirty = set()
+
+    @classmethod
+    def create(cls, document, etapes_data=ETAPES):
+        """(Re)crée les étapes d'un document, toutes en attente, en une insertion"""
+        EtapeTraitement.objects.filter(document=document).delete()
+        etapes = EtapeTraitement.objects.bulk_create([
+            EtapeTraitement(document=document, **etape_data) for etape_data in etapes_data
+        ])
+        logger.debug("Processing steps created")
+        return cls(document, etapes)
+
+    @classmethod
+    def load(cls, document):
+        """Reprend les étapes existantes d'un document (ou les crée)"""
+        etapes = list(EtapeTraitement.objects.filter(document=document).order_by('ordre'))
+        if not etapes:
+            return cls.create(document)
+        return cls(document, etapes)
+
+    @classmethod
+    async def acreate(cls, document, etapes_data=ETAPES):
+        await EtapeTraitement.objects.filter(document=document).adelete()
+        etapes = await EtapeTraitement.objects.abulk_create([
+            EtapeTraitement(document=document, **etape_data) for etape_data in etapes_data
+        ])
+        logger.debug("Processing steps created")
+        return cls(document, etapes)
+
+    @classmethod
+    async def aload(cls, document):
+        etapes = [etape async for etape in EtapeTraitement.objects.filter(document=document).order_by('ordre')]
+        if not etapes:
+            return await cls.acreate(document)
+        return cls(document, etapes)
+
+    def _mark(self, ordre, statut, details=None, date_debut=None, date_fin=None):
+        etape = self.etapes.get(ordre)
+        if etape is None:
+            return
+        etape.statut = statut
+        if details is not None:
+            etape.details = details
+        if date_debut is not None:
+            etape.date_debut = date_debut
+        if date_fin is not None:
+            etape.date_fin = date_fin
+        self._dirty.add(ordre)
+
+    def _pending_writes(self):
+        etapes = [self.etapes[ordre] for ordre in sorted(self._dirty)]
+        self._dirty.clear()
+        return etapes
+
+    def reset(self):
+        """Remet toutes les étapes en attente (nouvel essai)"""
+        for etape in self.etapes.values():
+            etape.statut = 'pending'
+            etape.details = ''
+            etape.date_debut = None
+            etape.date_fin = None
+        self._dirty.update(self.etapes)
+
+    def start(self, ordre):
+        self._mark(ordre, 'processing', date_debut=timezone.now())
+        self.flush()
+
+    def finish(self, ordre):
+        self._mark(ordre, 'completed', date_fin=timezone.now())
+
+    def fail(self, ordre, details):
+        self._mark(ordre, 'error', details=details, date_fin=timezone.now())
+        self.flush()
+
+    def abort(self, details):
+        """Passe en erreur les étapes restées en cours après une erreur hors étape"""
+        for ordre, etape in self.etapes.items():
+            if etape.statut == 'processing':
+                self._mark(ordre, 'error', details=details, date_fin=timezone.now())
+        self.flush()
+
+    def record(self, ordre, date_debut, date_fin):
+        """Enregistre une étape déjà exécutée ailleurs (ex. recherche lancée en parallèle)"""
+        self._mark(ordre, 'completed', date_debut=date_debut, date_fin=date_fin)
+
+    def flush(self):
+        etapes = self._pending_writes()
+        if etapes:
+            EtapeTraitement.objects.bulk_update(etapes, TRACKED_FIELDS)
+
+    async def astart(self, ordre):
+        self._mark(ordre, 'processing', date_debut=timezone.now())
+        await self.aflush()
+
+    async def afail(self, ordre, details):
+        self._mark(ordre, 'error', details=details, date_fin=timezone.now())
+        await self.aflush()
+
+    async def aabort(self, details):
+        """Passe en erreur les étapes restées en cours après une erreur hors étape"""
+        for ordre, etape in self.etapes.items():
+            if etape.statut == 'processing':
+                self._mark(ordre, 'error', details=details, date_fin=timezone.now())
+        await self.aflush()
+
+    async def aflush(self):
+        etapes = self._pending_writes()
+        if etapes:
+            await EtapeTraitement.objects.abulk_update(etapes, TRACKED_FIELDS)
+
+    @contextmanager
+    def stage(self, ordre):
+        """Chronomètre une étape réelle du pipeline"""
+        self.start(ordre)
+        try:
+            yield
+        except Exception as e:
+            self.fail(ordre, str(e))
+            raise
+        self.finish(ordre)
+
+    @asynccontextmanager
+    async def astage(self, ordre):
+        await self.astart(ordre)
+        try:
+            yield
+        except Exception as e:
+            await self.afail(ordre, str(e))
+            raise
+        self.finish(ordre)
+
+
+def _percentile(sorted_values, percent):
+    """Percentile par rang le plus proche d'une liste triée"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def stage_durations(days=7, limit=10000):
+    """
+    Durées p50/p95 (en secondes) de chaque étape terminée sur les `days` derniers jours.
+
+    Retourne {nom: {'count': n, 'p50': s, 'p95': s}}, calculé sur au plus
+    `limit` étapes parmi les plus récentes.
+    """
+    since = timezone.now() - timedelta(days=days)
+    rows = (
+        EtapeTraitement.objects
+        .filter(statut='completed', date_debut__isnull=False, date_fin__gte=since)
+        .order_by('-date_fin')
+        .values_list('nom', 'date_debut', 'date_fin')[:limit]
+    )
+    durations = {}
+    for nom, date_debut, date_fin in rows:
+        durations.setdefault(nom, []).append((date_fin - date_debut).total_seconds())
+
+    stats = {}
+    for nom, values in durations.items():
+        values.sort()
+        stats[nom] = {
+            'count': len(values),
+            'p50': round(_percentile(values, 50), 3),
+            'p95': round(_percentile(values, 95), 3),
+        }
+    return stats
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
+from Agent.models import Document, UserDocumentStats
+
+
+def _format(documents_count, processing_count, completed_count, average_score):
+    success_rate = (completed_count / documents_count * 100) if documents_count > 0 else 0
+    return {
+        'documents_count': documents_count,
+        'processing_count': processing_count,
+        'success_rate': round(success_rate, 2),
+        'average_score': round(average_score or 0, 2),
+    }
+
+
+def compute_stats(documents):
+    """Statistiques d'un queryset de documents, en une seule requête d'agrégation conditionnelle"""
+    stats = documents.order_by().aggregate(
+        documents_count=Count('id'),
+        processing_count=Count('id', filter=Q(statut='processing')),
+        completed_count=Count('id', filter=Q(statut='completed')),
+        average_score=Avg('score'),
+    )
+    return _format(**stats)
+
+
+def denormalized_stats(user, type=None):
+    """Statistiques lues dans UserDocumentStats (une ou deux lignes par utilisateur)"""
+    rows = UserDocumentStats.objects.filter(user=user)
+    if type:
+        rows = rows.filter(type=type)
+    stats = rows.aggregate(
+        total=Sum('total'), processing=Sum('processing'),
+        completed=Sum('completed'), score_total=Sum('score_total'),
+    )
+    total = stats['total'] or 0
+    return _format(
+        total, stats['processing'] or 0, stats['completed'] or 0,
+        stats['score_total'] / total if total else 0,
+    )
+
+
+def rebuild_user_stats():
+    """Recalcule toute la table UserDocumentStats depuis Document"""
+    rows = (
+        Document.objects.order_by()
+        .values('user_id', 'type')
+        .annotate(
+            total=Count('id'),
+            processing=Count('id', filter=Q(statut='processing')),
+            completed=Count('id', filter=Q(statut='completed')),
+            score_total=Sum('score'),
+        )
+    )
+    with transaction.atomic():
+        UserDocumentStats.objects.all().delete()
+        created = UserDocumentStats.objects.bulk_create([UserDocumentStats(**row) for row in rows], batch_size=1000)
+    return len(created)
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from Agent.models import Document, UserDocumentStats
+from Agent.services import metrics
+
+# Champs de Document dont dépendent les statistiques du tableau de bord
+STATS_FIELDS = ('user_id', 'type', 'statut', 'score')
+
+
+def _snapshot(instance, previous=None):
+    """
+    Valeurs des champs suivis, sans déclencher le chargement d'un champ différé.
+
+    Un champ différé n'est pas écrit par save() : sa valeur reste celle de
+    `previous` quand elle est connue.
+    """
+    values = tuple(
+        instance.__dict__.get(field, previous[i] if previous else None)
+        for i, field in enumerate(STATS_FIELDS)
+    )
+    return None if any(value is None for value in values) else values
+
+
+def _counters(snapshot, sign):
+    user_id, type, statut, score = snapshot
+    return user_id, type, {
+        'total': sign,
+        'processing': sign if statut == 'processing' else 0,
+        'completed': sign if statut == 'completed' else 0,
+        'score_total': sign * score,
+    }
+
+
+@receiver(post_init, sender=Document)
+def remember_stats_fields(sender, instance, **kwargs):
+    instance._stats_snapshot = _snapshot(instance) if instance.pk else None
+
+
+@receiver(pre_save, sender=Document)
+@receiver(pre_delete, sender=Document)
+def load_missing_snapshot(sender, instance, **kwargs):
+    """Relit les anciennes valeurs d'un document chargé avec des champs différés"""
+    if not settings.DASHBOARD_STATS_DENORMALIZED or not instance.pk or instance._stats_snapshot is not None:
+        return
+    old = Document.objects.filter(pk=instance.pk).values_list(*STATS_FIELDS).first()
+    instance._stats_snapshot = tuple(old) if old else None
+
+
+@receiver(post_save, sender=Document)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    if not settings.DASHBOARD_STATS_DENORMALIZED:
+        return
+    old = instance._stats_snapshot
+    new = _snapshot(instance, previous=old)
+    if old == new:
+        return
+    deltas = {}
+    for snapshot, sign in ((old, -1), (new, 1)):
+        if snapshot is None:
+            continue
+        user_id, type, counters = _counters(snapshot, sign)
+        key = deltas.setdefault((user_id, type), {})
+        for field, value in counters.items():
+            key[field] = key.get(field, 0) + value
+    for (user_id, type), counters in deltas.items():
+        UserDocumentStats.apply_delta(user_id, type, **counters)
+    instance._stats_snapshot = new
+
+
+@receiver(post_delete, sender=Document)
+def update_stats_on_delete(sender, instance, **kwargs):
+    if not settings.DASHBOARD_STATS_DENORMALIZED:
+        return
+    snapshot = instance._stats_snapshot or _snapshot(instance)
+    if snapshot is not None:
+        user_id, type, counters = _counters(snapshot, -1)
+        # Pas de création : l'utilisateur peut être en cours de suppression (cascade)
+        UserDocumentStats.apply_delta(user_id, type, create=False, **counters)
+
+
+@receiver(post_init, sender=Document)
+def remember_statut(sender, instance, **kwargs):
+    instance._metrics_statut = instance.__dict__.get('statut') if instance.pk else None
+
+
+@receiver(post_save, sender=Document)
+def count_statut_change(sender, instance, created, **kwargs):
+    """Compte chaque passage d'un document à un nouveau statut (cvagent_document_status_total)"""
+    statut = instance.__dict__.get('statut')
+    if statut is None or statut == instance._metrics_statut:
+        return
+    metrics.DOCUMENT_STATUS.inc(type=instance.__dict__.get('type', ''), statut=statut)
+    instance._metrics_statut = statut
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from Agent.models import Document
+
+
+def create_user(email='candidate@example.com', **fields):
+    return get_user_model().objects.create_user(email=email, password='password', **fields)
+
+
+def create_document(user, **fields):
+    values = {
+        'type': 'CV',
+        'titre': 'CV for Data Engineer',
+        'poste': 'Data Engineer',
+        'entreprise': 'Acme',
+        'statut': 'pending',
+    }
+    values.update(fields)
+    return Document.objects.create(user=user, **values)
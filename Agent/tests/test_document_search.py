@@ -0,0 +1,73 @@
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from Agent.models import Document
+from Agent.services import document_search
+from Agent.services.document_search import search_documents
+from Agent.tests.factories import create_document, create_user
+
+
+class SearchDocumentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.engineer = create_document(
+            cls.user, titre='CV Ingénieur données', poste='Ingénieur données', entreprise='Acme',
+            contenu='Pipelines Spark et Airflow',
+        )
+        cls.letter = create_document(
+            cls.user, type='LM', titre='Lettre Designer', poste='Designer', entreprise='Globex',
+            contenu="Je candidate chez Acme pour concevoir l'interface",
+        )
+        cls.other = create_document(create_user(email='other@example.com'), titre='CV Ingénieur', poste='Ingénieur')
+
+    def search(self, text):
+        return list(search_documents(Document.objects.filter(user=self.user), text).order_by('-search_rank', '-id'))
+
+    def test_prefix_terms_must_all_match(self):
+        self.assertEqual(self.search('ingé'), [self.engineer])
+        self.assertEqual(self.search('ingénieur spark'), [self.engineer])
+        self.assertEqual(self.search('ingénieur globex'), [])
+
+    def test_title_and_company_rank_above_content(self):
+        self.assertEqual(self.search('acme'), [self.engineer, self.letter])
+
+    def test_query_without_words_finds_nothing(self):
+        for text in ('"', '-- *', ''):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(text), [])
+
+    def test_fallback_backend_matches_the_same_documents(self):
+        queryset = Document.objects.filter(user=self.user)
+        found = document_search._fallback_search(queryset, document_search._terms('Ingénieur ACME'))
+        self.assertEqual(list(found), [self.engineer])
+        self.assertEqual(found.get().search_rank, 0.0)
+
+    def test_index_follows_updates_and_deletes(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('no full-text index on this database')
+        self.engineer.poste = 'Architecte cloud'
+        self.engineer.titre = 'CV Architecte'
+        self.engineer.save()
+        self.assertEqual(self.search('architecte'), [self.engineer])
+        self.assertEqual(self.search('ingénieur'), [])
+
+        self.letter.delete()
+        self.assertEqual(self.search('globex'), [])
+
+
+class DashboardSearchTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.document = create_document(self.user, titre='CV Ingénieur données')
+        self.client.force_login(self.user)
+
+    def test_search_lists_matching_documents(self):
+        response = self.client.get(reverse('comptes:dashboard'), {'q': 'ingénieur'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['documents']), [self.document])
+
+    def test_query_without_words_lists_nothing(self):
+        response = self.client.get(reverse('comptes:dashboard'), {'q': '"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['documents']), [])
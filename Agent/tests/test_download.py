@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from Agent.services.pdf import pdf_etag, pdf_relative_path
+
+from .factories import create_document, create_user
+
+PDF = b'%PDF-1.4 fake document body\n%%EOF\n'
+
+
+@override_settings(PDF_SENDFILE_BACKEND='')
+class DownloadDocumentTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = create_user()
+        self.document = create_document(self.user, statut='completed', contenu='# Ann Example\n')
+        path = os.path.join(media_root, pdf_relative_path(self.document))
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(PDF)
+        self.url = reverse('Agent:download_document', args=[self.document.id])
+        self.etag = pdf_etag(self.document)
+        self.client.force_login(self.user)
+
+    def test_full_download_sends_etag(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), PDF)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="CV_Data_Engineer.pdf"')
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_byte_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-7')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), PDF[:8])
+        self.assertEqual(response['Content-Range'], f'bytes 0-7/{len(PDF)}')
+        self.assertEqual(response['Content-Length'], '8')
+        self.assertEqual(response['ETag'], self.etag)
+
+    def test_open_and_suffix_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(b''.join(response.streaming_content), PDF[10:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-6')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), PDF[-6:])
+        self.assertEqual(response['Content-Range'], f'bytes {len(PDF) - 6}-{len(PDF) - 1}/{len(PDF)}')
+
+    def test_range_past_the_end_is_not_satisfiable(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(PDF)}-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(PDF)}')
+
+    def test_range_of_another_version_sends_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-7', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), PDF)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-7', HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_other_users_document_is_not_found(self):
+        self.client.force_login(create_user(email='other@example.com'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_document_not_ready(self):
+        self.document.statut = 'processing'
+        self.document.save(update_fields=['statut'])
+        self.assertEqual(self.client.get(self.url).json(), {'error': 'Document not ready'})
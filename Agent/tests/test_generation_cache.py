@@ -0,0 +1,85 @@
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from Agent.models import CacheCounter, GenerationCacheEntry
+from Agent.services import generation_cache
+
+USER_DATA = {
+    'name': 'Ann Example', 'email': 'ann@example.com', 'telephone': '0612345678',
+    'linkedin_url': '', 'github_url': '', 'skills': ['Python', 'SQL'],
+    'experiences': [{'title': 'Data Engineer'}], 'education': [],
+}
+
+
+def make_key(**changes):
+    values = {
+        'document_type': 'CV', 'target_role': 'Data Engineer', 'company': 'Acme', 'keywords': '',
+        'tone': 'professionnel', 'job_description': 'Build pipelines', 'user_data': USER_DATA,
+        'context': 'context', 'langue': 'fr', 'template_utilise': 'default',
+    }
+    values.update(changes)
+    return generation_cache.make_key(**values)
+
+
+@override_settings(GENERATION_CACHE_ENABLED=True, GENERATION_CACHE_TTL=3600, GENERATION_CACHE_MAX_ENTRIES=3)
+class GenerationCacheTests(TestCase):
+    def counter(self):
+        counter = CacheCounter.objects.filter(nom=generation_cache.CACHE_NAME).first()
+        return (counter.hits, counter.misses) if counter else (0, 0)
+
+    def test_key_ignores_case_spacing_and_skill_order(self):
+        same = make_key(
+            target_role='  data   ENGINEER ', company='acme',
+            user_data={**USER_DATA, 'skills': ['sql', 'Python ']},
+        )
+        self.assertEqual(make_key(), same)
+        self.assertNotEqual(make_key(), make_key(company='Other'))
+        self.assertNotEqual(make_key(), make_key(user_data={**USER_DATA, 'telephone': '0700000000'}))
+
+    def test_miss_then_hit(self):
+        key = make_key()
+        self.assertIsNone(generation_cache.lookup(key))
+        self.assertEqual(self.counter(), (0, 1))
+
+        generation_cache.store(key, 'CV', '# CV')
+
+        self.assertEqual(generation_cache.lookup(key), '# CV')
+        self.assertEqual(self.counter(), (1, 1))
+        self.assertEqual(GenerationCacheEntry.objects.get(cle=key).hits, 1)
+
+    def test_expired_entry_is_a_miss_and_is_evicted(self):
+        key = make_key()
+        generation_cache.store(key, 'CV', '# CV')
+        GenerationCacheEntry.objects.filter(cle=key).update(date_creation=timezone.now() - timedelta(hours=2))
+
+        self.assertIsNone(generation_cache.lookup(key))
+        generation_cache.evict()
+        self.assertFalse(GenerationCacheEntry.objects.filter(cle=key).exists())
+
+    def test_least_recently_used_entries_are_evicted(self):
+        keys = [make_key(company=f'Company {i}') for i in range(4)]
+        now = timezone.now()
+        for i, key in enumerate(keys[:3]):
+            generation_cache.store(key, 'CV', f'# CV {i}')
+            GenerationCacheEntry.objects.filter(cle=key).update(dernier_acces=now - timedelta(minutes=10 - i))
+        # Un accès récent protège la plus ancienne entrée
+        generation_cache.lookup(keys[0])
+
+        generation_cache.store(keys[3], 'CV', '# CV 3')
+
+        remaining = set(GenerationCacheEntry.objects.values_list('cle', flat=True))
+        self.assertEqual(remaining, {keys[0], keys[2], keys[3]})
+
+    def test_store_replaces_an_existing_entry(self):
+        key = make_key()
+        generation_cache.store(key, 'CV', 'first')
+        generation_cache.store(key, 'CV', 'second')
+        self.assertEqual(GenerationCacheEntry.objects.filter(cle=key).count(), 1)
+        self.assertEqual(generation_cache.lookup(key), 'second')
+
+    @override_settings(GENERATION_CACHE_ENABLED=False)
+    def test_disabled_cache_stores_and_returns_nothing(self):
+        key = make_key()
+        generation_cache.store(key, 'CV', '# CV')
+        self.assertIsNone(generation_cache.lookup(key))
+        self.assertFalse(GenerationCacheEntry.objects.exists())
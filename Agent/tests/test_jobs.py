@@ -0,0 +1,168 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from Agent.models import GenerationJob
+from Agent.services import jobs
+from Agent.services.stages import STAGE_SEARCH, StageTracker
+from Agent.tests.factories import create_document, create_user
+
+
+@override_settings(GENERATION_JOB_MAX_ATTEMPTS=3, GENERATION_JOB_LOCK_TIMEOUT=600)
+class JobQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def setUp(self):
+        self.document = create_document(self.user)
+
+    def enqueue(self, **fields):
+        job = jobs.enqueue_generation(self.document, {'document_type': 'CV'})
+        if fields:
+            GenerationJob.objects.filter(id=job.id).update(**fields)
+            job.refresh_from_db()
+        return job
+
+    def test_claim_takes_the_oldest_pending_job(self):
+        first = self.enqueue()
+        second = self.enqueue()
+
+        claimed = jobs.claim_next_job('worker-1')
+
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual(claimed.statut, 'processing')
+        self.assertEqual(claimed.worker, 'worker-1')
+        self.assertIsNotNone(claimed.date_verrouillage)
+        self.assertEqual(jobs.claim_next_job('worker-2').id, second.id)
+        self.assertIsNone(jobs.claim_next_job('worker-3'))
+
+    def test_claim_skips_jobs_scheduled_later(self):
+        self.enqueue(executer_apres=timezone.now() + timedelta(minutes=5))
+        self.assertIsNone(jobs.claim_next_job('worker-1'))
+
+        GenerationJob.objects.update(executer_apres=timezone.now() - timedelta(seconds=1))
+        self.assertIsNotNone(jobs.claim_next_job('worker-1'))
+
+    def test_claim_ignores_jobs_taken_by_another_worker(self):
+        self.enqueue(statut='processing', worker='worker-0')
+        self.assertIsNone(jobs.claim_next_job('worker-1'))
+
+    def test_failed_job_is_retried_with_backoff(self):
+        self.enqueue()
+        job = jobs.claim_next_job('worker-1')
+        before = timezone.now()
+
+        with mock.patch.object(jobs, 'run_generation', side_effect=RuntimeError('provider down')):
+            job = jobs.process_job(job)
+
+        job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual(job.statut, 'pending')
+        self.assertEqual(job.tentatives, 1)
+        self.assertEqual(job.erreur, 'provider down')
+        self.assertGreaterEqual(job.executer_apres, before + timedelta(seconds=30))
+        self.assertEqual(self.document.statut, 'pending')
+        # Le délai augmente avec le nombre d'essais
+        GenerationJob.objects.filter(id=job.id).update(executer_apres=None)
+        job = jobs.claim_next_job('worker-1')
+        with mock.patch.object(jobs, 'run_generation', side_effect=RuntimeError('provider down')):
+            jobs.process_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.tentatives, 2)
+        self.assertGreaterEqual(job.executer_apres, before + timedelta(seconds=60))
+
+    def test_job_fails_after_max_attempts(self):
+        self.enqueue(tentatives=2)
+        job = jobs.claim_next_job('worker-1')
+
+        with mock.patch.object(jobs, 'run_generation', side_effect=RuntimeError('provider down')):
+            jobs.process_job(job)
+
+        job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual(job.statut, 'error')
+        self.assertEqual(job.tentatives, 3)
+        self.assertEqual(self.document.statut, 'error')
+        self.assertIsNone(jobs.claim_next_job('worker-1'))
+
+    def test_successful_job_is_completed(self):
+        self.enqueue(erreur='previous failure')
+        job = jobs.claim_next_job('worker-1')
+
+        with mock.patch.object(jobs, 'run_generation') as run_generation:
+            jobs.process_job(job)
+
+        run_generation.assert_called_once()
+        job.refresh_from_db()
+        self.assertEqual(job.statut, 'completed')
+        self.assertEqual(job.erreur, '')
+
+    def test_stale_job_is_requeued_with_its_document_and_stages(self):
+        tracker = StageTracker.create(self.document)
+        tracker.start(STAGE_SEARCH)
+        self.document.statut = 'processing'
+        self.document.save()
+        stale = self.enqueue(
+            statut='processing', worker='dead-worker', date_verrouillage=timezone.now() - timedelta(hours=1),
+        )
+        recent = self.enqueue(statut='processing', worker='live-worker', date_verrouillage=timezone.now())
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+
+        stale.refresh_from_db()
+        recent.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual((stale.statut, stale.worker, stale.date_verrouillage), ('pending', '', None))
+        self.assertEqual(recent.statut, 'processing')
+        self.assertEqual(self.document.statut, 'pending')
+        etape = self.document.etape_traitement_set.get(ordre=STAGE_SEARCH)
+        self.assertEqual(etape.statut, 'pending')
+        self.assertIsNone(etape.date_debut)
+
+    def test_worker_loop_sweeps_stale_jobs(self):
+        stop = mock.Mock()
+        stop.is_set.side_effect = [False, False, False, True]
+        # démarrage à 0 (balayage prévu à 60), puis un passage à 10, 70 (balayage) et 80
+        clock = [0, 10, 70, 70, 80]
+        with mock.patch.object(jobs, 'requeue_stale_jobs') as sweep, \
+                mock.patch.object(jobs, 'claim_next_job', return_value=None), \
+                mock.patch.object(jobs.connection, 'close'), \
+                mock.patch.object(jobs, 'time', **{'monotonic.side_effect': clock}):
+            jobs.worker_loop('worker-1', stop, poll_interval=0, once=False, sweep_interval=60)
+        sweep.assert_called_once()
+
+    def test_refresh_lock_keeps_a_slow_job_from_being_requeued(self):
+        self.enqueue()
+        job = jobs.claim_next_job('worker-1')
+        GenerationJob.objects.filter(id=job.id).update(date_verrouillage=timezone.now() - timedelta(hours=1))
+
+        self.assertTrue(jobs.refresh_lock(job))
+        self.assertEqual(jobs.requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.statut, job.worker), ('processing', 'worker-1'))
+
+    def test_refresh_lock_fails_once_the_job_was_taken_back(self):
+        self.enqueue()
+        job = jobs.claim_next_job('worker-1')
+        GenerationJob.objects.filter(id=job.id).update(statut='pending', worker='', date_verrouillage=None)
+        self.assertFalse(jobs.refresh_lock(job))
+
+    def test_heartbeat_refreshes_the_lock_while_the_job_runs(self):
+        self.enqueue()
+        job = jobs.claim_next_job('worker-1')
+        beats = threading.Event()
+
+        def refresh(beating_job):
+            self.assertEqual(beating_job.id, job.id)
+            beats.set()
+            return True
+
+        with mock.patch.object(jobs, 'refresh_lock', side_effect=refresh) as refresh_lock:
+            with jobs.heartbeat(job, interval=0.01):
+                self.assertTrue(beats.wait(5))
+            calls = refresh_lock.call_count
+            time.sleep(0.05)
+        self.assertEqual(refresh_lock.call_count, calls)
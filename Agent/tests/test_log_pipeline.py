@@ -0,0 +1,66 @@
+import json
+import logging
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from Agent.services import log_pipeline
+from Agent.services.pipeline import build_user_data
+
+
+def make_record(msg, level=logging.DEBUG, name='Agent.services.pipeline', **extra):
+    return logging.getLogger(name).makeRecord(name, level, __file__, 1, msg, (), None, extra=extra)
+
+
+class RedactionTests(SimpleTestCase):
+    def format(self, record):
+        self.assertTrue(log_pipeline.RedactionFilter(settings.LOG_REDACT_FIELDS).filter(record))
+        return log_pipeline.JsonFormatter().format(record)
+
+    def test_prompt_user_data_leaves_no_personal_data(self):
+        user = mock.Mock(is_authenticated=True, full_name='Jane Doe', email='jane@example.com')
+        payload = {
+            'telephone': '+33 6 12 34 56 78', 'linkedin_url': 'https://linkedin.com/in/jane',
+            'github_url': 'https://github.com/jane', 'skills': ['Python'],
+            'experiences': [{'title': 'Data Engineer'}], 'education': [{'degree': 'MSc'}],
+        }
+        line = self.format(make_record('User data for prompt of document 1', user_data=build_user_data(user, payload)))
+
+        for value in ('Jane', 'jane', '12 34', 'Data Engineer', 'MSc'):
+            self.assertNotIn(value, line)
+        self.assertEqual(json.loads(line)['user_data']['skills'], ['Python'])
+
+    def test_headers_form_fields_and_message_emails_are_masked(self):
+        record = make_record(
+            'Signup from jane@example.com',
+            headers={'Cookie': 'sessionid=abc', 'User-Agent': 'test'},
+            post={'full_name': 'Jane Doe', 'phone_number': '0612345678', 'password': 'secret', 'tone': 'formel'},
+        )
+        entry = json.loads(self.format(record))
+
+        self.assertEqual(entry['message'], f'Signup from {log_pipeline.REDACTED}')
+        self.assertEqual(entry['headers'], {'Cookie': log_pipeline.REDACTED, 'User-Agent': 'test'})
+        self.assertEqual(set(entry['post'].values()), {log_pipeline.REDACTED, 'formel'})
+
+
+class SamplingTests(SimpleTestCase):
+    def test_most_specific_parent_rate_applies_to_debug_only(self):
+        sampling = log_pipeline.SamplingFilter({'Agent': 1, 'Agent.views': 0})
+        self.assertFalse(sampling.filter(make_record('hot path', name='Agent.views.stream')))
+        self.assertTrue(sampling.filter(make_record('kept', name='Agent.services.jobs')))
+        self.assertTrue(sampling.filter(make_record('warning', level=logging.WARNING, name='Agent.views')))
+
+
+class BackgroundHandlerTests(SimpleTestCase):
+    def test_full_queue_drops_and_reports(self):
+        handler = log_pipeline.BackgroundHandler(maxsize=1)
+        self.addCleanup(handler.close)
+        with mock.patch.object(handler, '_ensure_listener'):
+            for i in range(3):
+                handler.handle(make_record(f'record {i}', level=logging.INFO))
+            self.assertEqual(handler.stats(), {'queued': 1, 'maxsize': 1, 'dropped': 2})
+
+            handler.queue.get_nowait()
+            handler.handle(make_record('record 3', level=logging.INFO))
+        self.assertEqual(handler.queue.get_nowait().getMessage(), 'record 3')
+        self.assertEqual(handler.stats()['dropped'], 2)
@@ -0,0 +1,57 @@
+import base64
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from Agent.models import Document
+from Agent.services.pagination import InvalidCursor, KeysetPaginator
+from Agent.tests.factories import create_document, create_user
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        now = timezone.now()
+        documents = [create_document(cls.user, titre=f'Document {i}') for i in range(7)]
+        # Deux documents à la même date : l'id départage
+        dates = [now - timedelta(minutes=i) for i in (0, 1, 2, 2, 3, 4, 5)]
+        for document, date in zip(documents, dates):
+            Document.objects.filter(id=document.id).update(date_creation=date)
+        cls.expected = list(Document.objects.order_by('-date_creation', '-id').values_list('id', flat=True))
+
+    def paginator(self):
+        return KeysetPaginator(Document.objects.filter(user=self.user), per_page=3)
+
+    def test_pages_forward_then_backward(self):
+        paginator = self.paginator()
+        first = paginator.page()
+        second = paginator.page(after=first.next_cursor)
+        third = paginator.page(after=second.next_cursor)
+
+        self.assertEqual([d.id for d in first], self.expected[:3])
+        self.assertEqual([d.id for d in second], self.expected[3:6])
+        self.assertEqual([d.id for d in third], self.expected[6:])
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+
+        back = paginator.page(before=third.previous_cursor)
+        self.assertEqual([d.id for d in back], self.expected[3:6])
+        self.assertTrue(back.has_previous())
+        self.assertEqual([d.id for d in paginator.page(before=back.previous_cursor)], self.expected[:3])
+
+    def test_cursor_round_trip(self):
+        paginator = self.paginator()
+        document = Document.objects.get(id=self.expected[2])
+
+        date_creation, pk = paginator.decode_cursor(paginator.encode_cursor(document))
+
+        self.assertEqual(date_creation, document.date_creation)
+        self.assertEqual(pk, document.id)
+
+    def test_invalid_cursors_are_rejected(self):
+        paginator = self.paginator()
+        wrong_length = base64.urlsafe_b64encode(b'[1]').decode('ascii')
+        bad_date = base64.urlsafe_b64encode(b'["not a date", 1]').decode('ascii')
+        for cursor in ('%%%', 'bm90IGpzb24', wrong_length, bad_date):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginator.page(after=cursor)
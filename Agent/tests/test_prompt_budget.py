@@ -0,0 +1,81 @@
+import json
+from django.test import SimpleTestCase, override_settings
+from Agent.services import prompt_budget
+
+EXPERIENCES = [
+    {'title': 'Data Engineer', 'company': 'Acme', 'description': 'Built   Spark pipelines', 'end': ''},
+    {'title': 'Developer', 'company': 'Globex', 'description': 'Maintained the billing API ' * 20, 'tags': []},
+    {'title': 'Intern', 'company': 'Initech', 'description': 'Wrote reports ' * 20},
+]
+
+
+def compact(document_type='CV', job_description='Build data pipelines.', experiences=EXPERIENCES, education=None, context=''):
+    return prompt_budget.compact_sections(document_type, job_description, experiences, education, context)
+
+
+class CleaningTests(SimpleTestCase):
+    def test_clean_text_drops_repeated_lines(self):
+        text = "We hire   engineers.\n\n\nWe hire engineers!\nRemote  work\n"
+        self.assertEqual(prompt_budget.clean_text(text), "We hire engineers.\n\nRemote work")
+
+    def test_clean_context_drops_boilerplate_and_offer_sentences(self):
+        context = "\n".join([
+            "Accept cookies to continue browsing this website",
+            "https://example.com/jobs/123",
+            "Acme builds streaming platforms for retailers. Build data pipelines.",
+            "Acme builds streaming platforms for retailers.",
+        ])
+        cleaned = prompt_budget.clean_context(context, reference='Build data pipelines.')
+        self.assertEqual(cleaned, "Acme builds streaming platforms for retailers.")
+
+    def test_empty_values_are_pruned(self):
+        sections, _ = compact(experiences=EXPERIENCES[:1])
+        self.assertEqual(
+            json.loads(sections['experiences']),
+            [{'title': 'Data Engineer', 'company': 'Acme', 'description': 'Built Spark pipelines'}],
+        )
+        self.assertEqual(sections['education'], '[]')
+
+
+@override_settings(PROMPT_TOKEN_BUDGETS={'CV': 200, 'LM': 200})
+class BudgetTests(SimpleTestCase):
+    def test_small_prompt_is_kept_whole(self):
+        with override_settings(PROMPT_TOKEN_BUDGETS={'CV': 3000}):
+            sections, before = compact()
+        self.assertEqual(len(json.loads(sections['experiences'])), 3)
+        self.assertGreater(before, prompt_budget.count_tokens(sections['experiences']))
+
+    def test_context_is_trimmed_before_experiences(self):
+        context = 'Acme ships retail analytics to large stores. ' * 40
+        sections, _ = compact(experiences=EXPERIENCES[:1], context=context)
+        self.assertLess(prompt_budget.count_tokens(sections['context']), prompt_budget.count_tokens(context))
+        self.assertEqual(len(json.loads(sections['experiences'])), 1)
+
+    def test_last_experiences_are_dropped_but_one_is_kept(self):
+        with override_settings(PROMPT_TOKEN_BUDGETS={'CV': 20}):
+            sections, _ = compact()
+        self.assertEqual([item['title'] for item in json.loads(sections['experiences'])], ['Data Engineer'])
+
+    def test_job_description_keeps_its_minimum(self):
+        job_description = 'Design and run the data platform for our retail customers. ' * 60
+        with override_settings(PROMPT_TOKEN_BUDGETS={'CV': 10}):
+            sections, _ = compact(job_description=job_description)
+        tokens = prompt_budget.count_tokens(sections['job_description'])
+        self.assertLessEqual(tokens, prompt_budget.MIN_TEXT_TOKENS['job_description'])
+        self.assertGreater(tokens, 100)
+
+    def test_experiences_and_education_accept_any_json(self):
+        for value, expected in (
+            ({'title': 'Dev'}, '[{"title":"Dev"}]'),
+            ('Developer at Acme since 2020', 'Developer at Acme since 2020'),
+            (3, '3'),
+            (None, '[]'),
+        ):
+            with self.subTest(value=value):
+                sections, _ = compact(experiences=value, education=value)
+                self.assertEqual((sections['experiences'], sections['education']), (expected, expected))
+
+    def test_long_text_experience_is_trimmed(self):
+        with override_settings(PROMPT_TOKEN_BUDGETS={'CV': 20}):
+            sections, _ = compact(experiences='Maintained the billing API. ' * 50, job_description='')
+        self.assertLessEqual(prompt_budget.count_tokens(sections['experiences']), 20)
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from Agent.services import rate_limit
+
+LIMITS = {'search': {'rate': 0.01, 'burst': 1, 'concurrency': 2}}
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class LocalBucketTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(rate_limit, 'time', **{'monotonic.side_effect': self.clock})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refills_at_its_rate_up_to_the_burst(self):
+        bucket = rate_limit.LocalBucket('search', rate=2, burst=3)
+        for _ in range(3):
+            self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), 0.5)
+
+        self.clock.now += 0.5
+        self.assertEqual(bucket.take(), 0)
+        self.clock.now += 60
+        self.assertEqual(bucket.level(), 3)
+
+    def test_drain_empties_the_bucket(self):
+        bucket = rate_limit.LocalBucket('search', rate=10, burst=5)
+        bucket.drain()
+        self.assertEqual(bucket.take(), 0.1)
+
+
+class DatabaseBucketTests(TestCase):
+    def test_tokens_are_shared_through_the_table(self):
+        with mock.patch.object(rate_limit.time, 'time', return_value=1000.0):
+            self.assertEqual(rate_limit.DatabaseBucket('search', rate=1, burst=2).take(), 0)
+            other_process = rate_limit.DatabaseBucket('search', rate=1, burst=2)
+            self.assertEqual(other_process.take(), 0)
+            self.assertEqual(other_process.take(), 1)
+        with mock.patch.object(rate_limit.time, 'time', return_value=1001.0):
+            self.assertEqual(other_process.level(), 1)
+            self.assertEqual(other_process.take(), 0)
+
+
+@override_settings(RATE_LIMIT_BACKEND='local', RATE_LIMITS=LIMITS, RATE_LIMIT_MAX_WAIT=30)
+class AcquireTests(TestCase):
+    def setUp(self):
+        rate_limit._limiters.clear()
+        self.addCleanup(rate_limit._limiters.clear)
+
+    def test_waits_at_most_max_wait(self):
+        with rate_limit.acquire('search', max_wait=0.1):
+            pass
+        with self.assertRaises(rate_limit.RateLimitExceeded):
+            with rate_limit.acquire('search', max_wait=0.1):
+                pass
+
+        status = rate_limit.get_limiter('search').status()
+        self.assertEqual((status['acquired'], status['rejected']), (1, 1))
+
+    def test_gives_up_at_once_when_no_token_can_come_in_time(self):
+        rate_limit.get_limiter('search').bucket.drain()
+        with mock.patch.object(rate_limit.time, 'sleep') as sleep:
+            with self.assertRaises(rate_limit.RateLimitExceeded):
+                with rate_limit.acquire('search', max_wait=5):
+                    pass
+        sleep.assert_not_called()
+
+    @override_settings(RATE_LIMITS={'search': {'rate': 20, 'burst': 1, 'concurrency': 1}})
+    def test_waits_for_the_next_token(self):
+        rate_limit.get_limiter('search').bucket.drain()
+        with rate_limit.acquire('search', max_wait=2):
+            pass
+
+        status = rate_limit.get_limiter('search').status()
+        self.assertEqual((status['acquired'], status['rejected']), (1, 0))
+        self.assertGreater(status['wait_max_ms'], 0)
+
+    def test_unlimited_provider_is_not_throttled(self):
+        with rate_limit.acquire('unknown', max_wait=0):
+            pass
+        self.assertTrue(rate_limit.take_token('unknown'))
+
+    def test_take_token_does_not_wait(self):
+        self.assertTrue(rate_limit.take_token('search'))
+        self.assertFalse(rate_limit.take_token('search'))
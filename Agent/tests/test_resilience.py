@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+import httpx
+from django.test import TestCase, override_settings
+from Agent.services import async_pipeline, llm_provider, rate_limit, resilience
+
+PROVIDER = 'search-test'
+
+
+class Boom(Exception):
+    pass
+
+
+def failing():
+    raise Boom('provider error')
+
+
+@override_settings(
+    RATE_LIMITS={}, SEARCH_DEADLINE=0.2, SEARCH_BREAKER_FAILURES=2, SEARCH_BREAKER_RESET=30,
+    SEARCH_HEDGE_ENABLED=False, SEARCH_HEDGE_MIN_DELAY=0.01,
+)
+class CallTests(TestCase):
+    def setUp(self):
+        resilience._guards.clear()
+        rate_limit._limiters.clear()
+        self.addCleanup(resilience._guards.clear)
+        self.addCleanup(rate_limit._limiters.clear)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def hanging(self):
+        self.release.wait(5)
+        return 'late'
+
+    def test_success_records_its_latency(self):
+        self.assertEqual(resilience.call(PROVIDER, lambda: 'ok'), 'ok')
+
+        guard = resilience.get_guard(PROVIDER)
+        self.assertEqual(len(guard.latencies), 1)
+        self.assertEqual(guard.breaker.state, guard.breaker.CLOSED)
+
+    def test_timeout_is_not_counted_as_a_latency(self):
+        started = time.monotonic()
+        with self.assertRaises(resilience.SearchTimeout):
+            resilience.call(PROVIDER, self.hanging, deadline=0.05)
+
+        self.assertLess(time.monotonic() - started, 1)
+        guard = resilience.get_guard(PROVIDER)
+        self.assertEqual((guard.timeouts, guard.failures), (1, 1))
+        self.assertEqual(len(guard.latencies), 0)
+
+    def test_errors_open_the_circuit(self):
+        for _ in range(2):
+            with self.assertRaises(Boom):
+                resilience.call(PROVIDER, failing)
+
+        fn = mock.Mock()
+        with self.assertRaises(resilience.CircuitOpen):
+            resilience.call(PROVIDER, fn)
+        fn.assert_not_called()
+        self.assertEqual(resilience.get_guard(PROVIDER).short_circuited, 1)
+
+    def open_circuit(self):
+        breaker = resilience.get_guard(PROVIDER).breaker
+        for _ in range(2):
+            breaker.failure()
+        breaker.opened_at = time.monotonic() - breaker.reset_timeout
+        return breaker
+
+    def test_half_open_allows_a_single_probe(self):
+        breaker = self.open_circuit()
+
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, breaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        breaker.release()
+        self.assertTrue(breaker.allow())
+
+    def test_successful_probe_closes_the_circuit(self):
+        breaker = self.open_circuit()
+        self.assertEqual(resilience.call(PROVIDER, lambda: 'ok'), 'ok')
+        self.assertEqual((breaker.state, breaker.failures), (breaker.CLOSED, 0))
+
+    def test_failed_probe_reopens_the_circuit(self):
+        breaker = self.open_circuit()
+        with self.assertRaises(Boom):
+            resilience.call(PROVIDER, failing)
+
+        self.assertEqual(breaker.state, breaker.OPEN)
+        with self.assertRaises(resilience.CircuitOpen):
+            resilience.call(PROVIDER, lambda: 'ok')
+
+    @override_settings(RATE_LIMIT_BACKEND='local', RATE_LIMITS={PROVIDER: {'rate': 0.01, 'burst': 1, 'concurrency': 2}})
+    def test_hedge_needs_a_rate_limit_token(self):
+        guard = resilience.get_guard(PROVIDER)
+        guard.latencies.extend([0.01] * resilience.HEDGE_MIN_SAMPLES)
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'ok'
+
+        self.assertEqual(resilience.call(PROVIDER, slow, hedge=True), 'ok')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((guard.hedged, guard.hedge_skipped), (0, 1))
+
+    @override_settings(RATE_LIMIT_BACKEND='local', RATE_LIMITS={PROVIDER: {'rate': 0.01, 'burst': 2, 'concurrency': 2}})
+    def test_hedge_first_answer_wins(self):
+        guard = resilience.get_guard(PROVIDER)
+        guard.latencies.extend([0.01] * resilience.HEDGE_MIN_SAMPLES)
+        answers = iter([self.hanging, lambda: 'hedged'])
+
+        self.assertEqual(resilience.call(PROVIDER, lambda: next(answers)(), hedge=True), 'hedged')
+        self.assertEqual((guard.hedged, guard.hedge_wins), (1, 1))
+
+
+@override_settings(RATE_LIMITS={}, SEARCH_BREAKER_FAILURES=2, SEARCH_DEADLINE=1, TAVILY_API_BASE_URL='https://tavily.test')
+class TavilyErrorTests(TestCase):
+    def setUp(self):
+        resilience._guards.clear()
+        self.addCleanup(resilience._guards.clear)
+        patcher = mock.patch.object(async_pipeline, 'tavily_api_key', return_value='key')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, status, body):
+        async def run():
+            transport = httpx.MockTransport(lambda request: httpx.Response(status, json=body))
+            async with httpx.AsyncClient(transport=transport) as client:
+                with mock.patch.object(llm_provider, 'async_http_client', return_value=client):
+                    return await async_pipeline.afetch_search_context('Data Engineer', 'Acme')
+        return asyncio.run(run())
+
+    def test_error_responses_count_as_failures(self):
+        guard = resilience.get_guard('tavily')
+        for _ in range(2):
+            with self.assertRaises(httpx.HTTPStatusError):
+                self.fetch(503, {'detail': 'unavailable'})
+
+        self.assertEqual((guard.failures, guard.breaker.state), (2, guard.breaker.OPEN))
+        self.assertEqual(len(guard.latencies), 0)
+        with self.assertRaises(resilience.CircuitOpen):
+            self.fetch(200, {'results': []})
+
+    def test_results_are_joined(self):
+        context = self.fetch(200, {'results': [{'content': 'Spark'}, {'content': 'Airflow'}]})
+        self.assertEqual(context, 'Spark\nAirflow')
+        self.assertEqual(len(resilience.get_guard('tavily').latencies), 1)
+
+
+class PercentileTests(TestCase):
+    def test_nearest_rank(self):
+        guard = resilience.SearchGuard(PROVIDER)
+        guard.latencies.extend(range(1, 11))
+        self.assertEqual((guard.percentile(0.5), guard.percentile(0.95), guard.percentile(1)), (5, 10, 10))
+        self.assertIsNone(resilience.SearchGuard(PROVIDER).percentile(0.5))
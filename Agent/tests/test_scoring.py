@@ -0,0 +1,103 @@
+from django.test import TestCase, override_settings
+from Agent.models import Document, JobAnalysis, UserDocumentStats
+from Agent.services import job_analysis, scoring
+from Agent.tests.factories import create_document, create_user
+
+OFFER = """Data Engineer
+
+Vous concevrez des pipelines de données avec Python et PostgreSQL.
+
+- Déploiement sur Kubernetes
+- Orchestration avec Airflow"""
+
+MATCHING_CV = """# Ann Example
+
+## Expériences
+- Data Engineer : pipelines de données en Python, stockage PostgreSQL
+- Déploiement des traitements sur Kubernetes, orchestration Airflow"""
+
+UNRELATED_CV = """# Ann Example
+
+## Expériences
+- Pâtissière : viennoiseries, entremets et gestion des commandes"""
+
+
+class ScoringTests(TestCase):
+    def test_text_scores_rank_relevant_content_higher(self):
+        relevant = scoring.text_scores(MATCHING_CV, OFFER)
+        unrelated = scoring.text_scores(UNRELATED_CV, OFFER)
+
+        for value in relevant + unrelated:
+            self.assertGreaterEqual(value, 0.0)
+            self.assertLessEqual(value, 1.0)
+        self.assertGreater(relevant[0], unrelated[0])
+        self.assertGreater(relevant[1], unrelated[1])
+        self.assertEqual(scoring.text_scores('', OFFER), (0.0, 0.0))
+
+    def test_terms_fold_accents_and_drop_stopwords(self):
+        self.assertEqual(scoring.terms("Développeur C++ et Node.js, à Lyon"), ['developpeur', 'c++', 'node.js', 'lyon'])
+
+    def test_keyword_coverage_is_weighted(self):
+        coverage, matched, missing = scoring.keyword_coverage(
+            'Python et Docker', {'Python': 2.0, 'Docker': 1.0, 'Kubernetes': 1.0},
+        )
+        self.assertEqual(coverage, 0.75)
+        self.assertEqual(matched, ['Python', 'Docker'])
+        self.assertEqual(missing, ['Kubernetes'])
+        self.assertEqual(scoring.keyword_coverage('Python', {}), (None, [], []))
+
+    def test_offer_keywords_merge_analysis_offer_and_user_keywords(self):
+        keywords = scoring.offer_keywords(
+            OFFER, analysis={'required_skills': ['k8s'], 'preferred_skills': 'Docker'}, user_keywords='Spark; SQL',
+        )
+        self.assertEqual(keywords['Kubernetes'], scoring.KEYWORD_WEIGHTS['required_skills'])
+        self.assertEqual(keywords['Docker'], scoring.KEYWORD_WEIGHTS['preferred_skills'])
+        self.assertEqual(keywords['Python'], scoring.KEYWORD_WEIGHTS['offer_skills'])
+        self.assertEqual(keywords['Apache Spark'], scoring.KEYWORD_WEIGHTS['user_keywords'])
+
+    def test_score_content(self):
+        score, details = scoring.score_content(MATCHING_CV, OFFER)
+        unrelated, _ = scoring.score_content(UNRELATED_CV, OFFER)
+
+        self.assertGreater(score, unrelated)
+        self.assertLessEqual(score, 100)
+        self.assertEqual(details['version'], scoring.SCORER_VERSION)
+        self.assertEqual(details['missing_keywords'], [])
+        self.assertEqual(scoring.score_content('   ', OFFER)[0], 0)
+
+    def test_score_without_offer_uses_role_and_keywords(self):
+        score, details = scoring.score_content(MATCHING_CV, '', target_role='Data Engineer', user_keywords='Airflow')
+        self.assertGreater(score, 0)
+        self.assertEqual(details['matched_keywords'], ['Airflow'])
+
+
+@override_settings(DASHBOARD_STATS_DENORMALIZED=True)
+class RescoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def test_cached_analysis_never_calls_the_llm(self):
+        document = create_document(self.user, metadata={'job_description': OFFER})
+        self.assertIsNone(scoring.cached_analysis(document))
+
+        JobAnalysis.objects.create(
+            cle=job_analysis.make_key(OFFER), version_prompt=job_analysis.PROMPT_VERSION,
+            analyse={'required_skills': ['Airflow']},
+        )
+        self.assertEqual(scoring.cached_analysis(document), {'required_skills': ['Airflow']})
+
+    def test_rescore_updates_scores_and_stats(self):
+        completed = create_document(
+            self.user, statut='completed', contenu=MATCHING_CV, metadata={'job_description': OFFER},
+        )
+        pending = create_document(self.user, contenu=MATCHING_CV, metadata={'job_description': OFFER})
+
+        self.assertEqual(scoring.rescore_documents(Document.objects.all(), batch_size=1), 1)
+
+        completed.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertGreater(completed.score, 0)
+        self.assertEqual(completed.metadata['ats_score']['version'], scoring.SCORER_VERSION)
+        self.assertEqual(pending.score, 0)
+        self.assertEqual(UserDocumentStats.objects.get(user=self.user, type='CV').score_total, completed.score)
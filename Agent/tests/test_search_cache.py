@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from Agent.models import CacheCounter, SearchCacheEntry
+from Agent.services import search_cache
+
+
+@override_settings(SEARCH_CACHE_TTL=3600, SEARCH_CACHE_STALE_TTL=7200, SEARCH_CACHE_LOCK_TIMEOUT=5)
+class SearchCacheTests(TestCase):
+    def counter(self):
+        counter = CacheCounter.objects.filter(nom=search_cache.CACHE_NAME).first()
+        return (counter.hits, counter.misses) if counter else (0, 0)
+
+    def age_entry(self, seconds):
+        key = search_cache.make_key(*search_cache.normalize('Data Engineer', 'Acme'))
+        SearchCacheEntry.objects.filter(cle=key).update(date_recherche=timezone.now() - timedelta(seconds=seconds))
+
+    def test_miss_then_hit_on_normalized_key(self):
+        fetch = mock.Mock(return_value='context')
+
+        self.assertEqual(search_cache.get_context('Data Engineer', 'Acme', fetch), 'context')
+        self.assertEqual(search_cache.get_context('  data   ENGINEER ', 'acme', fetch), 'context')
+
+        fetch.assert_called_once_with('data engineer', 'acme')
+        self.assertEqual(self.counter(), (1, 1))
+        self.assertIsNone(SearchCacheEntry.objects.get().verrou_jusqu_a)
+
+    def test_stale_entry_is_served_and_refreshed_in_background(self):
+        search_cache.get_context('Data Engineer', 'Acme', lambda role, company: 'old')
+        self.age_entry(5000)
+        fetch = mock.Mock(return_value='new')
+
+        with mock.patch.object(search_cache, '_refresh_in_background') as refresh:
+            self.assertEqual(search_cache.get_context('Data Engineer', 'Acme', fetch), 'old')
+
+        refresh.assert_called_once()
+        fetch.assert_not_called()
+
+    def test_entry_past_the_stale_window_is_fetched_again(self):
+        search_cache.get_context('Data Engineer', 'Acme', lambda role, company: 'old')
+        self.age_entry(20000)
+
+        self.assertEqual(search_cache.get_context('Data Engineer', 'Acme', lambda role, company: 'new'), 'new')
+        self.assertEqual(SearchCacheEntry.objects.get().contexte, 'new')
+
+    def test_failed_fetch_releases_the_lease(self):
+        with self.assertRaises(RuntimeError):
+            search_cache.get_context('Data Engineer', 'Acme', mock.Mock(side_effect=RuntimeError('down')))
+        self.assertIsNone(SearchCacheEntry.objects.get().verrou_jusqu_a)
+
+        self.assertEqual(search_cache.get_context('Data Engineer', 'Acme', lambda role, company: 'context'), 'context')
+
+    def test_concurrent_callers_share_one_fetch(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch_shared(key, role, company, fetch):
+            calls.append(key)
+            started.set()
+            release.wait(5)
+            return 'context'
+
+        results = []
+        with mock.patch.object(search_cache, '_fetch_shared', side_effect=fetch_shared):
+            threads = [
+                threading.Thread(target=lambda: results.append(search_cache._single_flight('key', 'role', 'company', None)))
+                for _ in range(5)
+            ]
+            threads[0].start()
+            self.assertTrue(started.wait(5))
+            for thread in threads[1:]:
+                thread.start()
+            time.sleep(0.1)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['context'] * 5)
+        self.assertEqual(search_cache._inflight, {})
+
+    def test_followers_see_the_leader_error(self):
+        started, release = threading.Event(), threading.Event()
+
+        def fetch_shared(key, role, company, fetch):
+            started.set()
+            release.wait(5)
+            raise RuntimeError('down')
+
+        errors = []
+
+        def call():
+            try:
+                search_cache._single_flight('key', 'role', 'company', None)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        with mock.patch.object(search_cache, '_fetch_shared', side_effect=fetch_shared):
+            leader, follower = threading.Thread(target=call), threading.Thread(target=call)
+            leader.start()
+            self.assertTrue(started.wait(5))
+            follower.start()
+            time.sleep(0.1)
+            release.set()
+            leader.join(5)
+            follower.join(5)
+
+        self.assertEqual(errors, ['down', 'down'])
+
+    async def test_concurrent_coroutines_share_one_fetch(self):
+        calls = []
+
+        async def afetch(role, company):
+            calls.append((role, company))
+            await asyncio.sleep(0.01)
+            return 'context'
+
+        results = await asyncio.gather(*(
+            search_cache.aget_context('Data Engineer', 'Acme', afetch) for _ in range(5)
+        ))
+
+        self.assertEqual(results, ['context'] * 5)
+        self.assertEqual(calls, [('data engineer', 'acme')])
+        self.assertEqual(await search_cache.aget_context('Data Engineer', 'Acme', afetch), 'context')
+        self.assertEqual(len(calls), 1)
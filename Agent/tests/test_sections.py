@@ -0,0 +1,139 @@
+from django.test import SimpleTestCase
+from Agent.models import Document
+from Agent.services import sections
+
+CONTENT = """# Ann Example
+
+## Personal Information
+- **Email:** ann@example.com
+- **Telephone:** +33 6 12 34 56 78
+- **LinkedIn:** [profile](https://www.linkedin.com/in/ann)
+
+## Skills
+- Python
+- SQL
+
+## Professional Experience
+- Built data pipelines
+
+## Education
+- MSc Computer Science
+"""
+
+PAYLOAD = {
+    'document_type': 'CV', 'target_role': 'Data Engineer', 'company': 'Acme', 'keywords': '',
+    'tone': 'professionnel', 'job_description': 'Build pipelines', 'langue': 'fr', 'template_utilise': 'default',
+    'skills': ['Python', 'SQL'], 'experiences': [{'title': 'Data Engineer'}], 'education': [{'degree': 'MSc'}],
+}
+USER_DATA = {
+    'name': 'Ann Example', 'email': 'ann@example.com', 'telephone': '+33 6 12 34 56 78',
+    'linkedin_url': 'https://www.linkedin.com/in/ann', 'github_url': '',
+}
+
+
+class PlanUpdateTests(SimpleTestCase):
+    def setUp(self):
+        self.document = Document(type='CV', contenu=CONTENT, metadata={})
+        sections.remember(self.document, PAYLOAD, USER_DATA)
+
+    def plan(self, payload=None, **user_data):
+        return sections.plan_update(self.document, {**PAYLOAD, **(payload or {})}, {**USER_DATA, **user_data})
+
+    def test_split_sections_finds_known_headings(self):
+        parts = sections.split_sections(CONTENT, USER_DATA)
+        self.assertEqual([part.key for part in parts], ['header', 'personal', 'skills', 'experience', 'education'])
+        self.assertEqual(parts[0].inputs, ())
+        self.assertEqual(sections.join_sections(parts), CONTENT)
+
+    def test_unchanged_inputs_need_nothing(self):
+        plan = self.plan()
+        self.assertEqual(plan.mode, 'unchanged')
+        self.assertEqual(sections.join_sections(plan.sections), CONTENT)
+
+    def test_phone_is_patched_whatever_its_formatting(self):
+        plan = self.plan(telephone='07 00 00 00 01')
+
+        self.assertEqual(plan.patches, {'telephone': '07 00 00 00 01'})
+        self.assertEqual(plan.regenerate, [])
+        self.assertIn('- **Telephone:** 07 00 00 00 01\n', sections.join_sections(plan.sections))
+        self.assertNotIn('12 34 56 78', sections.join_sections(plan.sections))
+
+    def test_removed_url_drops_its_line(self):
+        plan = self.plan(linkedin_url='')
+
+        content = sections.join_sections(plan.sections)
+        self.assertNotIn('LinkedIn', content)
+        self.assertNotIn('linkedin.com', content)
+        self.assertIn('- **Telephone:**', content)
+
+    def test_added_url_is_appended_in_the_contact_style(self):
+        plan = self.plan(github_url='https://github.com/ann')
+
+        personal = next(part for part in plan.sections if part.key == 'personal')
+        self.assertIn('- **GitHub:** https://github.com/ann\n', personal.text)
+        self.assertTrue(personal.text.endswith('\n\n'))
+
+    def test_changed_url_keeps_the_markdown_link(self):
+        plan = self.plan(linkedin_url='linkedin.com/in/ann-example')
+        self.assertIn('[profile](linkedin.com/in/ann-example)', sections.join_sections(plan.sections))
+
+    def test_skills_change_regenerates_only_the_skills_section(self):
+        plan = self.plan({'skills': ['Python', 'SQL', 'Rust']})
+        self.assertEqual(plan.regenerate, ['skills'])
+        self.assertEqual(plan.patches, {})
+
+    def test_global_change_needs_a_full_generation(self):
+        for field, value in (('tone', 'formel'), ('company', 'Other'), ('job_description', 'Other offer')):
+            with self.subTest(field=field):
+                self.assertIsNone(self.plan({field: value}))
+
+    def test_change_affecting_every_section_needs_a_full_generation(self):
+        self.assertIsNone(self.plan({'keywords': 'cloud', 'education': [], 'skills': ['Go']}))
+
+    def test_missing_fingerprints_or_edited_content_need_a_full_generation(self):
+        edited = Document(type='CV', contenu=CONTENT + 'partial', metadata=dict(self.document.metadata))
+        self.assertIsNone(sections.plan_update(edited, PAYLOAD, USER_DATA))
+        self.assertIsNone(sections.plan_update(Document(type='CV', contenu=CONTENT, metadata={}), PAYLOAD, USER_DATA))
+
+    def test_letter_without_headings_only_gets_fact_patches(self):
+        letter = Document(type='LM', contenu="Madame, Monsieur,\n\nJe candidate...\n\nAnn\n06.12.34.56.78\n", metadata={})
+        payload = {**PAYLOAD, 'document_type': 'LM'}
+        user_data = {**USER_DATA, 'telephone': '06 12 34 56 78'}
+        sections.remember(letter, payload, user_data)
+
+        self.assertIsNone(sections.plan_update(letter, {**payload, 'skills': ['Go']}, user_data))
+        plan = sections.plan_update(letter, payload, {**user_data, 'telephone': '07 00 00 00 01'})
+        self.assertTrue(sections.join_sections(plan.sections).endswith('Ann\n07 00 00 00 01\n'))
+
+    def test_name_is_patched_as_a_whole_word_in_the_contact_sections(self):
+        content = (
+            "# Al\n\n## Personal Information\n- **Name:** Al\n- **Email:** al@example.com\n\n"
+            "## Skills\n- Algorithms, Alerting\n\n## Professional Experience\n- Alstom: data platform\n"
+        )
+        user_data = {**USER_DATA, 'name': 'Al', 'email': 'al@example.com'}
+        document = Document(type='CV', contenu=content, metadata={})
+        sections.remember(document, PAYLOAD, user_data)
+
+        plan = sections.plan_update(document, PAYLOAD, {**user_data, 'name': 'Bob'})
+        self.assertEqual(plan.patches, {'name': 'Bob'})
+        self.assertEqual(sections.join_sections(plan.sections), content.replace('# Al\n', '# Bob\n').replace('** Al\n', '** Bob\n'))
+
+    def test_name_quoted_outside_the_contact_sections_needs_a_full_generation(self):
+        content = "# Al\n\n## Summary\nAl builds data platforms.\n\n## Skills\n- Python\n"
+        user_data = {**USER_DATA, 'name': 'Al'}
+        document = Document(type='CV', contenu=content, metadata={})
+        sections.remember(document, PAYLOAD, user_data)
+        self.assertIsNone(sections.plan_update(document, PAYLOAD, {**user_data, 'name': 'Bob'}))
+
+    def test_email_and_url_patterns_match_whole_values(self):
+        email = sections._fact_pattern('email', 'al@example.co')
+        self.assertIsNone(email.search('val@example.co and al@example.com'))
+        self.assertTrue(email.search('Write to al@example.co.'))
+        url = sections._fact_pattern('linkedin_url', 'linkedin.com/in/ann')
+        self.assertIsNone(url.search('https://linkedin.com/in/anna or linkedin.com/in/ann/posts'))
+        self.assertTrue(url.search('[profile](https://www.linkedin.com/in/ann/)'))
+
+    def test_clean_section_keeps_the_original_heading(self):
+        skills = next(part for part in sections.split_sections(CONTENT) if part.key == 'skills')
+        cleaned = sections.clean_section(skills, "```markdown\n## Compétences\n- Python\n- Rust\n```")
+        self.assertEqual(cleaned, "## Skills\n- Python\n- Rust\n\n")
@@ -0,0 +1,53 @@
+from django.test import SimpleTestCase
+from Agent.services.skills import SkillMatcher
+
+TAXONOMY = [
+    {'name': 'React', 'category': 'frontend', 'synonyms': ['ReactJS']},
+    {'name': 'React Native', 'category': 'mobile'},
+    {'name': 'JavaScript', 'category': 'language', 'synonyms': ['JS']},
+    {'name': 'Node.js', 'category': 'backend', 'synonyms': ['Node']},
+    {'name': '.NET', 'category': 'backend'},
+    {'name': 'C++', 'category': 'language'},
+    {'name': 'CI/CD', 'category': 'devops'},
+    {'name': 'Front-end', 'category': 'frontend'},
+    {'name': 'Go', 'category': 'language', 'case_sensitive': True, 'synonyms': ['Golang']},
+    {'name': 'Spring Boot', 'category': 'backend', 'case_sensitive': True},
+]
+
+
+class SkillMatcherTests(SimpleTestCase):
+    matcher = SkillMatcher(TAXONOMY)
+
+    def test_longest_expression_wins(self):
+        self.assertEqual(self.matcher.extract('Mobile avec React Native et React.'), ['React Native', 'React'])
+
+    def test_expression_does_not_cross_punctuation(self):
+        self.assertEqual(self.matcher.extract('React, Native'), ['React'])
+
+    def test_synonyms_and_punctuation_around_words(self):
+        self.assertEqual(
+            self.matcher.extract('(ReactJS), node et JS ; C++, .NET. CI/CD'),
+            ['React', 'Node.js', 'JavaScript', 'C++', '.NET', 'CI/CD'],
+        )
+
+    def test_hyphenated_forms(self):
+        for text in ('front-end', 'front end', 'frontend'):
+            self.assertEqual(self.matcher.extract(f'Développeur {text}'), ['Front-end'])
+
+    def test_case_sensitive_names_need_their_exact_case(self):
+        self.assertEqual(self.matcher.extract('Go et Spring Boot'), ['Go', 'Spring Boot'])
+        self.assertEqual(self.matcher.extract('on y go au spring boot'), [])
+        self.assertEqual(self.matcher.extract('golang'), ['Go'])
+
+    def test_each_skill_is_listed_once_in_order(self):
+        self.assertEqual(self.matcher.extract('JS puis React puis JavaScript'), ['JavaScript', 'React'])
+        self.assertEqual(self.matcher.extract(''), [])
+
+    def test_canonical_and_match_skills(self):
+        self.assertEqual(self.matcher.canonical(' reactjs '), 'React')
+        self.assertEqual(self.matcher.canonical('Kotlin'), 'Kotlin')
+        self.assertEqual(self.matcher.match_skills(['JS', 'Go', 'Kotlin'], ['JavaScript', 'Go']), {
+            'match_percentage': 66.67,
+            'matched_skills': ['JS', 'Go'],
+            'missing_skills': ['Kotlin'],
+        })
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from Agent.models import EtapeTraitement
+from Agent.services import stages
+from Agent.services.stages import STAGE_LLM, STAGE_PROMPT, STAGE_SEARCH, StageTracker
+from Agent.tests.factories import create_document, create_user
+
+
+class StageTrackerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.document = create_document(create_user())
+
+    def etape(self, ordre):
+        return EtapeTraitement.objects.get(document=self.document, ordre=ordre)
+
+    def test_stages_record_their_real_timings(self):
+        tracker = StageTracker.create(self.document)
+        with tracker.stage(STAGE_SEARCH):
+            self.assertEqual(self.etape(STAGE_SEARCH).statut, 'processing')
+        with tracker.stage(STAGE_PROMPT):
+            pass
+        tracker.flush()
+
+        search = self.etape(STAGE_SEARCH)
+        self.assertEqual(search.statut, 'completed')
+        self.assertLessEqual(search.date_debut, search.date_fin)
+        self.assertLessEqual(search.date_fin, self.etape(STAGE_PROMPT).date_debut)
+        self.assertEqual(self.etape(STAGE_LLM).statut, 'pending')
+
+    def test_failed_stage_is_written_immediately(self):
+        tracker = StageTracker.create(self.document)
+        with self.assertRaises(ValueError):
+            with tracker.stage(STAGE_PROMPT):
+                raise ValueError('bad prompt')
+
+        prompt = self.etape(STAGE_PROMPT)
+        self.assertEqual((prompt.statut, prompt.details), ('error', 'bad prompt'))
+        self.assertIsNotNone(prompt.date_fin)
+
+    def test_abort_fails_the_running_stage_only(self):
+        tracker = StageTracker.create(self.document)
+        with tracker.stage(STAGE_SEARCH):
+            pass
+        tracker.start(STAGE_LLM)
+        tracker.abort('Stream interrupted')
+
+        self.assertEqual(self.etape(STAGE_SEARCH).statut, 'completed')
+        self.assertEqual((self.etape(STAGE_LLM).statut, self.etape(STAGE_LLM).details), ('error', 'Stream interrupted'))
+        self.assertEqual(self.etape(STAGE_PROMPT).statut, 'pending')
+
+    def test_load_reuses_existing_stages(self):
+        created = StageTracker.create(self.document)
+        loaded = StageTracker.load(self.document)
+        self.assertEqual(
+            {ordre: etape.id for ordre, etape in loaded.etapes.items()},
+            {ordre: etape.id for ordre, etape in created.etapes.items()},
+        )
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 21))
+        self.assertEqual(stages._percentile(values, 50), 10)
+        self.assertEqual(stages._percentile(values, 95), 19)
+        self.assertEqual(stages._percentile(values, 100), 20)
+        self.assertEqual(stages._percentile([7], 95), 7)
+        self.assertIsNone(stages._percentile([], 50))
+
+    def test_stage_durations(self):
+        tracker = StageTracker.create(self.document)
+        now = timezone.now()
+        for seconds, ordre in ((2, STAGE_SEARCH), (4, STAGE_PROMPT)):
+            tracker.record(ordre, now - timedelta(seconds=seconds), now)
+        tracker.flush()
+        EtapeTraitement.objects.filter(document=self.document, ordre=STAGE_LLM).update(
+            statut='completed', date_debut=now - timedelta(days=30, seconds=5), date_fin=now - timedelta(days=30),
+        )
+
+        durations = stages.stage_durations()
+        self.assertEqual(durations, {
+            'Job offer analysis': {'count': 1, 'p50': 2.0, 'p95': 2.0},
+            'Profile adaptation': {'count': 1, 'p50': 4.0, 'p95': 4.0},
+        })
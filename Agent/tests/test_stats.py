@@ -0,0 +1,75 @@
+from django.test import TestCase, override_settings
+from Agent.models import Document, UserDocumentStats
+from Agent.services import stats
+from Agent.tests.factories import create_document, create_user
+
+
+@override_settings(DASHBOARD_STATS_DENORMALIZED=True)
+class DocumentStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.other = create_user(email='other@example.com')
+
+    def assertStatsMatch(self, user=None, type=None):
+        user = user or self.user
+        documents = Document.objects.filter(user=user)
+        if type:
+            documents = documents.filter(type=type)
+        self.assertEqual(stats.denormalized_stats(user, type), stats.compute_stats(documents))
+
+    def test_compute_stats(self):
+        create_document(self.user, statut='completed', score=80)
+        create_document(self.user, statut='completed', score=60)
+        create_document(self.user, statut='processing')
+        create_document(self.user, statut='error')
+
+        self.assertEqual(stats.compute_stats(Document.objects.filter(user=self.user)), {
+            'documents_count': 4, 'processing_count': 1, 'success_rate': 50.0, 'average_score': 35.0,
+        })
+        self.assertEqual(stats.compute_stats(Document.objects.none()), {
+            'documents_count': 0, 'processing_count': 0, 'success_rate': 0, 'average_score': 0,
+        })
+
+    def test_signals_keep_counters_in_step_with_documents(self):
+        cv = create_document(self.user, statut='processing')
+        letter = create_document(self.user, type='LM', statut='completed', score=70)
+        create_document(self.other, statut='completed', score=90)
+        self.assertStatsMatch()
+
+        cv.statut = 'completed'
+        cv.score = 50
+        cv.save()
+        self.assertStatsMatch()
+        self.assertStatsMatch(type='CV')
+        self.assertStatsMatch(type='LM')
+
+        letter.delete()
+        self.assertStatsMatch()
+        self.assertStatsMatch(user=self.other)
+
+    def test_saving_a_deferred_document_reads_its_old_values(self):
+        document = create_document(self.user, statut='processing')
+
+        deferred = Document.objects.only('id', 'statut').get(pk=document.pk)
+        deferred.statut = 'completed'
+        deferred.save(update_fields=['statut'])
+        self.assertStatsMatch()
+
+        Document.objects.only('id').get(pk=document.pk).delete()
+        self.assertStatsMatch()
+
+    def test_rebuild_recomputes_rows_from_documents(self):
+        create_document(self.user, statut='completed', score=40)
+        create_document(self.user, type='LM', statut='processing')
+        Document.objects.filter(user=self.user).update(score=100)
+        UserDocumentStats.objects.filter(user=self.user, type='LM').delete()
+
+        self.assertEqual(stats.rebuild_user_stats(), 2)
+        self.assertStatsMatch()
+        self.assertStatsMatch(type='LM')
+
+    @override_settings(DASHBOARD_STATS_DENORMALIZED=False)
+    def test_counters_are_not_written_when_disabled(self):
+        create_document(self.user, statut='completed', score=40)
+        self.assertFalse(UserDocumentStats.objects.exists())
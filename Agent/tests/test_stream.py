@@ -0,0 +1,94 @@
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from Agent.models import Document, EtapeTraitement
+from Agent.services import pipeline
+
+from .factories import create_user
+
+FORM = {
+    'targetRole': 'Data Engineer',
+    'company': 'Acme',
+    'jobDescription': 'Build and run data pipelines with Python and SQL.',
+    'documentType': 'CV',
+    'skills': 'Python, SQL',
+    'experiences': '[{"title": "Data Engineer", "company": "Initech"}]',
+    'education': '[]',
+}
+
+
+def read_events(response):
+    """(event, data) des messages SSE d'une réponse streamée"""
+    events = []
+    for message in b''.join(response.streaming_content).decode().split('\n\n'):
+        if not message:
+            continue
+        event, data = 'message', None
+        for line in message.splitlines():
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                data = json.loads(line[len('data: '):])
+        events.append((event, data))
+    return events
+
+
+@override_settings(LLM_PROVIDER='stub', LLM_FALLBACK_PROVIDERS='', GENERATION_CACHE_ENABLED=False, LLM_STUB_LATENCY=0)
+class StreamGenerationTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_login(self.user)
+        for name, value in (('schedule_prerender', None), ('search_context', 'Acme sells analytics.')):
+            patcher = mock.patch.object(pipeline, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stream(self, **form):
+        response = self.client.post(reverse('Agent:generate_document_stream'), {**FORM, **form})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return read_events(response)
+
+    def assertFailed(self, document):
+        document.refresh_from_db()
+        self.assertEqual(document.statut, 'error')
+        self.assertFalse(EtapeTraitement.objects.filter(document=document, statut='processing').exists())
+
+    def test_streams_the_document_then_done(self):
+        events = self.stream()
+
+        names = [event for event, _ in events]
+        self.assertEqual((names[0], names[-1]), ('document', 'done'))
+        self.assertIn('message', names)
+        document = Document.objects.get(id=events[0][1]['document_id'])
+        self.assertEqual(document.statut, 'completed')
+        self.assertEqual(document.contenu, ''.join(data['text'] for event, data in events if event == 'message').strip())
+        self.assertFalse(EtapeTraitement.objects.filter(document=document).exclude(statut='completed').exists())
+
+    def test_prompt_error_fails_the_document(self):
+        with mock.patch.object(pipeline, '_get_prompt', side_effect=ValueError('bad template')):
+            events = self.stream()
+
+        self.assertEqual(events[-1], ('error', {'error': 'Failed to generate document: bad template'}))
+        self.assertFailed(Document.objects.get(id=events[0][1]['document_id']))
+
+    def test_unexpected_error_is_sent_as_an_event(self):
+        with mock.patch.object(pipeline, 'plan_incremental', side_effect=TypeError('unexpected')):
+            events = self.stream()
+
+        self.assertEqual(events[-1], ('error', {'error': 'An error occurred: unexpected'}))
+        self.assertFailed(Document.objects.get(id=events[0][1]['document_id']))
+
+    def test_failed_incremental_update_keeps_the_previous_content(self):
+        document_id = self.stream()[0][1]['document_id']
+        content = Document.objects.get(id=document_id).contenu
+
+        with mock.patch.object(pipeline, 'generate_content', side_effect=pipeline.GenerationError('provider down')):
+            events = self.stream(doc_id=document_id, skills='Python, SQL, Rust')
+
+        self.assertEqual(events[-1], ('error', {'error': 'Failed to generate document: provider down'}))
+        document = Document.objects.get(id=document_id)
+        self.assertFailed(document)
+        self.assertEqual(document.contenu, content)
@@ -8,7 +8,13 @@ app_name = 'Agent'
 urlpatterns = [
     path('document/<int:document_id>/', views.document_detail, name='document_detail'),
     path('agent/generate/', views.generate_document, name='generate_document'),
+    path('agent/generate/stream/', views.generate_document_stream, name='generate_document_stream'),
+    path('agent/generate/async/', views.agenerate_document, name='agenerate_document'),
+    path('agent/generate/batch/', views.agenerate_batch, name='agenerate_batch'),
     path('api/document/<int:document_id>/status/', views.update_document_status, name='update_status'),
+    path('api/document/<int:document_id>/progress/', views.document_progress, name='document_progress'),
+    path('api/rate-limits/', views.rate_limit_status, name='rate_limit_status'),
+    path('api/metrics/', views.metrics_export, name='metrics_export'),
     path('document/<int:document_id>/download/', views.download_document, name='download_document'),
     path('api/document/<int:document_id>/upload-image/', views.upload_cv_image, name='upload_cv_image'),
     path('api/document/<int:document_id>/delete/', views.delete_document, name='delete_document'),
@@ -1,216 +1,206 @@
 import logging
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from asgiref.sync import sync_to_async
 from django.core.files.base import ContentFile
+from django.core.handlers.asgi import ASGIRequest
+import asyncio
 import json
 import os
+import re
 import time
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from io import BytesIO
-import google.generativeai as genai
-from decouple import config, UndefinedValueError
-from tavily import TavilyClient
 from Agent.models import Document, EtapeTraitement, CVImage
+from Agent.services import metrics, rate_limit, resilience, sections
+from Agent.services.async_pipeline import arun_generation, atimed_search_context
+from Agent.services.batch import agenerate_batch_documents
+from Agent.services.jobs import enqueue_generation
+from Agent.services.pdf import delete_pdf_files, ensure_pdf_file, pdf_etag, pdf_relative_path
+from Agent.services.pipeline import GenerationError, plan_incremental, run_incremental, stream_generation
+from Agent.services.stages import StageTracker
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
-# Configure API clients safely
-try:
-    GEMINI_API_KEY = config('GEMINI_API_KEY')
-    TAVILY_API_KEY = config('TAVILY_API_KEY')
-    genai.configure(api_key=GEMINI_API_KEY)
-    tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
-except UndefinedValueError as e:
-    logger.error(f"Missing environment variable: {str(e)}")
-    raise Exception(f"Missing environment variable: {str(e)}")
 
+def _parse_generation_form(request):
+    """
+    Read and validate the generation form.
+
+    Returns (payload, error): payload holds the pipeline inputs, error is a
+    message for the form when validation fails.
+    """
+    # Extract form data, including new fields
+    target_role = request.POST.get('targetRole', '').strip()
+    company = request.POST.get('company', '').strip()
+    keywords = request.POST.get('keywords', '').strip()
+    tone = request.POST.get('tone', 'professionnel')
+    job_description = request.POST.get('jobDescription', '').strip()
+    document_type = request.POST.get('documentType', 'CV')
+    linkedin_url = request.POST.get('linkedin_url', '').strip()
+    github_url = request.POST.get('github_url', '').strip()
+    telephone = request.POST.get('telephone', '').strip()
+    langue = request.POST.get('langue', 'fr')
+    template_utilise = request.POST.get('template_utilise', 'default')
+    skills = [skill.strip() for skill in request.POST.get('skills', '').split(',') if skill.strip()]
+    try:
+        experiences = json.loads(request.POST.get('experiences', '[]'))
+        education = json.loads(request.POST.get('education', '[]'))
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON decode error for experiences/education: {str(e)}")
+        return None, 'Invalid format for experiences or education'
+
+    if not target_role or not job_description:
+        logger.warning("Missing required fields: targetRole or jobDescription")
+        return None, 'Target role and job description are required'
+
+    cv_image = request.FILES.get('cv_image') if document_type == 'CV' else None
+    if cv_image is not None:
+        logger.debug(f"CV image received: {cv_image.name}, size: {cv_image.size}")
+        if cv_image.size > 2 * 1024 * 1024:
+            logger.warning(f"Image size exceeds 2MB: {cv_image.size}")
+            return None, 'Image must not exceed 2MB'
+
+    payload = {
+        'document_type': document_type,
+        'target_role': target_role,
+        'company': company,
+        'keywords': keywords,
+        'tone': tone,
+        'job_description': job_description,
+        'linkedin_url': linkedin_url,
+        'github_url': github_url,
+        'telephone': telephone,
+        'langue': langue,
+        'template_utilise': template_utilise,
+        'skills': skills,
+        'experiences': experiences,
+        'education': education,
+    }
+    return payload, None
+
+def _document_fields(payload):
+    """Document columns and metadata derived from the form payload"""
+    document_type = payload['document_type']
+    job_description = payload['job_description']
+    return {
+        'type': document_type,
+        'titre': f"{document_type} for {payload['target_role']}",
+        'poste': payload['target_role'],
+        'entreprise': payload['company'],
+        'linkedin_url': payload['linkedin_url'],
+        'github_url': payload['github_url'],
+        'telephone': payload['telephone'],
+        'langue': payload['langue'],
+        'template_utilise': payload['template_utilise'],
+        'statut': 'pending',
+        'metadata': {
+            'keywords': payload['keywords'],
+            'tone': payload['tone'],
+            'job_description_preview': job_description[:100] + '...' if job_description else '',
+            'job_description': job_description,
+            'linkedin_url': payload['linkedin_url'],
+            'github_url': payload['github_url'],
+            'telephone': payload['telephone'],
+            'langue': payload['langue'],
+            'template_utilise': payload['template_utilise'],
+            'skills': json.dumps(payload['skills']),
+            'experiences': json.dumps(payload['experiences']),
+            'education': json.dumps(payload['education'])
+        },
+    }
+
+def _update_document(document, fields):
+    """
+    Apply the form fields to an existing document.
+
+    The section fingerprints of the previous generation are kept so that the
+    pipeline only regenerates what the edit actually changed.
+    """
+    previous = document.metadata.get(sections.METADATA_KEY)
+    for name, value in fields.items():
+        setattr(document, name, value)
+    if previous:
+        document.metadata[sections.METADATA_KEY] = previous
+
+def _prepare_document(request):
+    """
+    Validate the generation form and create or update the matching Document.
+
+    Returns (document, payload, error): payload holds the pipeline inputs,
+    error is a message for the form when validation fails.
+    """
+    payload, error = _parse_generation_form(request)
+    if error:
+        return None, None, error
+
+    # Create or update document record
+    user = request.user if request.user.is_authenticated else None
+    logger.info(f"Creating document for user: {user.email if user else 'Anonymous'}")
+    doc_id = request.POST.get('doc_id')
+    fields = _document_fields(payload)
+    if doc_id:
+        document = get_object_or_404(Document, id=doc_id, user=user)
+        _update_document(document, fields)
+        document.save()
+    else:
+        document = Document.objects.create(user=user, **fields)
+    logger.info(f"Document {'updated' if doc_id else 'created'} with ID: {document.id}")
+
+    # Handle CV image
+    cv_image = request.FILES.get('cv_image') if payload['document_type'] == 'CV' else None
+    if cv_image is not None:
+        _save_cv_image(document, cv_image, payload['target_role'])
+
+    # Create processing steps
+    StageTracker.create(document)
+    return document, payload, None
+
+def _save_cv_image(document, cv_image, target_role):
+    """Store the uploaded professional photo of a CV"""
+    CVImage.objects.create(
+        document=document,
+        image=cv_image,
+        description=f"Professional photo for {target_role}"
+    )
+    logger.info("CV image saved successfully")
 
 @csrf_exempt
 def generate_document(request):
     """Generate CV or Letter of Motivation using Gemini and Tavily APIs"""
-    logger.info(f"[generate_document] {time.strftime('%Y-%m-%d %H:%M:%S')} | Method: {request.method} | Path: {request.path} | Headers: {dict(request.headers)}")
+    logger.info(f"[generate_document] {time.strftime('%Y-%m-%d %H:%M:%S')} | Method: {request.method} | Path: {request.path}")
 
     if request.method == 'POST':
         try:
-            logger.debug(f"POST Data: {request.POST.dict()}")
-            logger.debug(f"Files: {request.FILES}")
-
-            # Extract form data, including new fields
-            target_role = request.POST.get('targetRole', '').strip()
-            company = request.POST.get('company', '').strip()
-            keywords = request.POST.get('keywords', '').strip()
-            tone = request.POST.get('tone', 'professionnel')
-            job_description = request.POST.get('jobDescription', '').strip()
-            document_type = request.POST.get('documentType', 'CV')
-            linkedin_url = request.POST.get('linkedin_url', '').strip()
-            github_url = request.POST.get('github_url', '').strip()
-            telephone = request.POST.get('telephone', '').strip()
-            langue = request.POST.get('langue', 'fr')
-            template_utilise = request.POST.get('template_utilise', 'default')
-            skills = [skill.strip() for skill in request.POST.get('skills', '').split(',') if skill.strip()]
-            try:
-                experiences = json.loads(request.POST.get('experiences', '[]'))
-                education = json.loads(request.POST.get('education', '[]'))
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error for experiences/education: {str(e)}")
-                return render(request, 'user/generate.html', {
-                    'error': 'Invalid format for experiences or education'
+            if logger.isEnabledFor(logging.DEBUG):
+                # Headers and profile fields are masked by the logging pipeline (LOG_REDACT_FIELDS)
+                logger.debug("Generation request", extra={
+                    'headers': dict(request.headers), 'post': request.POST.dict(), 'files': list(request.FILES),
                 })
 
-            if not target_role or not job_description:
-                logger.warning("Missing required fields: targetRole or jobDescription")
-                return render(request, 'user/generate.html', {
-                    'error': 'Target role and job description are required'
-                })
+            document, payload, error = _prepare_document(request)
+            if error:
+                return render(request, 'user/generate.html', {'error': error})
 
-            # Create or update document record
-            user = request.user if request.user.is_authenticated else None
-            logger.info(f"Creating document for user: {user.email if user else 'Anonymous'}")
-            doc_id = request.POST.get('doc_id')
-            if doc_id:
-                document = get_object_or_404(Document, id=doc_id, user=user)
-                document.type = document_type
-                document.titre = f"{document_type} for {target_role}"
-                document.poste = target_role
-                document.entreprise = company
-                document.linkedin_url = linkedin_url
-                document.github_url = github_url
-                document.telephone = telephone
-                document.langue = langue
-                document.template_utilise = template_utilise
-                document.statut = 'processing'
-                document.metadata = {
-                    'keywords': keywords,
-                    'tone': tone,
-                    'job_description_preview': job_description[:100] + '...' if job_description else '',
-                    'linkedin_url': linkedin_url,
-                    'github_url': github_url,
-                    'telephone': telephone,
-                    'langue': langue,
-                    'template_utilise': template_utilise
-                }
-            else:
-                document = Document.objects.create(
-                    user=user,
-                    type=document_type,
-                    titre=f"{document_type} for {target_role}",
-                    poste=target_role,
-                    entreprise=company,
-                    linkedin_url=linkedin_url,
-                    github_url=github_url,
-                    telephone=telephone,
-                    langue=langue,
-                    template_utilise=template_utilise,
-                    statut='processing',
-                    metadata={
-                        'keywords': keywords,
-                        'tone': tone,
-                        'job_description_preview': job_description[:100] + '...' if job_description else '',
-                        'linkedin_url': linkedin_url,
-                        'github_url': github_url,
-                        'telephone': telephone,
-                        'langue': langue,
-                        'template_utilise': template_utilise
-                    }
-                )
-            logger.info(f"Document {'updated' if doc_id else 'created'} with ID: {document.id}")
-
-            # Handle CV image
-            if 'cv_image' in request.FILES and document_type == 'CV':
-                cv_image = request.FILES['cv_image']
-                logger.debug(f"CV image received: {cv_image.name}, size: {cv_image.size}")
-                if cv_image.size > 2 * 1024 * 1024:
-                    logger.warning(f"Image size exceeds 2MB: {cv_image.size}")
-                    document.delete()
-                    return render(request, 'user/generate.html', {
-                        'error': 'Image must not exceed 2MB'
-                    })
-                CVImage.objects.create(
-                    document=document,
-                    image=cv_image,
-                    description=f"Professional photo for {target_role}"
-                )
-                logger.info("CV image saved successfully")
-
-            # Create processing steps
-            EtapeTraitement.objects.filter(document=document).delete()
-            etapes_data = [
-                {"nom": "Job offer analysis", "ordre": 1},
-                {"nom": "Profile adaptation", "ordre": 2},
-                {"nom": "Content generation", "ordre": 3},
-                {"nom": "Optimization", "ordre": 4},
-                {"nom": "Final validation", "ordre": 5},
-            ]
-            for etape_data in etapes_data:
-                EtapeTraitement.objects.create(document=document, **etape_data)
-            logger.debug("Processing steps created")
-
-            # Fetch additional context using Tavily
-            try:
-                logger.info(f"Searching Tavily for: {target_role} job requirements {company}")
-                tavily_response = tavily_client.search(
-                    query=f"{target_role} job requirements {company}",
-                    search_depth="basic",
-                    max_results=3
-                )
-                context = "\n".join([result['content'] for result in tavily_response['results']])
-                logger.debug(f"Tavily context: {context[:200]}...")
-            except Exception as e:
-                logger.error(f"Tavily API error: {str(e)}")
-                context = "No additional context available."
-
-            # Prepare prompt based on document type
-            user_data = {
-                'name': user.full_name if user and user.is_authenticated and hasattr(user, 'full_name') and user.full_name else user.full_name if user and user.is_authenticated else 'Anonymous',
-                'email': user.email if user and user.is_authenticated else 'N/A',
-                'linkedin_url': linkedin_url,
-                'github_url': github_url,
-                'telephone': telephone,
-                'skills': skills,
-                'experiences': experiences,
-                'education': education
-            }
-            logger.debug(f"User data for prompt: {user_data}")
-            prompt = _get_prompt(document_type, target_role, company, keywords, tone, job_description, user_data, context, langue, template_utilise)
-            logger.debug(f"Generated prompt: {prompt[:200]}...")
-
-            # Generate content using Gemini API
-            try:
-                logger.info("Calling Gemini API for content generation")
-                model = genai.GenerativeModel('gemini-1.5-flash')
-                response = model.generate_content(prompt)
-                generated_content = response.text
-                logger.info("Content generated successfully")
-            except Exception as e:
-                logger.error(f"Gemini API error: {str(e)}")
-                document.delete()
-                return render(request, 'user/generate.html', {
-                    'error': f'Failed to generate document: {str(e)}'
-                })
+            # Hand the Tavily → prompt → Gemini → save pipeline over to the workers
+            job = enqueue_generation(document, payload)
 
-            # Update document
-            document.statut = 'completed'
-            document.score = 85  # Placeholder score
-            document.contenu = generated_content
-            document.save()
-            logger.info(f"Document {document.id} updated to completed, score: {document.score}")
-
-            # Mark steps as completed
-            for etape in document.etape_traitement_set.all():
-                etape.statut = 'completed'
-                etape.save()
-            logger.debug("All processing steps marked as completed")
-
-            logger.info(f"Redirecting to dashboard for document {document.id}")
-            return redirect('comptes:dashboard')
+            logger.info(f"Document {document.id} queued for generation (job {job.id})")
+            return JsonResponse({
+                'success': True,
+                'document_id': document.id,
+                'status': document.statut,
+                'status_url': reverse('Agent:document_progress', kwargs={'document_id': document.id}),
+                'redirect_url': reverse('comptes:dashboard'),
+            }, status=202)
 
         except Exception as e:
             logger.error(f"Error in generate_document: {str(e)}", exc_info=True)
@@ -229,7 +219,7 @@ def generate_document(request):
                 'company': document.entreprise,
                 'keywords': document.metadata.get('keywords', ''),
                 'tone': document.metadata.get('tone', 'professionnel'),
-                'jobDescription': document.metadata.get('job_description_preview', '')[:100],
+                'jobDescription': document.metadata.get('job_description', document.metadata.get('job_description_preview', '')),
                 'documentType': document.type,
                 'linkedin_url': document.linkedin_url,
                 'github_url': document.github_url,
@@ -247,6 +237,243 @@ def generate_document(request):
         logger.warning(f"Method {request.method} not allowed for /agent/generate/")
         return HttpResponse(status=405, content="Method Not Allowed")
 
+def _sse(data, event=None):
+    """Format one Server-Sent Events message"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def _sse_events(document, payload):
+    """Relay the streamed pipeline as SSE messages"""
+    yield _sse({'document_id': document.id}, event='document')
+    chunks = stream_generation(document, payload)
+    try:
+        for chunk in chunks:
+            yield _sse({'text': chunk})
+    except GenerationError as e:
+        yield _sse({'error': f'Failed to generate document: {str(e)}'}, event='error')
+        return
+    except Exception as e:
+        logger.error(f"Streamed generation failed for document {document.id}: {str(e)}", exc_info=True)
+        yield _sse({'error': f'An error occurred: {str(e)}'}, event='error')
+        return
+    finally:
+        chunks.close()
+    yield _sse({
+        'document_id': document.id,
+        'status': 'completed',
+        'redirect_url': reverse('Agent:document_detail', kwargs={'document_id': document.id}),
+    }, event='done')
+
+async def _asse_events(document, payload):
+    """Same events for ASGI servers, produced in a worker thread so the event loop is never blocked"""
+    events = _sse_events(document, payload)
+    next_event = sync_to_async(next)
+    try:
+        while True:
+            event = await next_event(events, None)
+            if event is None:
+                break
+            yield event
+    finally:
+        await sync_to_async(events.close)()
+
+@csrf_exempt
+def generate_document_stream(request):
+    """
+    Generate CV or Letter of Motivation and stream the Gemini output as Server-Sent Events.
+
+    Under WSGI (runserver, CV.wsgi) the events come from a sync generator,
+    since Django would buffer an async one until the end; under ASGI an
+    async iterator keeps the event loop free.
+    """
+    logger.info(f"[generate_document_stream] {time.strftime('%Y-%m-%d %H:%M:%S')} | Method: {request.method} | Path: {request.path}")
+    if request.method != 'POST':
+        logger.warning(f"Method {request.method} not allowed for /agent/generate/stream/")
+        return HttpResponse(status=405, content="Method Not Allowed")
+
+    try:
+        document, payload, error = _prepare_document(request)
+    except Exception as e:
+        logger.error(f"Error in generate_document_stream: {str(e)}", exc_info=True)
+        return JsonResponse({'success': False, 'error': f'An error occurred: {str(e)}'}, status=500)
+    if error:
+        return JsonResponse({'success': False, 'error': error}, status=400)
+
+    logger.info(f"Streaming generation for document {document.id}")
+    events = _asse_events(document, payload) if isinstance(request, ASGIRequest) else _sse_events(document, payload)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let nginx flush each event
+    return response
+
+@csrf_exempt
+async def agenerate_document(request):
+    """
+    Async variant of generate_document for ASGI deployments.
+
+    The Tavily lookup, the photo upload and the processing steps setup run
+    concurrently, then the prompt is sent to Gemini through the pooled async
+    HTTP client; the worker thread is never blocked while waiting on I/O.
+    """
+    logger.info(f"[agenerate_document] {time.strftime('%Y-%m-%d %H:%M:%S')} | Method: {request.method} | Path: {request.path}")
+    if request.method != 'POST':
+        logger.warning(f"Method {request.method} not allowed for /agent/generate/async/")
+        return HttpResponse(status=405, content="Method Not Allowed")
+
+    payload, error = _parse_generation_form(request)
+    if error:
+        return JsonResponse({'success': False, 'error': error}, status=400)
+
+    user = await request.auser()
+    user = user if user.is_authenticated else None
+    doc_id = request.POST.get('doc_id')
+    fields = _document_fields(payload)
+    if doc_id:
+        document = await aget_object_or_404(Document, id=doc_id, user=user)
+        _update_document(document, fields)
+        await document.asave()
+    else:
+        document = await Document.objects.acreate(user=user, **fields)
+    logger.info(f"Document {'updated' if doc_id else 'created'} with ID: {document.id}")
+
+    cv_image = request.FILES.get('cv_image') if payload['document_type'] == 'CV' else None
+    tracker = None
+    try:
+        # An edit that only touches a few sections needs neither Tavily nor a full generation
+        plan = await sync_to_async(plan_incremental)(document, payload) if doc_id else None
+        pending = [StageTracker.acreate(document)]
+        if plan is None:
+            pending.append(atimed_search_context(payload['target_role'], payload['company']))
+        if cv_image is not None:
+            pending.append(sync_to_async(_save_cv_image)(document, cv_image, payload['target_role']))
+        tracker, *results = await asyncio.gather(*pending)
+
+        if plan is not None:
+            await sync_to_async(run_incremental)(document, payload, plan, tracker)
+        else:
+            context, search_timing = results[0]
+            await arun_generation(document, user, payload, context, search_timing, tracker=tracker)
+    except Exception as e:
+        # Never leave the document or its stages in 'processing', whatever failed
+        if not isinstance(e, GenerationError):
+            logger.error(f"Error in agenerate_document: {str(e)}", exc_info=True)
+        document.statut = 'error'
+        await document.asave(update_fields=['statut', 'date_mise_a_jour'])
+        if tracker is not None:
+            await tracker.aabort(str(e))
+        if isinstance(e, GenerationError):
+            return JsonResponse({'success': False, 'document_id': document.id, 'error': f'Failed to generate document: {str(e)}'}, status=502)
+        return JsonResponse({'success': False, 'document_id': document.id, 'error': f'An error occurred: {str(e)}'}, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'document_id': document.id,
+        'status': document.statut,
+        'redirect_url': reverse('Agent:document_detail', kwargs={'document_id': document.id}),
+    }, status=201)
+
+def _parse_batch_profile(data):
+    """
+    Read the shared profile of a batch request once for all its offers.
+
+    Returns (profile, offers, error).
+    """
+    profile = data.get('profile') if isinstance(data, dict) else None
+    offers = data.get('offers') if isinstance(data, dict) else None
+    if not isinstance(profile, dict) or not isinstance(offers, list) or not offers:
+        return None, None, 'A profile and a non-empty list of offers are required'
+    if len(offers) > settings.BATCH_GENERATION_MAX_OFFERS:
+        return None, None, f'A batch is limited to {settings.BATCH_GENERATION_MAX_OFFERS} offers'
+
+    skills = profile.get('skills', [])
+    if isinstance(skills, str):
+        skills = skills.split(',')
+    experiences = profile.get('experiences', [])
+    education = profile.get('education', [])
+    if not isinstance(skills, list) or not isinstance(experiences, list) or not isinstance(education, list):
+        return None, None, 'Invalid format for skills, experiences or education'
+
+    shared = {
+        'keywords': str(profile.get('keywords', '')).strip(),
+        'tone': profile.get('tone', 'professionnel'),
+        'linkedin_url': str(profile.get('linkedin_url', '')).strip(),
+        'github_url': str(profile.get('github_url', '')).strip(),
+        'telephone': str(profile.get('telephone', '')).strip(),
+        'langue': profile.get('langue', 'fr'),
+        'template_utilise': profile.get('template_utilise', 'default'),
+        'skills': [str(skill).strip() for skill in skills if str(skill).strip()],
+        'experiences': experiences,
+        'education': education,
+    }
+    return shared, offers, None
+
+def _batch_item_payload(profile, offer):
+    """Pipeline payload for one offer of a batch. Returns (payload, error)"""
+    if not isinstance(offer, dict):
+        return None, 'Invalid offer'
+    target_role = str(offer.get('target_role', '')).strip()
+    job_description = str(offer.get('job_description', '')).strip()
+    document_type = offer.get('document_type', 'CV')
+    if document_type not in dict(Document.DOCUMENT_TYPES):
+        return None, f'Invalid document type: {document_type}'
+    if not target_role or not job_description:
+        return None, 'Target role and job description are required'
+
+    payload = dict(profile)
+    payload.update({
+        'document_type': document_type,
+        'target_role': target_role,
+        'company': str(offer.get('company', '')).strip(),
+        'job_description': job_description,
+    })
+    if offer.get('keywords'):
+        payload['keywords'] = str(offer['keywords']).strip()
+    return payload, None
+
+@csrf_exempt
+async def agenerate_batch(request):
+    """
+    Generate one tailored CV or letter per target offer for a single profile.
+
+    Expects a JSON body {"profile": {...}, "offers": [{...}, ...]} and answers
+    with one result per offer: its Document id and its final status.
+    """
+    logger.info(f"[agenerate_batch] {time.strftime('%Y-%m-%d %H:%M:%S')} | Method: {request.method} | Path: {request.path}")
+    if request.method != 'POST':
+        logger.warning(f"Method {request.method} not allowed for /agent/generate/batch/")
+        return HttpResponse(status=405, content="Method Not Allowed")
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON decode error in agenerate_batch: {str(e)}")
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+    profile, offers, error = _parse_batch_profile(data)
+    if error:
+        return JsonResponse({'success': False, 'error': error}, status=400)
+
+    results = []
+    items = []
+    for index, offer in enumerate(offers):
+        payload, error = _batch_item_payload(profile, offer)
+        if error:
+            results.append({'index': index, 'document_id': None, 'status': 'error', 'error': error})
+            continue
+        document = await Document.objects.acreate(user=user, **_document_fields(payload))
+        items.append((index, document, payload))
+    logger.info(f"Batch for user {user.email}: {len(items)} documents created, {len(results)} offers rejected")
+
+    results.extend(await agenerate_batch_documents(user, items))
+    results.sort(key=lambda result: result['index'])
+    return JsonResponse({
+        'success': all(result['status'] == 'completed' for result in results),
+        'results': results,
+    })
+
 @csrf_exempt
 @login_required
 def delete_document(request, document_id):
@@ -255,6 +482,7 @@ def delete_document(request, document_id):
     if request.method == 'DELETE':
         document = get_object_or_404(Document, id=document_id, user=request.user)
         try:
+            delete_pdf_files(document)
             document.delete()
             logger.info(f"Document {document_id} deleted successfully")
             return JsonResponse({'success': True, 'message': 'Document deleted'})
@@ -267,9 +495,9 @@ def delete_document(request, document_id):
 @csrf_exempt
 def test_post_endpoint(request):
     """Debug endpoint to test POST requests"""
-    logger.info(f"[test_post_endpoint] {time.strftime('%Y-%m-%d %H:%M:%S')} | Method: {request.method} | Path: {request.path} | Headers: {dict(request.headers)}")
+    logger.info(f"[test_post_endpoint] {time.strftime('%Y-%m-%d %H:%M:%S')} | Method: {request.method} | Path: {request.path}")
     if request.method == 'POST':
-        logger.debug(f"POST Data: {request.POST.dict()}")
+        logger.debug("Test POST request", extra={'headers': dict(request.headers), 'post': request.POST.dict()})
         return JsonResponse({'success': True, 'message': 'POST request received', 'data': request.POST.dict()})
     elif request.method == 'GET':
         logger.info("GET request to test_post_endpoint")
@@ -279,44 +507,6 @@ def test_post_endpoint(request):
         return HttpResponse(status=405, content="Method Not Allowed")
 
 
-def _get_prompt(document_type, target_role, company, keywords, tone, job_description, user_data, context, langue, template_utilise):
-    """Generate prompt for CV or LM"""
-    logger.debug(f"Generating prompt for {document_type}")
-    if document_type == 'CV':
-        prompt = f"""
-        Generate a professional CV in {langue} for a {target_role} position at {company}. 
-        Use a {tone} tone and the {template_utilise} template style. Incorporate the following details:
-        - Name: {user_data.get('name', 'Anonymous')}
-        - Email: {user_data.get('email', 'N/A')}
-        - LinkedIn: {user_data.get('linkedin_url', 'N/A')}
-        - GitHub: {user_data.get('github_url', 'N/A')}
-        - Telephone: {user_data.get('telephone', 'N/A')}
-        - Skills: {', '.join(user_data.get('skills', [])) + ', ' + keywords if keywords else ', '.join(user_data.get('skills', []))}
-        - Experiences: {json.dumps(user_data.get('experiences', []))}
-        - Education: {json.dumps(user_data.get('education', []))}
-        - Job Description: {job_description}
-        - Additional Context: {context}
-        Format the CV in markdown with clear sections for Personal Information (including LinkedIn, GitHub, and Telephone), Skills, Professional Experience, and Education. Ensure the content is tailored to the job description and company.
-        """
-    else:  # LM
-        prompt = f"""
-        Generate a professional Letter of Motivation in {langue} for a {target_role} position at {company}. 
-        Use a {tone} tone and the {template_utilise} template style. Incorporate the following details:
-        - Name: {user_data.get('name', 'Anonymous')}
-        - Email: {user_data.get('email', 'N/A')}
-        - LinkedIn: {user_data.get('linkedin_url', 'N/A')}
-        - GitHub: {user_data.get('github_url', 'N/A')}
-        - Telephone: {user_data.get('telephone', 'N/A')}
-        - Skills: {', '.join(user_data.get('skills', [])) + ', ' + keywords if keywords else ', '.join(user_data.get('skills', []))}
-        - Experiences: {json.dumps(user_data.get('experiences', []))}
-        - Education: {json.dumps(user_data.get('education', []))}
-        - Job Description: {job_description}
-        - Additional Context: {context}
-        Address the letter to the hiring manager at {company}. Highlight relevant skills and experiences, and explain why the candidate is a good fit for the role and company culture. Include contact information (LinkedIn, GitHub, Telephone) in the closing section. Format the letter in markdown with a formal greeting, body (3-4 paragraphs), and closing.
-        """
-    logger.debug(f"Prompt generated: {prompt[:200]}...")
-    return prompt
-
 @login_required
 def document_detail(request, document_id):
     """Display document details"""
@@ -332,46 +522,118 @@ def document_detail(request, document_id):
     logger.info(f"Rendering document_detail for document {document_id}")
     return render(request, 'user/generate_document.html', context)
 
+@login_required
+def document_progress(request, document_id):
+    """API returning the generation status of a document and its steps"""
+    document = get_object_or_404(Document, id=document_id, user=request.user)
+    etapes = document.etape_traitement_set.all().order_by('ordre')
+    return JsonResponse({
+        'success': True,
+        'document_id': document.id,
+        'status': document.statut,
+        'etapes': [
+            {'nom': etape.nom, 'ordre': etape.ordre, 'statut': etape.statut}
+            for etape in etapes
+        ],
+    })
+
+@staff_member_required
+def rate_limit_status(request):
+    """Staff API: outbound rate limiters and search circuit breakers, as seen by this process"""
+    return JsonResponse({
+        'success': True,
+        'backend': settings.RATE_LIMIT_BACKEND,
+        'pid': os.getpid(),
+        'limiters': rate_limit.status(),
+        'search': resilience.status(),
+    })
+
+@staff_member_required
+def metrics_export(request):
+    """Staff API: pipeline counters and histograms of all worker processes, in Prometheus text format"""
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @login_required
 def download_document(request, document_id):
     """Download generated document as PDF"""
     logger.info(f"Downloading document {document_id} for user {request.user.email}")
-    document = get_object_or_404(Document, id=document_id, user=request.user)
+    document = get_object_or_404(Document.objects.select_related('user', 'cv_image'), id=document_id, user=request.user)
     
     if document.statut != 'completed':
         logger.warning(f"Document {document_id} not ready for download, status: {document.statut}")
         return JsonResponse({'error': 'Document not ready'})
     
-    logger.debug(f"Generating PDF for document {document_id}")
-    pdf_content = generate_pdf(document)
+    # Le navigateur a déjà la bonne version : 304 sans rendre le PDF
+    etag = pdf_etag(document)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        logger.debug(f"PDF for document {document_id} not modified")
+        return not_modified
+
+    # PDF pré-rendu à la fin de la génération (rendu ici seulement s'il manque)
+    path = ensure_pdf_file(document)
     
     filename = f"{document.type}_{document.poste.replace(' ', '_')}.pdf"
-    content_type = 'application/pdf'
-    
-    response = HttpResponse(pdf_content, content_type=content_type)
+    response = _pdf_file_response(request, document, path, etag)
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    logger.info(f"PDF generated for document {document_id}, filename: {filename}")
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    logger.info(f"PDF served for document {document_id}, filename: {filename}")
     return response
 
-def generate_pdf(document):
-    """Generate PDF from document content"""
-    logger.debug(f"Starting PDF generation for document {document.id}")
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    c.drawString(100, 750, document.titre)
-    y = 750
-    for line in document.contenu.split('\n'):
-        if y < 50:
-            c.showPage()
-            y = 750
-        c.drawString(100, y, line[:80])  # Truncate long lines
-        y -= 15
-    c.showPage()
-    c.save()
-    pdf = buffer.getvalue()
-    buffer.close()
-    logger.debug(f"PDF generated successfully for document {document.id}")
-    return pdf
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def _pdf_file_response(request, document, path, etag):
+    """
+    Send a rendered PDF file.
+
+    With PDF_SENDFILE_BACKEND set, the front proxy sends the file (and handles
+    Range itself); otherwise Django streams it, honouring a single byte range.
+    """
+    backend = settings.PDF_SENDFILE_BACKEND
+    if backend == 'nginx':
+        response = HttpResponse(content_type='application/pdf')
+        response['X-Accel-Redirect'] = settings.PDF_SENDFILE_URL_PREFIX.rstrip('/') + '/' + pdf_relative_path(document).replace(os.sep, '/')
+        return response
+    if backend == 'apache':
+        response = HttpResponse(content_type='application/pdf')
+        response['X-Sendfile'] = path
+        return response
+
+    size = os.path.getsize(path)
+    match = RANGE_RE.match(request.headers.get('Range', '').strip())
+    if_range = request.headers.get('If-Range')
+    if not match or not any(match.groups()) or (if_range and if_range != etag):
+        response = FileResponse(open(path, 'rb'), content_type='application/pdf')
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    start, end = match.groups()
+    if start:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    else:
+        start, end = max(0, size - int(end)), size - 1
+    if start > end or start >= size:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    def read_range(f, remaining, chunk_size=64 * 1024):
+        with f:
+            f.seek(start)
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    length = end - start + 1
+    response = StreamingHttpResponse(read_range(open(path, 'rb'), length), status=206, content_type='application/pdf')
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
 
 @csrf_exempt
 @login_required
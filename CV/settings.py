@@ -61,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'Agent.middleware.MetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'CV.urls'
@@ -87,18 +88,101 @@ ALLOWED_IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif']
 WSGI_APPLICATION = 'CV.wsgi.application'
 
 
+# URL des API Gemini et Tavily (benchmarks/loadtest les remplace par des serveurs locaux)
+GEMINI_API_BASE_URL = config('GEMINI_API_BASE_URL', default='https://generativelanguage.googleapis.com')
+TAVILY_API_BASE_URL = config('TAVILY_API_BASE_URL', default='https://api.tavily.com')
+# Clients HTTP asynchrones (vue agenerate_document sous ASGI)
+ASYNC_HTTP_MAX_CONNECTIONS = config('ASYNC_HTTP_MAX_CONNECTIONS', default=200, cast=int)
+ASYNC_HTTP_TIMEOUT = config('ASYNC_HTTP_TIMEOUT', default=60, cast=float)  # secondes
+# Génération par lot (vue agenerate_batch)
+BATCH_GENERATION_CONCURRENCY = config('BATCH_GENERATION_CONCURRENCY', default=8, cast=int)
+BATCH_GENERATION_MAX_OFFERS = config('BATCH_GENERATION_MAX_OFFERS', default=50, cast=int)
+
 # Configuration OpenAI
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', 'your-openai-api-key')
+OPENAI_API_BASE_URL = config('OPENAI_API_BASE_URL', default='https://api.openai.com')
 
 # Configuration Google Search (optionnelle)
 GOOGLE_SEARCH_API_KEY = os.environ.get('GOOGLE_SEARCH_API_KEY', '')
 SEARCH_ENGINE_ID = os.environ.get('SEARCH_ENGINE_ID', '')
 
 # Configuration des modèles par défaut
-DEFAULT_LLM_MODEL = "gpt-4"
+DEFAULT_LLM_MODEL = config('DEFAULT_LLM_MODEL', default='gpt-4')
+# Modèle de secours des services LangChain quand DEFAULT_LLM_MODEL échoue
+DEFAULT_LLM_ALTERNATIVE_MODEL = config('DEFAULT_LLM_ALTERNATIVE_MODEL', default='gpt-3.5-turbo')
 DEFAULT_LLM_TEMPERATURE = 0.7
 DEFAULT_LLM_MAX_TOKENS = 2000
 
+# File de génération (voir Agent/services/jobs.py et `manage.py run_generation_worker`)
+GENERATION_WORKER_THREADS = config('GENERATION_WORKER_THREADS', default=4, cast=int)
+GENERATION_JOB_MAX_ATTEMPTS = config('GENERATION_JOB_MAX_ATTEMPTS', default=3, cast=int)
+GENERATION_JOB_LOCK_TIMEOUT = config('GENERATION_JOB_LOCK_TIMEOUT', default=600, cast=int)  # secondes
+GENERATION_JOB_HEARTBEAT_INTERVAL = config('GENERATION_JOB_HEARTBEAT_INTERVAL', default=60, cast=int)  # secondes entre deux rafraîchissements du verrou d'un job en cours
+GENERATION_JOB_SWEEP_INTERVAL = config('GENERATION_JOB_SWEEP_INTERVAL', default=60, cast=int)  # secondes entre deux reprises des jobs abandonnés
+# Génération streamée (SSE) : sauvegarde du contenu partiel tous les N morceaux
+GENERATION_STREAM_CHECKPOINT_CHUNKS = config('GENERATION_STREAM_CHECKPOINT_CHUNKS', default=10, cast=int)
+# Cache des contenus générés (table GenerationCacheEntry, partagée par tous les workers)
+GENERATION_CACHE_ENABLED = config('GENERATION_CACHE_ENABLED', default=True, cast=bool)
+GENERATION_CACHE_TTL = config('GENERATION_CACHE_TTL', default=7 * 24 * 3600, cast=int)  # secondes
+GENERATION_CACHE_MAX_ENTRIES = config('GENERATION_CACHE_MAX_ENTRIES', default=5000, cast=int)
+# Modification d'un document (doc_id) : seules les sections dont les entrées ont changé sont régénérées
+GENERATION_INCREMENTAL = config('GENERATION_INCREMENTAL', default=True, cast=bool)
+# Cache des recherches Tavily par couple (poste, entreprise), table SearchCacheEntry
+SEARCH_CACHE_TTL = config('SEARCH_CACHE_TTL', default=24 * 3600, cast=int)  # secondes
+SEARCH_CACHE_STALE_TTL = config('SEARCH_CACHE_STALE_TTL', default=7 * 24 * 3600, cast=int)  # servi périmé puis rafraîchi
+SEARCH_CACHE_LOCK_TIMEOUT = config('SEARCH_CACHE_LOCK_TIMEOUT', default=30, cast=int)  # attente max d'une recherche en cours
+# Budget de tokens des prompts par type de document (Agent/services/prompt_budget.py)
+PROMPT_TOKEN_BUDGETS = {
+    'CV': config('PROMPT_TOKEN_BUDGET_CV', default=3000, cast=int),
+    'LM': config('PROMPT_TOKEN_BUDGET_LM', default=2500, cast=int),
+}
+# Rendu PDF (Agent/services/pdf.py) : polices TTF optionnelles, PDF pré-rendus sous MEDIA_ROOT/pdf/
+PDF_FONT_PATH = config('PDF_FONT_PATH', default='')
+PDF_FONT_BOLD_PATH = config('PDF_FONT_BOLD_PATH', default='')
+PDF_PRERENDER_THREADS = config('PDF_PRERENDER_THREADS', default=2, cast=int)
+# Envoi des PDF par le proxy : '' (FileResponse), 'nginx' (X-Accel-Redirect) ou 'apache' (X-Sendfile)
+PDF_SENDFILE_BACKEND = config('PDF_SENDFILE_BACKEND', default='')
+PDF_SENDFILE_URL_PREFIX = config('PDF_SENDFILE_URL_PREFIX', default='/protected-media/')  # location nginx "internal" sur MEDIA_ROOT
+# Statistiques du tableau de bord lues dans UserDocumentStats (lancer `manage.py rebuild_document_stats` à l'activation)
+DASHBOARD_STATS_DENORMALIZED = config('DASHBOARD_STATS_DENORMALIZED', default=False, cast=bool)
+DASHBOARD_PAGE_SIZE = config('DASHBOARD_PAGE_SIZE', default=20, cast=int)  # documents par page (pagination par curseur)
+# Taxonomie des compétences (nom canonique, catégorie, synonymes) utilisée par Agent/services/skills.py
+SKILLS_TAXONOMY_PATH = config('SKILLS_TAXONOMY_PATH', default=os.path.join(BASE_DIR, 'Agent', 'data', 'skills_taxonomy.json'))
+# Index de similarité des compétences (`manage.py build_skill_index`), lu en mmap par Agent/services/skill_index.py
+SKILL_INDEX_DIR = config('SKILL_INDEX_DIR', default=os.path.join(BASE_DIR, 'var', 'skill_index'))
+SKILL_INDEX_TOP_K = config('SKILL_INDEX_TOP_K', default=10, cast=int)
+# Fournisseurs LLM (Agent/services/llm_provider.py), « fournisseur:modèle » parmi gemini, openai et stub (local, déterministe)
+LLM_PROVIDER = config('LLM_PROVIDER', default='gemini:gemini-1.5-flash')
+LLM_FALLBACK_PROVIDERS = config('LLM_FALLBACK_PROVIDERS', default='')  # séparés par des virgules, essayés dans l'ordre
+LLM_TIMEOUT = config('LLM_TIMEOUT', default=60, cast=float)  # secondes par appel (entre deux morceaux en streaming)
+LLM_MAX_RETRIES = config('LLM_MAX_RETRIES', default=2, cast=int)  # par fournisseur, erreurs transitoires seulement
+LLM_RETRY_BASE_DELAY = config('LLM_RETRY_BASE_DELAY', default=0.5, cast=float)  # secondes, doublé à chaque tentative (jitter)
+LLM_HTTP_MAX_CONNECTIONS = config('LLM_HTTP_MAX_CONNECTIONS', default=20, cast=int)
+LLM_STUB_LATENCY = config('LLM_STUB_LATENCY', default=0, cast=float)  # secondes simulées par appel du fournisseur stub
+# Limites des appels sortants par fournisseur (Agent/services/rate_limit.py) : débit en appels/s,
+# rafale (taille du seau de jetons) et appels simultanés par processus
+RATE_LIMITS = {
+    'gemini': {'rate': config('RATE_LIMIT_GEMINI', default=5, cast=float), 'burst': 10, 'concurrency': config('RATE_LIMIT_GEMINI_CONCURRENCY', default=8, cast=int)},
+    'openai': {'rate': config('RATE_LIMIT_OPENAI', default=5, cast=float), 'burst': 10, 'concurrency': config('RATE_LIMIT_OPENAI_CONCURRENCY', default=8, cast=int)},
+    'tavily': {'rate': config('RATE_LIMIT_TAVILY', default=2, cast=float), 'burst': 5, 'concurrency': config('RATE_LIMIT_TAVILY_CONCURRENCY', default=4, cast=int)},
+    'google_cse': {'rate': config('RATE_LIMIT_GOOGLE_CSE', default=1, cast=float), 'burst': 5, 'concurrency': 2},
+}
+RATE_LIMIT_BACKEND = config('RATE_LIMIT_BACKEND', default='database')  # 'database' (partagé entre processus) ou 'local'
+RATE_LIMIT_MAX_WAIT = config('RATE_LIMIT_MAX_WAIT', default=30, cast=float)  # secondes d'attente max dans la file
+# Résilience des recherches Tavily et Google CSE (Agent/services/resilience.py) : au-delà de l'échéance
+# ou disjoncteur ouvert, la génération continue sans contexte de recherche
+SEARCH_DEADLINE = config('SEARCH_DEADLINE', default=5, cast=float)  # secondes par requête (et d'attente max du limiteur de débit)
+SEARCH_BREAKER_FAILURES = config('SEARCH_BREAKER_FAILURES', default=5, cast=int)  # échecs consécutifs avant ouverture
+SEARCH_BREAKER_RESET = config('SEARCH_BREAKER_RESET', default=30, cast=float)  # secondes avant un appel d'essai
+SEARCH_HEDGE_ENABLED = config('SEARCH_HEDGE_ENABLED', default=True, cast=bool)  # seconde requête après le p95 observé
+SEARCH_HEDGE_MIN_DELAY = config('SEARCH_HEDGE_MIN_DELAY', default=0.5, cast=float)  # secondes
+SEARCH_MAX_WORKERS = config('SEARCH_MAX_WORKERS', default=16, cast=int)
+
+# Métriques (Agent/services/metrics.py) : chaque processus écrit ses compteurs
+# dans METRICS_DIR, additionnés par /api/metrics/ (vide : ce processus seulement)
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(BASE_DIR, 'var', 'metrics'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)  # secondes
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -113,24 +197,70 @@ DATABASES = {
     }
 }
 
+# Journalisation : les enregistrements passent par une file bornée et sont écrits
+# par un thread d'arrière-plan (Agent/services/log_pipeline.py), en JSON dans
+# LOG_FILE ; les en-têtes sensibles et les données de profil sont masqués
+LOG_LEVEL = config('LOG_LEVEL', default='DEBUG' if DEBUG else 'INFO')
+LOG_FILE = config('LOG_FILE', default=os.path.join(BASE_DIR, 'debug.log'))
+LOG_QUEUE_SIZE = config('LOG_QUEUE_SIZE', default=10000, cast=int)  # au-delà, enregistrements perdus et comptés
+# Proportion des enregistrements DEBUG gardés, par logger (ou parent) sur le chemin chaud
+LOG_SAMPLING = {
+    'Agent.views': 0.1,
+    'Agent.services.pipeline': 0.1,
+    'Agent.services.search_cache': 0.1,
+    'django.db.backends': 0.01,
+}
+# Clés masquées dans les champs `extra=` des enregistrements, à toute profondeur
+LOG_REDACT_FIELDS = [
+    'cookie', 'authorization', 'x-csrftoken', 'csrfmiddlewaretoken', 'password', 'password1', 'password2',
+    'name', 'full_name', 'email', 'telephone', 'phone_number', 'linkedin_url', 'github_url', 'experiences', 'education',
+]
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'Agent.services.log_pipeline.JsonFormatter',
+        },
+        'console': {
+            'format': '%(asctime)s %(levelname)s %(name)s: %(message)s',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'Agent.services.log_pipeline.SamplingFilter',
+            'rates': LOG_SAMPLING,
+        },
+        'redaction': {
+            '()': 'Agent.services.log_pipeline.RedactionFilter',
+            'fields': LOG_REDACT_FIELDS,
+        },
+    },
     'handlers': {
+        # Écrits par le thread de 'queue' uniquement, jamais attachés à un logger
         'file': {
             'level': 'DEBUG',
             'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'debug.log'),
+            'filename': LOG_FILE,
+            'formatter': 'json',
         },
         'console': {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
+            'formatter': 'console',
+        },
+        'queue': {
+            '()': 'Agent.services.log_pipeline.BackgroundHandler',
+            'targets': ['file', 'console'],
+            'maxsize': LOG_QUEUE_SIZE,
+            'filters': ['sampling', 'redaction'],
         },
     },
     'loggers': {
         '': {
-            'handlers': ['file', 'console'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
             'propagate': True,
         },
     },
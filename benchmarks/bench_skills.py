@@ -0,0 +1,71 @@
+"""
+Extraction de compétences : matcher à index (Agent/services/skills.py) contre
+l'ancienne boucle `skill.lower() in text.lower()` appliquée à la même taxonomie.
+Le texte répète une offre très dense en compétences : c'est le cas défavorable
+pour le matcher (une recherche dans le trie pour un mot sur trois).
+Le script échoue (code 1) quand une extraction indexée dépasse --max-us
+microsecondes : par défaut la milliseconde visée pour une offre de 10 Ko,
+0 désactive la vérification.
+
+    python benchmarks/bench_skills.py [--size 10000] [--repeat 200] [--max-us 1000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent.services.skills import SkillMatcher, load_taxonomy, DEFAULT_TAXONOMY_PATH  # noqa: E402
+
+# Budget par défaut d'une extraction indexée, en microsecondes
+DEFAULT_MAX_US = 1000
+
+POSTING = """Nous recherchons un(e) Développeur(se) Full Stack senior pour renforcer notre équipe produit.
+Missions : concevoir et développer des API REST et GraphQL en Python (Django, FastAPI) et Node.js,
+des interfaces en React, React Native et TypeScript ; industrialiser les déploiements (Docker, Kubernetes,
+Terraform, GitHub Actions) sur AWS (AWS Lambda, Amazon S3, Amazon RDS) ; participer aux rituels Scrum.
+Profil : 5 ans d'expérience, maîtrise de PostgreSQL et Redis, notions de Kafka et d'Elasticsearch,
+tests automatisés (pytest, Jest, Cypress), sensibilité UX et accessibilité (WCAG). Anglais courant.
+Vous êtes rigoureux, autonome, curieux, avec un bon esprit d'équipe et le sens du service.
+Un plus : Go ou Rust, Machine Learning (scikit-learn, pandas), Power BI, expérience en start-up SaaS.
+"""
+
+
+def naive_extract(surface_forms, text):
+    lowered = text.lower()
+    return [name for form, name in surface_forms if form in lowered]
+
+
+def best_of(func, number, repeat=5):
+    """Meilleur temps par appel sur `repeat` séries (le moins perturbé par la machine)"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=10000, help="Taille du texte analysé, en caractères")
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--max-us', type=float, default=DEFAULT_MAX_US, help="Budget d'une extraction indexée, en microsecondes (0 : aucun)")
+    args = parser.parse_args()
+
+    text = (POSTING * (args.size // len(POSTING) + 1))[:args.size]
+    skills = load_taxonomy(DEFAULT_TAXONOMY_PATH)
+    surface_forms = [(form.lower(), skill['name']) for skill in skills for form in [skill['name'], *skill.get('synonyms', ())]]
+
+    build = best_of(lambda: SkillMatcher(skills), number=1)
+    matcher = SkillMatcher(skills)
+    indexed = best_of(lambda: matcher.extract(text), number=args.repeat)
+    naive = best_of(lambda: naive_extract(surface_forms, text), number=max(args.repeat // 10, 1))
+
+    print(f"taxonomy: {len(skills)} skills, {len(surface_forms)} surface forms, text: {len(text)} chars")
+    print(f"index build          {build * 1000:9.2f} ms (once per process)")
+    print(f"indexed extract      {indexed * 1e6:9.1f} µs/call, {len(matcher.extract(text))} skills")
+    print(f"naive substring loop {naive * 1e6:9.1f} µs/call, {len(naive_extract(surface_forms, text))} hits (sans limites de mots)")
+
+    if args.max_us and indexed * 1e6 > args.max_us:
+        sys.exit(f"Skill extraction budget exceeded: {indexed * 1e6:.1f} µs > {args.max_us} µs for {len(text)} chars")
+
+
+if __name__ == '__main__':
+    main()
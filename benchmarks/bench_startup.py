@@ -0,0 +1,119 @@
+"""
+Temps de démarrage : `manage.py check`, démarrage d'un worker de génération
+et première requête HTTP d'un processus neuf. Chaque mesure lance un nouveau
+processus Python : c'est le coût payé par chaque commande, migration, test
+ou redémarrage de worker.
+
+Le script liste aussi les SDK de fournisseurs (Gemini, Tavily, OpenAI,
+LangChain, reportlab) chargés par le simple import des URLs : ils doivent
+l'être au premier usage seulement. Les options --max-* font échouer le
+script (code 1) au-delà d'un budget, pour repérer une régression en CI.
+
+    python benchmarks/bench_startup.py [--settings CV.settings] [--repeat 5] [--url /login/]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules qui ne doivent pas être importés au démarrage
+LAZY_MODULES = ['google.generativeai', 'tavily', 'openai', 'langchain', 'reportlab']
+
+BOOT = "import time; started = time.perf_counter(); import django; django.setup()\n"
+
+WORKER = BOOT + """
+import Agent.management.commands.run_generation_worker, Agent.services.jobs
+print(time.perf_counter() - started)
+"""
+
+FIRST_REQUEST = BOOT + """
+import json, sys
+from django.test import Client
+client = Client()
+before = time.perf_counter()
+status = client.get(sys.argv[1], HTTP_HOST='localhost').status_code
+first = time.perf_counter()
+client.get(sys.argv[1], HTTP_HOST='localhost')
+warm = time.perf_counter()
+print(json.dumps({'status': status, 'total': first - started, 'first': first - before, 'warm': warm - first}))
+"""
+
+IMPORTS = BOOT + """
+import json, sys
+from django.conf import settings
+from importlib import import_module
+before = set(sys.modules)
+import_module(settings.ROOT_URLCONF)
+loaded = sorted({name for name in set(sys.modules) - before if name.split('.')[0] in {m.split('.')[0] for m in %r}})
+print(json.dumps({'total': time.perf_counter() - started, 'lazy_loaded': [m for m in %r if any(n == m or n.startswith(m + '.') for n in loaded)]}))
+""" % (LAZY_MODULES, LAZY_MODULES)
+
+
+def run(env, *argv):
+    """Lance un processus Python neuf depuis la racine du projet ; retourne (durée murale, sortie)"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *argv], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=False,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        sys.exit(f"{' '.join(argv[:2])} failed:\n{result.stderr[-2000:]}")
+    return elapsed, result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ''
+
+
+def median_of(measure, repeat):
+    return statistics.median(measure() for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--settings', default=os.environ.get('DJANGO_SETTINGS_MODULE', 'CV.settings'))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--url', default='/login/', help="URL de la première requête")
+    parser.add_argument('--max-check', type=float, help="Budget de `manage.py check`, en secondes")
+    parser.add_argument('--max-boot', type=float, help="Budget du démarrage d'un worker, en secondes")
+    parser.add_argument('--max-first-request', type=float, help="Budget démarrage + première requête, en secondes")
+    args = parser.parse_args()
+
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': args.settings}
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+
+    interpreter = median_of(lambda: run(env, '-c', 'pass')[0], args.repeat)
+    check = median_of(lambda: run(env, 'manage.py', 'check')[0], args.repeat)
+    boot = median_of(lambda: float(run(env, '-c', WORKER)[1]), args.repeat)
+    requests = [json.loads(run(env, '-c', FIRST_REQUEST, args.url)[1]) for _ in range(args.repeat)]
+    imports = json.loads(run(env, '-c', IMPORTS)[1])
+
+    print(f"Python interpreter alone        : {interpreter * 1000:8.1f} ms (wall)")
+    print(f"manage.py check                 : {check * 1000:8.1f} ms (wall)")
+    print(f"django.setup + URL imports      : {imports['total'] * 1000:8.1f} ms")
+    print(f"worker boot (setup + imports)   : {boot * 1000:8.1f} ms")
+    print(f"first request {args.url} (HTTP {requests[0]['status']})")
+    print(f"  process start -> response     : {statistics.median(r['total'] for r in requests) * 1000:8.1f} ms")
+    print(f"  first request                 : {statistics.median(r['first'] for r in requests) * 1000:8.1f} ms")
+    print(f"  warm request                  : {statistics.median(r['warm'] for r in requests) * 1000:8.1f} ms")
+    print(f"provider SDKs loaded at startup : {', '.join(imports['lazy_loaded']) or 'none'}")
+
+    over = [
+        f"{name} {value:.3f}s > {budget}s"
+        for name, value, budget in [
+            ('check', check, args.max_check),
+            ('boot', boot, args.max_boot),
+            ('first request', statistics.median(r['total'] for r in requests), args.max_first_request),
+        ]
+        if budget is not None and value > budget
+    ]
+    if imports['lazy_loaded']:
+        over.append(f"eagerly imported: {', '.join(imports['lazy_loaded'])}")
+    if over:
+        sys.exit("Startup budget exceeded: " + '; '.join(over))
+
+
+if __name__ == '__main__':
+    main()
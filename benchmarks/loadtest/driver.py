@@ -0,0 +1,371 @@
+"""
+Test de charge hors ligne de la génération de documents.
+
+Lance les faux fournisseurs (fake_providers.py), puis pour chaque
+configuration de workers `PxT` (P processus `run_generation_worker` de T
+threads) : un serveur Django, les workers, et des POST de formulaire
+concurrents sur les vraies routes, avec un utilisateur connecté.
+
+- route `queue` : POST /agent/generate/, puis lecture de la progression
+  jusqu'à 'completed' ou 'error' (latence de bout en bout) ;
+- route `stream` : POST /agent/generate/stream/ (premier morceau et fin du flux) ;
+- route `async` : POST /agent/generate/async/ (les workers ne servent pas).
+
+Le rapport donne, par configuration, le débit, les p50/p95/p99 et le nombre
+moyen de requêtes SQL par requête HTTP et par job. Ces nombres sont lus dans
+les métriques des processus (METRICS_DIR, un répertoire temporaire par
+configuration). La base de DJANGO_SETTINGS_MODULE doit être migrée. Les
+documents de l'utilisateur de test sont supprimés à la fin, sauf avec --keep.
+
+    python benchmarks/loadtest/driver.py [--settings CV.settings] [--configs 1x4,2x4]
+        [--requests 100] [--concurrency 10] [--route queue] [--distinct 0]
+        [--server "gunicorn CV.wsgi -w 4 -b {address}"] [--json report.json]
+        [options de fake_providers.py : --gemini-latency, --error-rate, ...]
+"""
+import argparse
+import json
+import math
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fake_providers import add_arguments, parse_latency  # noqa: E402
+
+LOADTEST_EMAIL = 'loadtest@example.com'
+ROUTES = {
+    'queue': '/agent/generate/',
+    'stream': '/agent/generate/stream/',
+    'async': '/agent/generate/async/',
+}
+JOB_DESCRIPTION = (
+    "Nous recherchons un(e) développeur(se) Python / Django pour concevoir des API REST, "
+    "industrialiser les déploiements (Docker, Kubernetes) et améliorer les performances de PostgreSQL. "
+    "Tests automatisés (pytest), revue de code, méthodes agiles."
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, process, timeout=60):
+    """Attend qu'un serveur réponde ; échoue si son processus s'arrête avant"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Process exited before serving {url} (code {process.returncode})")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    sys.exit(f"Timed out waiting for {url}")
+
+
+def stop(processes, timeout=30):
+    """SIGINT puis attente : les processus Django écrivent leurs métriques en sortant"""
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    for process in processes:
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def form(run, index, distinct):
+    """
+    Formulaire de génération ; --distinct N répète N offres (0 : toutes
+    différentes, pas de cache). `run` distingue les offres de chaque
+    configuration : une configuration ne profite pas du cache de la précédente.
+    """
+    offer = index % distinct if distinct else index
+    return {
+        'targetRole': f"Développeur Python {offer}",
+        'company': f"Entreprise {run}-{offer}",
+        'jobDescription': JOB_DESCRIPTION,
+        'documentType': 'CV',
+        'skills': 'Python, Django, PostgreSQL, Docker',
+        'experiences': json.dumps([{'poste': 'Développeur', 'entreprise': 'Acme', 'description': 'API Django'}]),
+        'education': json.dumps([{'diplome': 'Master informatique', 'ecole': 'Université'}]),
+        'telephone': '0600000000',
+        'langue': 'fr',
+    }
+
+
+def send(client, run, route, index, options):
+    """Une génération ; retourne ses mesures (secondes) et son issue"""
+    data = form(run, index, options.distinct)
+    started = time.perf_counter()
+    result = {'outcome': 'error'}
+    try:
+        if route == 'stream':
+            with client.stream('POST', ROUTES[route], data=data) as response:
+                for line in response.iter_lines():
+                    if line.startswith('data: {"text"') and 'first' not in result:
+                        result['first'] = time.perf_counter() - started
+                    elif line.startswith('event: '):
+                        event = line[7:]
+                        if event in ('done', 'error'):
+                            result['outcome'] = 'completed' if event == 'done' else 'error'
+                    elif result['outcome'] == 'error' and line.startswith('data: {"error"'):
+                        result['error'] = json.loads(line[6:])['error']
+            result['response'] = result['total'] = time.perf_counter() - started
+            return result
+
+        response = client.post(ROUTES[route], data=data)
+        result['response'] = time.perf_counter() - started
+        body = response.json()
+        if route == 'async' or not body.get('success'):
+            result['outcome'] = 'completed' if response.status_code == 201 else 'error'
+            if 'error' in body:
+                result['error'] = body['error']
+            result['total'] = result['response']
+            return result
+
+        deadline = started + options.timeout
+        status = body.get('status')
+        while status not in ('completed', 'error') and time.perf_counter() < deadline:
+            time.sleep(options.poll)
+            status = client.get(body['status_url']).json().get('status')
+        result['total'] = time.perf_counter() - started
+        result['outcome'] = status if status in ('completed', 'error') else 'timeout'
+    except (httpx.HTTPError, ValueError) as e:
+        result['error'] = str(e)
+    return result
+
+
+def reverse_progress():
+    from django.urls import reverse
+    return reverse('Agent:document_progress', kwargs={'document_id': 1})
+
+
+def metric_average(merged, name, **labels):
+    """Moyenne (somme / nombre) d'un histogramme additionné, pour les échantillons qui ont ces labels"""
+    metric = merged.get(f'cvagent_{name}')
+    if metric is None:
+        return None
+    total = count = 0
+    for key, (_, value_sum, value_count) in metric['samples'].items():
+        values = dict(zip(metric['labels'], key))
+        if all(values.get(label) == value for label, value in labels.items()):
+            total += value_sum
+            count += value_count
+    return total / count if count else None
+
+
+def counter_values(merged, name, label):
+    metric = merged.get(f'cvagent_{name}')
+    if metric is None:
+        return {}
+    index = metric['labels'].index(label)
+    values = {}
+    for key, value in metric['samples'].items():
+        values[key[index]] = values.get(key[index], 0) + value
+    return values
+
+
+def run_configuration(config, options, env, cookie, fake_url):
+    from django.test import override_settings
+    from django.urls import resolve
+    from Agent.services import metrics
+
+    processes_count, threads = (int(part) for part in config.split('x'))
+    # Métriques et sorties des processus de cette configuration
+    run_dir = tempfile.mkdtemp(prefix=f'loadtest-{config}-')
+    metrics_dir = os.path.join(run_dir, 'metrics')
+    env = {**env, 'METRICS_DIR': metrics_dir}
+    port = free_port()
+    address = f'127.0.0.1:{port}'
+    command = shlex.split(options.server.format(address=address)) if options.server else [
+        sys.executable, 'manage.py', 'runserver', address, '--noreload',
+    ]
+    httpx.post(f'{fake_url}/stats/reset')
+    run = uuid.uuid4().hex[:8]
+
+    def start(name, command):
+        with open(os.path.join(run_dir, f'{name}.log'), 'w') as log:
+            return subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    server = start('server', command)
+    workers = [
+        start(f'worker-{i}', [
+            sys.executable, 'manage.py', 'run_generation_worker', '--threads', str(threads), '--poll-interval', '0.05',
+        ])
+        for i in range(processes_count if options.route == 'queue' else 0)
+    ]
+    try:
+        base_url = f'http://{address}'
+        wait_for(f'{base_url}/login/', server)
+        limits = httpx.Limits(max_connections=options.concurrency, max_keepalive_connections=options.concurrency)
+        with httpx.Client(base_url=base_url, cookies={cookie[0]: cookie[1]}, timeout=options.timeout, limits=limits) as client:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options.concurrency) as pool:
+                results = list(pool.map(lambda i: send(client, run, options.route, i, options), range(options.requests)))
+            elapsed = time.perf_counter() - started
+    finally:
+        stop(workers + [server])
+    providers = httpx.get(f'{fake_url}/stats').json()
+
+    with override_settings(METRICS_DIR=metrics_dir):
+        merged = metrics.collect()
+    view = resolve(ROUTES[options.route]).view_name
+    progress_view = resolve(reverse_progress()).view_name
+    completed = [result for result in results if result['outcome'] == 'completed']
+    totals = [result['total'] for result in completed]
+    responses = [result['response'] for result in results if 'response' in result]
+    firsts = [result['first'] for result in completed if 'first' in result]
+    return {
+        'config': config,
+        'run_dir': run_dir,
+        'requests': len(results),
+        'completed': len(completed),
+        'failed': len(results) - len(completed),
+        'elapsed_s': elapsed,
+        'throughput_per_s': len(completed) / elapsed if elapsed else 0,
+        'response_p50_s': percentile(responses, 0.50),
+        'response_p95_s': percentile(responses, 0.95),
+        'response_p99_s': percentile(responses, 0.99),
+        'total_p50_s': percentile(totals, 0.50),
+        'total_p95_s': percentile(totals, 0.95),
+        'total_p99_s': percentile(totals, 0.99),
+        'first_chunk_p50_s': percentile(firsts, 0.50),
+        'sql_per_request': metric_average(merged, 'http_request_db_queries', view=view),
+        'sql_per_progress_poll': metric_average(merged, 'http_request_db_queries', view=progress_view),
+        'sql_per_job': metric_average(merged, 'generation_job_db_queries'),
+        'db_seconds_per_job': metric_average(merged, 'generation_job_db_seconds'),
+        'llm_outcomes': counter_values(merged, 'llm_requests_total', 'outcome'),
+        'search_outcomes': counter_values(merged, 'search_requests_total', 'outcome'),
+        'providers': providers,
+        'errors': sorted({result['error'] for result in results if 'error' in result})[:5],
+    }
+
+
+def fmt(value, scale=1, digits=2):
+    return '-' if value is None else f"{value * scale:.{digits}f}"
+
+
+def print_report(reports, route):
+    header = (
+        f"{'config':>7} {'done':>6} {'fail':>5} {'docs/s':>7} "
+        f"{'resp p50/p95/p99 (ms)':>24} {'total p50/p95/p99 (s)':>23} {'SQL/req':>8} {'SQL/job':>8} {'SQL/poll':>8}"
+    )
+    print(f"\nroute: {route}")
+    print(header)
+    print('-' * len(header))
+    for r in reports:
+        responses = '/'.join(fmt(r[f'response_{q}_s'], 1000, 0) for q in ('p50', 'p95', 'p99'))
+        totals = '/'.join(fmt(r[f'total_{q}_s']) for q in ('p50', 'p95', 'p99'))
+        print(
+            f"{r['config']:>7} {r['completed']:>6} {r['failed']:>5} {r['throughput_per_s']:>7.2f} "
+            f"{responses:>24} {totals:>23} {fmt(r['sql_per_request'], digits=1):>8} "
+            f"{fmt(r['sql_per_job'], digits=1):>8} {fmt(r['sql_per_progress_poll'], digits=1):>8}"
+        )
+    for r in reports:
+        print(f"{r['config']}: LLM {r['llm_outcomes']} | search {r['search_outcomes']} | fake providers {r['providers']}")
+        for error in r['errors']:
+            print(f"  error: {error}")
+        print(f"  logs and metrics: {r['run_dir']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--settings', default=os.environ.get('DJANGO_SETTINGS_MODULE', 'CV.settings'))
+    parser.add_argument('--configs', default='1x4,2x4', help="Configurations de workers PxT, séparées par des virgules")
+    parser.add_argument('--route', choices=sorted(ROUTES), default='queue')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--distinct', type=int, default=0, help="Nombre d'offres distinctes (0 : aucune répétée)")
+    parser.add_argument('--timeout', type=float, default=120, help="Secondes maximum par génération")
+    parser.add_argument('--poll', type=float, default=0.25, help="Secondes entre deux lectures de la progression")
+    parser.add_argument('--server', help="Commande du serveur HTTP, avec {address} (défaut : runserver --noreload)")
+    parser.add_argument('--json', help="Écrit aussi le rapport dans ce fichier")
+    parser.add_argument('--keep', action='store_true', help="Garde les documents de l'utilisateur de test")
+    add_arguments(parser)
+    options = parser.parse_args()
+    for spec in (options.gemini_latency, options.tavily_latency):
+        parse_latency(spec)
+
+    fake_port = free_port()
+    fake_url = f'http://127.0.0.1:{fake_port}'
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': options.settings,
+        'PYTHONPATH': os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+        'GEMINI_API_BASE_URL': fake_url,
+        'TAVILY_API_BASE_URL': fake_url,
+        'GEMINI_API_KEY': 'loadtest',
+        'TAVILY_API_KEY': 'loadtest',
+        'LLM_PROVIDER': 'gemini:gemini-1.5-flash',
+        'LLM_FALLBACK_PROVIDERS': '',
+        'METRICS_FLUSH_INTERVAL': '1',
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'WARNING'),
+    }
+    os.environ.update({key: env[key] for key in ('DJANGO_SETTINGS_MODULE', 'LOG_LEVEL')})
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from Agent.models import Document, GenerationJob
+
+    pending = GenerationJob.objects.filter(statut='pending').count()
+    if pending and options.route == 'queue':
+        print(f"Warning: {pending} pending generation job(s) already queued will be processed during the test")
+    user, _ = get_user_model().objects.get_or_create(email=LOADTEST_EMAIL, defaults={'full_name': 'Load Test'})
+    session = Client()
+    session.force_login(user)
+    cookie = (settings.SESSION_COOKIE_NAME, session.cookies[settings.SESSION_COOKIE_NAME].value)
+
+    fake_options = [
+        '--gemini-latency', options.gemini_latency, '--tavily-latency', options.tavily_latency,
+        '--error-rate', str(options.error_rate), '--throttle-rate', str(options.throttle_rate),
+        '--words', str(options.words), '--chunks', str(options.chunks), '--chunk-interval', str(options.chunk_interval),
+    ]
+    fake = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, 'fake_providers.py'), '--port', str(fake_port), *fake_options],
+        stdout=subprocess.DEVNULL,
+    )
+    reports = []
+    try:
+        wait_for(f'{fake_url}/stats', fake)
+        for config in options.configs.split(','):
+            print(f"Running {config} ({options.requests} requests, concurrency {options.concurrency})...", flush=True)
+            reports.append(run_configuration(config.strip(), options, env, cookie, fake_url))
+    finally:
+        stop([fake])
+        if not options.keep:
+            Document.objects.filter(user=user).delete()
+
+    print_report(reports, options.route)
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({'route': options.route, 'options': vars(options), 'reports': reports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Serveur HTTP local qui imite les API Gemini (generateContent,
+streamGenerateContent en SSE) et Tavily (search), pour les tests de charge
+sans appel réel ni quota.
+
+La latence de chaque réponse suit une distribution configurable :
+`fixed:S`, `uniform:MIN,MAX` ou `lognormal:MEDIANE,SIGMA` (secondes).
+Une proportion des requêtes échoue (503) ou est limitée (429). En streaming,
+le premier morceau arrive après la latence tirée, puis un morceau toutes les
+--chunk-interval secondes. GET /stats renvoie les compteurs, POST /stats/reset
+les remet à zéro.
+
+Pointer l'application dessus avec GEMINI_API_BASE_URL et TAVILY_API_BASE_URL :
+
+    python benchmarks/loadtest/fake_providers.py [--port 8765] [--gemini-latency lognormal:2,0.4]
+        [--tavily-latency lognormal:0.4,0.3] [--error-rate 0.01] [--throttle-rate 0] [--words 400]
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GEMINI_PATH = re.compile(r'^/v1beta/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$')
+FILLER = (
+    "Conception et livraison de fonctionnalités de bout en bout, en lien avec le produit et les équipes "
+    "métier ; amélioration continue de la qualité, des performances et de l'observabilité des services."
+).split()
+
+
+def parse_latency(spec):
+    """Fonction sans argument qui tire une latence (secondes) selon `spec`"""
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(',') if value]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda: random.uniform(*values)
+    if kind == 'lognormal' and len(values) == 2:
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    raise argparse.ArgumentTypeError(f"Invalid latency distribution: {spec!r}")
+
+
+def fake_document(prompt, words):
+    """Document Markdown plausible, qui reprend le poste et les compétences du prompt"""
+    role = re.search(r'for a (.+?) position at (.+?)\.', prompt)
+    skills = re.search(r'- Skills: (.*)', prompt)
+    skills = [skill.strip() for skill in skills.group(1).split(',') if skill.strip()] if skills else []
+    lines = [
+        f"# {role.group(1) if role else 'Candidate'}",
+        "",
+        "## Personal Information",
+        "",
+        "## Skills",
+        *[f"- {skill}" for skill in skills],
+        "",
+        "## Professional Experience",
+    ]
+    body = [FILLER[i % len(FILLER)] for i in range(words)]
+    for start in range(0, len(body), 60):
+        lines.append(f"- {' '.join(body[start:start + 60])}")
+    return '\n'.join(lines) + '\n'
+
+
+class FakeProviders(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, address, options):
+        super().__init__(address, Handler)
+        self.options = options
+        self.gemini_latency = parse_latency(options.gemini_latency)
+        self.tavily_latency = parse_latency(options.tavily_latency)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def failure(self):
+        """Statut d'erreur à renvoyer pour cette requête, ou None"""
+        draw = random.random()
+        if draw < self.options.throttle_rate:
+            return 429
+        if draw < self.options.throttle_rate + self.options.error_rate:
+            return 503
+        return None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self.path == '/stats':
+            return self._json(200, self.server.counters)
+        self._json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        path, _, _ = self.path.partition('?')
+        if path == '/stats/reset':
+            self._body()
+            self.server.reset()
+            return self._json(200, {})
+        if path == '/search':
+            return self._search(self._body())
+        match = GEMINI_PATH.match(path)
+        if match:
+            return self._gemini(self._body(), stream=match.group('method') == 'streamGenerateContent')
+        self._json(404, {'error': 'not found'})
+
+    def _fail(self, provider, status):
+        self.server.count(f'{provider}_{status}')
+        self._json(status, {'error': {'code': status, 'message': 'Simulated failure'}})
+
+    def _search(self, body):
+        server = self.server
+        latency = server.tavily_latency()
+        time.sleep(latency)
+        status = server.failure()
+        if status:
+            return self._fail('tavily', status)
+        server.count('tavily_ok')
+        query = body.get('query', '')
+        results = [
+            {'title': f"Offer {i}", 'url': f"https://jobs.example.com/{i}", 'score': 1 - i / 10,
+             'content': f"{query}: {' '.join(random.sample(FILLER, 12))}."}
+            for i in range(body.get('max_results', 3))
+        ]
+        self._json(200, {'query': query, 'results': results, 'response_time': round(latency, 3)})
+
+    def _gemini(self, body, stream):
+        server = self.server
+        prompt = ''.join(part.get('text', '') for content in body.get('contents', []) for part in content.get('parts', []))
+        time.sleep(server.gemini_latency())
+        status = server.failure()
+        if status:
+            return self._fail('gemini', status)
+        text = fake_document(prompt, server.options.words)
+        if not stream:
+            server.count('gemini_ok')
+            return self._json(200, {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}}]})
+
+        server.count('gemini_stream_ok')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        size = max(1, math.ceil(len(text) / server.options.chunks))
+        for start in range(0, len(text), size):
+            if start:
+                time.sleep(server.options.chunk_interval)
+            chunk = {'candidates': [{'content': {'parts': [{'text': text[start:start + size]}], 'role': 'model'}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\r\n\r\n".encode('utf-8'))
+            self.wfile.flush()
+
+
+def add_arguments(parser):
+    parser.add_argument('--gemini-latency', default='lognormal:2,0.4', help="Distribution de la latence Gemini")
+    parser.add_argument('--tavily-latency', default='lognormal:0.4,0.3', help="Distribution de la latence Tavily")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Proportion de réponses 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Proportion de réponses 429")
+    parser.add_argument('--words', type=int, default=400, help="Taille des documents générés, en mots")
+    parser.add_argument('--chunks', type=int, default=20, help="Nombre de morceaux d'une réponse streamée")
+    parser.add_argument('--chunk-interval', type=float, default=0.05, help="Secondes entre deux morceaux")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    options = parser.parse_args()
+    for spec in (options.gemini_latency, options.tavily_latency):
+        parse_latency(spec)
+    server = FakeProviders((options.host, options.port), options)
+    print(f"Fake Gemini/Tavily listening on http://{options.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
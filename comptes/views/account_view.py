@@ -17,7 +17,7 @@ class SignUpView(View):
         return render(request, self.template_name)
 
     def post(self, request):
-        logger.debug("Données POST reçues : %s", request.POST)
+        logger.debug("Données POST reçues", extra={"post": request.POST.dict()})
         email = request.POST.get("email")
         full_name = request.POST.get("full_name")
         password = request.POST.get("password")
@@ -57,7 +57,7 @@ class CustomLoginView(View):
         return render(request, self.template_name, {"success_message": success_message})
 
     def post(self, request):
-        logger.debug("Données POST reçues : %s", request.POST)
+        logger.debug("Données POST reçues", extra={"post": request.POST.dict()})
         email = request.POST.get("email")
         password = request.POST.get("password")
 
@@ -4,17 +4,29 @@ from django.views.generic import TemplateView
 
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from Agent.models import Document
-from django.db.models import Q, Avg
+from Agent.models import Document, EtapeTraitement
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import Http404
+from Agent.services.document_search import search_documents
+from Agent.services.pagination import InvalidCursor, KeysetPaginator
+from Agent.services.stats import compute_stats, denormalized_stats
 from django.urls import reverse
 
 class DashboardView(LoginRequiredMixin, ListView):
     template_name = "user/dashboard.html"
     context_object_name = "documents"
+    paginate_by = settings.DASHBOARD_PAGE_SIZE
+    ordering = ('-date_creation', '-id')
     
     def get_queryset(self):
         """Fetch documents for the current user with optional filtering"""
-        queryset = Document.objects.filter(user=self.request.user).order_by('-date_creation')
+        # Cards only need the summary columns and the steps
+        queryset = (
+            Document.objects.filter(user=self.request.user)
+            .defer('contenu', 'metadata')
+            .prefetch_related(Prefetch('etape_traitement_set', queryset=EtapeTraitement.objects.order_by('ordre')))
+        )
         
         # Apply filters
         type_filter = self.request.GET.get('type', 'tous')
@@ -23,32 +35,50 @@ class DashboardView(LoginRequiredMixin, ListView):
         
         query = self.request.GET.get('q', '').strip()
         if query:
-            queryset = queryset.filter(
-                Q(titre__icontains=query) |
-                Q(poste__icontains=query) |
-                Q(entreprise__icontains=query)
-            )
+            queryset = search_documents(queryset, query)
         
-        return queryset
+        return queryset.order_by(*self.get_ordering())
+    
+    def get_ordering(self):
+        """Most relevant documents first when searching, newest first otherwise"""
+        if self.request.GET.get('q', '').strip():
+            return ('-search_rank',) + self.ordering
+        return self.ordering
+    
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset pagination: ?after=<cursor> / ?before=<cursor> instead of ?page=N"""
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.get_ordering())
+        try:
+            page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        except InvalidCursor:
+            raise Http404("Invalid page cursor")
+        return paginator, page, page.object_list, page.has_other_pages()
+    
+    def _page_url(self, **cursor):
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params.update(cursor)
+        return f"?{params.urlencode()}"
     
     def get_context_data(self, **kwargs):
         """Add statistics and filter values to the context"""
         context = super().get_context_data(**kwargs)
-        documents = self.get_queryset()
+        type_filter = self.request.GET.get('type', 'tous')
         
-        # Calculate statistics
-        documents_count = documents.count()
-        processing_count = documents.filter(statut='processing').count()
-        completed_count = documents.filter(statut='completed').count()
-        success_rate = (completed_count / documents_count * 100) if documents_count > 0 else 0
-        average_score = documents.aggregate(Avg('score'))['score__avg'] or 0
+        # Calculate statistics: precomputed per-user counters when there is no
+        # text search, otherwise a single aggregate over the filtered documents
+        if settings.DASHBOARD_STATS_DENORMALIZED and not self.request.GET.get('q', '').strip():
+            stats = denormalized_stats(self.request.user, type=None if type_filter == 'tous' else type_filter)
+        else:
+            stats = compute_stats(self.object_list)
         
+        page = context['page_obj']
         context.update({
-            'documents_count': documents_count,
-            'processing_count': processing_count,
-            'success_rate': round(success_rate, 2),
-            'average_score': round(average_score, 2),
-            'type_filter': self.request.GET.get('type', 'tous'),
+            **stats,
+            'next_page_url': self._page_url(after=page.next_cursor) if page.has_next() else None,
+            'previous_page_url': self._page_url(before=page.previous_cursor) if page.has_previous() else None,
+            'type_filter': type_filter,
             'q': self.request.GET.get('q', ''),
         })
         return context